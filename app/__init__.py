@@ -1,14 +1,21 @@
+import atexit
 import os
 import logging
 from logging.config import dictConfig
 
 from flask import Flask, jsonify
-from app.models import db
+from app.models import db, init_read_replica
+from app.services.alerts import init_alerts
+from app.utils.cache import ResponseCache
+from app.utils.compression import ResponseCompression
+from app.utils.metrics import RequestMetrics
+from app.utils.serialization import FastJSONProvider
 from config import config
 
 
 def create_app(config_name=None):
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     dictConfig({
         "version": 1,
@@ -37,6 +44,13 @@ def create_app(config_name=None):
     app.config.from_object(config[config_name])
     
     db.init_app(app)
+    init_read_replica(app)
+    ResponseCache(app)
+    RequestMetrics(app)
+    ResponseCompression(app)
+    dispatcher = init_alerts(app)
+    if dispatcher is not None:
+        atexit.register(dispatcher.stop)
     
     from app.routes.api import api_bp
     app.register_blueprint(api_bp)
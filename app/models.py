@@ -1,14 +1,75 @@
 from datetime import datetime
+from flask import current_app, g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
 
-db = SQLAlchemy()
+# app.extensions key of the read replica engine (DATABASE_READ_URL).
+READ_ENGINE = 'read_engine'
+
+
+class RoutingSession(Session):
+    """
+    Session that sends everything to the read replica while
+    ``g.use_read_replica`` is set (GET requests on the API blueprint).
+
+    Without ``DATABASE_READ_URL`` it behaves like the default session, and
+    anything that does not set the flag (ingestion, manage.py) always uses
+    the primary.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('use_read_replica'):
+            engine = current_app.extensions.get(READ_ENGINE)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def apply_statement_timeout(session, transaction, connection):
+    """
+    Bound API reads by ``DB_STATEMENT_TIMEOUT_MS`` with ``SET LOCAL``.
+
+    Only transactions begun for API reads (``g.use_read_replica``) get the
+    timeout, on whichever engine serves them; ingestion, rebuilds and
+    migrations share the primary's pool and run unbounded. Postgres only.
+    """
+    if not (has_app_context() and g.get('use_read_replica')):
+        return
+    timeout = current_app.config.get('DB_STATEMENT_TIMEOUT_MS')
+    if timeout and connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def init_read_replica(app):
+    """
+    Create the replica engine when ``DATABASE_READ_URL`` is set.
+
+    It is kept out of ``SQLALCHEMY_BINDS`` so ``create_all`` and schema
+    upgrades never run DDL against the replica.
+    """
+    url = app.config.get('DATABASE_READ_URL')
+    if url:
+        app.extensions[READ_ENGINE] = create_engine(url, **app.config.get('READ_ENGINE_OPTIONS', {}))
+
+
+# Columns the blotter reads, stored in idx_trade_blotter's leaf pages on
+# Postgres so blotter pages are index-only scans.
+BLOTTER_COLUMNS = (
+    'account_id', 'ticker', 'shares', 'price', 'trade_type', 'settlement_date',
+    'market_value', 'source_system', 'file_format',
+)
 
 
 class Trade(db.Model):
     __tablename__ = 'trades'
     
     id = db.Column(db.Integer, primary_key=True)
-    trade_date = db.Column(db.Date, nullable=False, index=True)
+    trade_date = db.Column(db.Date, nullable=False)
     account_id = db.Column(db.String(50), nullable=False, index=True)
     ticker = db.Column(db.String(20), nullable=False, index=True)
     shares = db.Column(db.Numeric(15, 4), nullable=False)
@@ -22,9 +83,19 @@ class Trade(db.Model):
     file_format = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Hash of the parsed fields, only set when row-level dedup is enabled
+    # (INGEST_DEDUP_ROWS). NULLs never conflict, so the unique index is inert
+    # for rows loaded without it.
+    natural_key = db.Column(db.String(40), nullable=True)
+    
+    # postgresql_include adds covering columns on Postgres; other databases
+    # get the plain key columns. tests/test_query_plans.py pins the plans.
     __table_args__ = (
-        db.Index('idx_trade_date_account', 'trade_date', 'account_id'),
+        db.Index('idx_trade_blotter', 'trade_date', 'id', postgresql_include=list(BLOTTER_COLUMNS)),
+        db.Index('idx_trade_date_account_cover', 'trade_date', 'account_id', 'ticker',
+                 postgresql_include=['shares', 'price', 'market_value', 'file_format']),
         db.Index('idx_trade_date_ticker', 'trade_date', 'ticker'),
+        db.Index('uq_trade_natural_key', 'trade_date', 'natural_key', unique=True),
     )
     
     def to_dict(self):
@@ -45,3 +116,94 @@ class Trade(db.Model):
     def __repr__(self):
         return f'<Trade {self.account_id} {self.ticker} {self.shares}@{self.trade_date}>'
 
+
+class IngestionLedger(db.Model):
+    __tablename__ = 'ingestion_ledger'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)
+    file_name = db.Column(db.String(255), nullable=True)
+    file_format = db.Column(db.String(20), nullable=False)
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    ingested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<IngestionLedger {self.file_name} {self.content_hash[:12]}>'
+
+
+class IngestionRun(db.Model):
+    __tablename__ = 'ingestion_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    file_name = db.Column(db.String(255), nullable=True)
+    file_format = db.Column(db.String(20), nullable=True)
+    method = db.Column(db.String(10), nullable=True)
+    # ingested, duplicate (already in the ledger), failed, or archived by the inbox.
+    status = db.Column(db.String(20), nullable=False)
+    bytes = db.Column(db.BigInteger, nullable=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    duplicates = db.Column(db.Integer, nullable=False, default=0)
+    seconds = db.Column(db.Float, nullable=True)
+    # {stage: seconds}; see app.services.ingestion_runs.STAGES.
+    stages = db.Column(db.JSON, nullable=False, default=dict)
+    error = db.Column(db.String(500), nullable=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<IngestionRun {self.file_name} {self.status} {self.rows} rows>'
+
+
+class PositionSnapshot(db.Model):
+    __tablename__ = 'position_snapshots'
+    
+    trade_date = db.Column(db.Date, primary_key=True)
+    account_id = db.Column(db.String(50), primary_key=True)
+    ticker = db.Column(db.String(20), primary_key=True)
+    market_value = db.Column(db.Numeric(20, 4), nullable=False, default=0)
+    shares = db.Column(db.Numeric(20, 4), nullable=False, default=0)
+    # Lowest trade id behind the row, so alarms can list positions in the
+    # order their trades were loaded. NULL until rebuilt on older databases.
+    first_trade_id = db.Column(db.Integer, nullable=True)
+    
+    # The primary key plus the values, so positions are index-only on Postgres.
+    # idx_snapshot_account serves one account over a date range and
+    # idx_snapshot_date_ticker finds the holders of a ticker on a date.
+    __table_args__ = (
+        db.Index('idx_snapshot_cover', 'trade_date', 'account_id', 'ticker',
+                 postgresql_include=['market_value', 'shares']),
+        db.Index('idx_snapshot_account', 'account_id', 'trade_date', 'ticker',
+                 postgresql_include=['market_value', 'shares']),
+        db.Index('idx_snapshot_date_ticker', 'trade_date', 'ticker', 'account_id'),
+    )
+    
+    def __repr__(self):
+        return f'<PositionSnapshot {self.account_id} {self.ticker} {self.market_value}@{self.trade_date}>'
+
+
+class ComplianceState(db.Model):
+    __tablename__ = 'compliance_states'
+    
+    trade_date = db.Column(db.Date, primary_key=True)
+    account_id = db.Column(db.String(50), primary_key=True)
+    in_violation = db.Column(db.Boolean, nullable=False, default=False)
+    # [{'ticker', 'percentage', 'market_value'}] as served by /api/alarms.
+    violations = db.Column(db.JSON, nullable=False, default=list)
+    evaluated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # When in_violation last flipped (or the account was first evaluated).
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # The account's lowest trade id on the date; /api/alarms lists violations in this order.
+    first_trade_id = db.Column(db.Integer, nullable=True)
+    
+    def __repr__(self):
+        return f'<ComplianceState {self.account_id} {self.in_violation}@{self.trade_date}>'
+
+
+class DateVersion(db.Model):
+    __tablename__ = 'date_versions'
+    
+    trade_date = db.Column(db.Date, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<DateVersion {self.trade_date} v{self.version}>'
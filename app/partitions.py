@@ -0,0 +1,205 @@
+from datetime import date, datetime
+
+from sqlalchemy import text, update
+
+from app.models import db, DateVersion, Trade
+
+
+# Monthly range partitions of trades on trade_date (Postgres only). Partitions
+# are named trades_pYYYYMM; rows outside every partition land in the default
+# partition so ingestion never fails on an unexpected date.
+PARTITION_PREFIX = f'{Trade.__tablename__}_p'
+DEFAULT_PARTITION = f'{Trade.__tablename__}_default'
+LEGACY_TABLE = f'{Trade.__tablename__}_unpartitioned'
+DEFAULT_MONTHS_AHEAD = 3
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first, last):
+    """Month starts from ``first``'s month through ``last``'s month."""
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(month):
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def partition_month(name):
+    """The month a ``trades_pYYYYMM`` partition covers, or None for other names."""
+    suffix = name[len(PARTITION_PREFIX):]
+    if not name.startswith(PARTITION_PREFIX) or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+
+def partition_ddl(month):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {Trade.__tablename__} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def require_postgres(connection):
+    if connection.dialect.name != 'postgresql':
+        raise RuntimeError("Partitioning requires PostgreSQL; SQLite keeps an unpartitioned trades table")
+
+
+def is_partitioned(connection):
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {'table': Trade.__tablename__},
+    ).first() is not None
+
+
+def list_partitions(connection):
+    """Names of the partitions currently attached to trades."""
+    return sorted(connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {'table': Trade.__tablename__}).scalars())
+
+
+def create_partition(connection, month):
+    """
+    Create the partition for ``month`` if it is missing.
+
+    Rows for that month that already landed in the default partition are
+    moved into the new partition, since Postgres refuses to create a
+    partition whose range the default partition holds rows for. Returns
+    True if a partition was created.
+    """
+    name = partition_name(month)
+    if name in list_partitions(connection):
+        return False
+
+    bounds = {'start': month, 'end': add_months(month, 1)}
+    in_range = "trade_date >= :start AND trade_date < :end"
+    stranded = connection.execute(
+        text(f"SELECT count(*) FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds
+    ).scalar()
+    if not stranded:
+        connection.execute(text(partition_ddl(month)))
+        return True
+
+    connection.execute(text(f"ALTER TABLE {Trade.__tablename__} DETACH PARTITION {DEFAULT_PARTITION}"))
+    connection.execute(text(partition_ddl(month)))
+    connection.execute(text(
+        f"INSERT INTO {Trade.__tablename__} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"
+    ), bounds)
+    connection.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+    connection.execute(text(f"ALTER TABLE {Trade.__tablename__} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    print(f"Moved {stranded} rows from {DEFAULT_PARTITION} into {name}")
+    return True
+
+
+def ensure_partitions(months_ahead=DEFAULT_MONTHS_AHEAD, today=None):
+    """Create partitions from the current month through ``months_ahead`` months out. Returns the new names."""
+    this_month = month_start(today or date.today())
+    created = []
+    with db.engine.begin() as connection:
+        require_postgres(connection)
+        if not is_partitioned(connection):
+            raise RuntimeError("trades is not partitioned; run `python manage.py partition_trades` first")
+        for month in month_range(this_month, add_months(this_month, months_ahead)):
+            if create_partition(connection, month):
+                created.append(partition_name(month))
+    return created
+
+
+def detach_partitions(before, archive_schema=None):
+    """
+    Detach the monthly partitions for every month before ``before``'s month.
+
+    Detached partitions stay in the database as ordinary tables, moved into
+    ``archive_schema`` when given, and can be dumped or dropped from there.
+    Position snapshots and compliance state for those dates are untouched,
+    but their versions in ``date_versions`` are bumped in the same
+    transaction, so cached blotters of the detached dates are dropped.
+    Returns the detached names.
+    """
+    cutoff = month_start(before)
+    now = datetime.utcnow()
+    detached = []
+    with db.engine.begin() as connection:
+        require_postgres(connection)
+        if archive_schema:
+            connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}"))
+        for name in list_partitions(connection):
+            month = partition_month(name)
+            if month is None or add_months(month, 1) > cutoff:
+                continue
+            connection.execute(text(f"ALTER TABLE {Trade.__tablename__} DETACH PARTITION {name}"))
+            connection.execute(
+                update(DateVersion.__table__)
+                .where(DateVersion.trade_date >= month, DateVersion.trade_date < add_months(month, 1))
+                .values(version=DateVersion.version + 1, updated_at=now)
+            )
+            if archive_schema:
+                connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {archive_schema}"))
+            detached.append(name)
+    return detached
+
+
+def migrate_to_partitioned(months_ahead=DEFAULT_MONTHS_AHEAD, today=None):
+    """
+    Rebuild trades as a table partitioned by month on trade_date.
+
+    Runs in one transaction:
+
+    1. Rename the old table.
+    2. Create the partitioned table, with the primary key widened to
+       ``(id, trade_date)`` as Postgres requires.
+    3. Create a partition for every month that has data, up to
+       ``months_ahead`` months from today, plus the default partition.
+    4. Copy the rows across and check the counts.
+    5. Move the id sequence to the new table, drop the old one and recreate
+       the model's indexes on the new one.
+
+    Writes are blocked for the duration.
+    """
+    table = Trade.__tablename__
+    with db.engine.begin() as connection:
+        require_postgres(connection)
+        if is_partitioned(connection):
+            print(f"{table} is already partitioned")
+            return 0
+
+        first, last = connection.execute(text(f"SELECT min(trade_date), max(trade_date) FROM {table}")).one()
+        this_month = month_start(today or date.today())
+        first = min(first or this_month, this_month)
+        last = max(last or this_month, add_months(this_month, months_ahead))
+
+        connection.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+        connection.execute(text(f"ALTER TABLE {table} RENAME TO {LEGACY_TABLE}"))
+        connection.execute(text(
+            f"CREATE TABLE {table} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS, "
+            f"PRIMARY KEY (id, trade_date)) PARTITION BY RANGE (trade_date)"
+        ))
+        connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {table} DEFAULT"))
+        for month in month_range(first, last):
+            connection.execute(text(partition_ddl(month)))
+
+        copied = connection.execute(text(f"INSERT INTO {table} SELECT * FROM {LEGACY_TABLE}")).rowcount
+        expected = connection.execute(text(f"SELECT count(*) FROM {LEGACY_TABLE}")).scalar()
+        if copied != expected:
+            raise RuntimeError(f"Copied {copied} of {expected} rows; rolling back")
+
+        sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': LEGACY_TABLE}).scalar()
+        if sequence:
+            connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+        connection.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+        for index in Trade.__table__.indexes:
+            index.create(connection)
+    return copied
@@ -1,12 +1,38 @@
-from flask import Blueprint, jsonify, request
+import base64
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context
 from datetime import datetime
-from app.models import db, Trade
+from app.models import db
 from app.utils.auth import require_api_key
-from app.services.alerts import send_violation_alert
+from app.utils.cache import cached_by_date
+from app.utils.serialization import make_iso_formatter
+from app.services import columnar
+from app.services.compliance import date_alarms, range_alarms
+from app.services.queries import blotter_select
+from app.services.snapshots import account_history, account_positions, cumulative_positions, range_positions
 
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+BLOTTER_MAX_LIMIT = 10000
+# Rows fetched per round trip when streaming the blotter.
+BLOTTER_STREAM_BATCH = 1000
+BLOTTER_FORMATS = ('json', 'ndjson') + columnar.COLUMNAR_FORMATS
+COLUMNAR_EXTENSIONS = {'arrow': 'arrows', 'parquet': 'parquet'}
+MAX_RANGE_DAYS = 366
+# Most values accepted per account_id / ticker filter.
+MAX_FILTER_VALUES = 1000
+
+
+@api_bp.before_request
+def route_reads_to_replica():
+    if request.method == 'GET':
+        g.use_read_replica = True
+
+
+@api_bp.teardown_request
+def clear_replica_routing(error=None):
+    g.pop('use_read_replica', None)
+
 
 def parse_date(date_string):
     if not date_string:
@@ -17,9 +43,102 @@ def parse_date(date_string):
         return None
 
 
+def columnar_unavailable():
+    return jsonify({'error': 'Columnar formats require pyarrow, which is not installed'}), 501
+
+
+def columnar_response(chunks, output_format, name):
+    filename = f'{name}.{COLUMNAR_EXTENSIONS[output_format]}'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=columnar.MIMETYPES[output_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+
+def blotter_row_serializer():
+    """
+    Return a function turning a ``blotter_select`` row into its JSON item.
+
+    Works on result tuples rather than ``Trade`` instances and formats each
+    distinct date once, so use a new serializer per response.
+    """
+    iso = make_iso_formatter()
+    
+    def serialize(row):
+        (_, trade_date, account_id, ticker, shares, price, trade_type, settlement_date,
+         market_value, source_system, file_format) = row
+        item = {
+            'date': iso(trade_date),
+            'account_id': account_id,
+            'ticker': ticker,
+            'shares': float(shares),
+        }
+        
+        if file_format == 'format1':
+            item['price'] = float(price) if price else None
+            item['trade_type'] = trade_type
+            item['settlement_date'] = iso(settlement_date)
+        elif file_format == 'format2':
+            item['market_value'] = float(market_value) if market_value else None
+            item['source_system'] = source_system
+        
+        return item
+    
+    return serialize
+
+
+def parse_filters():
+    """
+    Return ``(accounts, tickers, None)`` from the repeatable ``account_id`` and
+    ``ticker`` parameters, each None when absent, or ``(None, None, error_response)``.
+    """
+    filters = []
+    for name in ('account_id', 'ticker'):
+        if name not in request.args:
+            filters.append(None)
+            continue
+        values = tuple(dict.fromkeys(value.strip() for value in request.args.getlist(name)))
+        if not all(values):
+            return None, None, (jsonify({'error': f'{name} must not be empty'}), 400)
+        if len(values) > MAX_FILTER_VALUES:
+            return None, None, (jsonify({'error': f'At most {MAX_FILTER_VALUES} {name} values are allowed'}), 400)
+        filters.append(values)
+    return filters[0], filters[1], None
+
+
+def encode_cursor(trade_date, trade_id):
+    raw = f'{trade_date.isoformat()}:{trade_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, date_obj):
+    """Return the last trade id seen from a cursor issued for ``date_obj``, or None if invalid."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        cursor_date, trade_id = raw.split(':')
+        if parse_date(cursor_date) != date_obj:
+            return None
+        return int(trade_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
 @api_bp.route('/blotter', methods=['GET'])
 @require_api_key
+@cached_by_date(parse_date)
 def get_blotter():
+    """
+    Trades for a date, ordered by id.
+
+    Optional ``limit`` and ``cursor`` page through the date with a keyset on
+    ``(trade_date, id)``; the response then carries ``next_cursor`` (null on
+    the last page). Repeatable ``account_id`` and ``ticker`` parameters
+    restrict the trades. ``format=ndjson`` streams one JSON object per line from a
+    server-side cursor instead of building the whole payload; with ``limit`` a
+    last ``{"next_cursor": ...}`` line follows the trades. ``arrow`` and
+    ``parquet`` stream typed columnar batches the same way.
+    """
     date_str = request.args.get('date')
     
     if not date_str:
@@ -29,37 +148,143 @@ def get_blotter():
     if not date_obj:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    trades = Trade.query.filter_by(trade_date=date_obj).all()
+    output_format = request.args.get('format', 'json')
+    if output_format not in BLOTTER_FORMATS:
+        return jsonify({'error': f'Invalid format. Use one of: {", ".join(BLOTTER_FORMATS)}'}), 400
+    if output_format in columnar.COLUMNAR_FORMATS and not columnar.columnar_available():
+        return columnar_unavailable()
     
-    blotter_data = []
-    for trade in trades:
-        item = {
-            'date': trade.trade_date.isoformat(),
-            'account_id': trade.account_id,
-            'ticker': trade.ticker,
-            'shares': float(trade.shares),
-        }
-        
-        if trade.file_format == 'format1':
-            item['price'] = float(trade.price) if trade.price else None
-            item['trade_type'] = trade.trade_type
-            item['settlement_date'] = trade.settlement_date.isoformat() if trade.settlement_date else None
-        elif trade.file_format == 'format2':
-            item['market_value'] = float(trade.market_value) if trade.market_value else None
-            item['source_system'] = trade.source_system
-        
-        blotter_data.append(item)
+    limit = request.args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= BLOTTER_MAX_LIMIT:
+            return jsonify({'error': f'Invalid limit. Use an integer between 1 and {BLOTTER_MAX_LIMIT}'}), 400
     
-    return jsonify({
+    accounts, tickers, error = parse_filters()
+    if error:
+        return error
+    
+    after_id = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        after_id = decode_cursor(cursor, date_obj)
+        if after_id is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    query = blotter_select(date_obj, accounts, tickers, after_id)
+    
+    if output_format == 'ndjson':
+        return stream_blotter(query, date_obj, limit)
+    if output_format != 'json':
+        if limit is not None:
+            query = query.limit(limit)
+        return columnar_response(
+            columnar.stream_blotter(query, output_format), output_format, f'blotter-{date_obj.isoformat()}'
+        )
+    
+    if limit is None:
+        rows = db.session.execute(query).all()
+        next_cursor = None
+    else:
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        next_cursor = encode_cursor(date_obj, rows[limit - 1][0]) if len(rows) > limit else None
+        rows = rows[:limit]
+    
+    blotter_data = list(map(blotter_row_serializer(), rows))
+    
+    payload = {
         'date': date_str,
         'count': len(blotter_data),
         'data': blotter_data
-    }), 200
+    }
+    if limit is not None:
+        payload['next_cursor'] = next_cursor
+    
+    return jsonify(payload), 200
+
+
+def stream_blotter(query, date_obj, limit=None):
+    """NDJSON trades; with ``limit``, one extra row is read to tell whether to end with a next cursor."""
+    dumps = current_app.json.dumps
+    serialize = blotter_row_serializer()
+    if limit is not None:
+        query = query.limit(limit + 1)
+    result = db.session.execute(query.execution_options(yield_per=BLOTTER_STREAM_BATCH))
+    
+    def generate():
+        last_id = next_cursor = None
+        for count, row in enumerate(result):
+            if count == limit:
+                next_cursor = encode_cursor(date_obj, last_id)
+                break
+            last_id = row[0]
+            yield dumps(serialize(row)) + '\n'
+        if limit is not None:
+            yield dumps({'next_cursor': next_cursor}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def parse_range():
+    """Return ``(start, end, None)`` from the start/end parameters, or ``(None, None, error_response)``."""
+    if 'date' in request.args:
+        return None, None, (jsonify({'error': 'Use either date or start and end, not both'}), 400)
+    start = parse_date(request.args.get('start'))
+    end = parse_date(request.args.get('end'))
+    if not start or not end:
+        return None, None, (jsonify({'error': 'start and end are required. Use YYYY-MM-DD'}), 400)
+    if start > end:
+        return None, None, (jsonify({'error': 'start must not be after end'}), 400)
+    if (end - start).days >= MAX_RANGE_DAYS:
+        return None, None, (jsonify({'error': f'Ranges are limited to {MAX_RANGE_DAYS} days'}), 400)
+    return start, end, None
+
+
+def is_range_request():
+    return 'start' in request.args or 'end' in request.args
+
+
+def position_percentages(positions):
+    positions_result = {}
+    
+    for account_id, (total_value, tickers) in positions.items():
+        if total_value == 0:
+            positions_result[account_id] = {ticker: 0.0 for ticker in tickers}
+        else:
+            positions_result[account_id] = {
+                ticker: round((value / total_value) * 100, 2)
+                for ticker, value in tickers.items()
+            }
+    
+    return positions_result
 
 
 @api_bp.route('/positions', methods=['GET'])
 @require_api_key
+@cached_by_date(parse_date)
 def get_positions():
+    """
+    Percentage of each account's market value held per ticker.
+
+    Takes either ``date`` or a ``start``/``end`` range; a range returns one
+    entry per date with data, from a single query. ``cumulative=true`` on a
+    range returns running share and market value totals per account and
+    ticker instead, reported on the dates each position changed.
+    
+    Repeatable ``account_id`` parameters restrict the accounts; ``ticker``
+    parameters restrict the result to accounts holding any of those tickers
+    and to those tickers, with percentages still of the whole account.
+    """
+    accounts, tickers, error = parse_filters()
+    if error:
+        return error
+    
+    if is_range_request():
+        return get_positions_range(accounts, tickers)
+    
     date_str = request.args.get('date')
     
     if not date_str:
@@ -69,54 +294,75 @@ def get_positions():
     if not date_obj:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    trades = Trade.query.filter_by(trade_date=date_obj).all()
+    output_format = request.args.get('format', 'json')
+    if output_format in columnar.COLUMNAR_FORMATS:
+        if not columnar.columnar_available():
+            return columnar_unavailable()
+        return columnar_response(
+            columnar.stream_positions(date_obj, output_format, accounts=accounts, tickers=tickers),
+            output_format, f'positions-{date_obj.isoformat()}',
+        )
+    elif output_format != 'json':
+        return jsonify({'error': 'Invalid format. Use one of: json, arrow, parquet'}), 400
     
-    if not trades:
-        return jsonify({'date': date_str, 'positions': {}}), 200
-    
-    account_positions = {}
+    positions = account_positions(date_obj, accounts, tickers)
     
-    for trade in trades:
-        account_id = trade.account_id
-        ticker = trade.ticker
-        
-        if account_id not in account_positions:
-            account_positions[account_id] = {}
-        
-        if trade.market_value is not None:
-            market_value = float(trade.market_value)
-        elif trade.price is not None and trade.shares is not None:
-            market_value = float(trade.price) * float(trade.shares)
-        else:
-            market_value = 0
-        
-        if ticker in account_positions[account_id]:
-            account_positions[account_id][ticker] += market_value
-        else:
-            account_positions[account_id][ticker] = market_value
+    if not positions:
+        return jsonify({'date': date_str, 'positions': {}}), 200
     
-    positions_result = {}
+    return jsonify({
+        'date': date_str,
+        'positions': position_percentages(positions)
+    }), 200
+
+
+def get_positions_range(accounts=None, tickers=None):
+    start, end, error = parse_range()
+    if error:
+        return error
+    if request.args.get('format', 'json') != 'json':
+        return jsonify({'error': 'Date ranges are only available as json'}), 400
     
-    for account_id, tickers in account_positions.items():
-        total_value = sum(tickers.values())
-        
-        if total_value == 0:
-            positions_result[account_id] = {ticker: 0.0 for ticker in tickers}
-        else:
-            positions_result[account_id] = {
-                ticker: round((value / total_value) * 100, 2)
-                for ticker, value in tickers.items()
+    if request.args.get('cumulative', '').lower() in ('true', '1'):
+        return jsonify({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'cumulative': True,
+            'positions': {
+                trade_date.isoformat(): date_accounts
+                for trade_date, date_accounts in cumulative_positions(start, end, accounts, tickers).items()
             }
+        }), 200
     
     return jsonify({
-        'date': date_str,
-        'positions': positions_result
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'positions': {
+            trade_date.isoformat(): position_percentages(positions)
+            for trade_date, positions in range_positions(start, end, accounts, tickers).items()
+        }
     }), 200
 
 
 @api_bp.route('/alarms', methods=['GET'])
 @require_api_key
+@cached_by_date(parse_date)
 def get_alarms():
+    """
+    Accounts where one ticker exceeds 20% of market value.
+
+    Takes either ``date`` or a ``start``/``end`` range. Reads the compliance
+    state that ingestion keeps per account and date; alerts are sent by
+    ingestion when that state changes, not here. ``account_id`` and
+    ``ticker`` filter the accounts as for positions.
+    """
+    accounts, tickers, error = parse_filters()
+    if error:
+        return error
+    
+    if is_range_request():
+        return get_alarms_range(accounts, tickers)
+    
     date_str = request.args.get('date')
     
     if not date_str:
@@ -126,64 +372,103 @@ def get_alarms():
     if not date_obj:
         return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
-    trades = Trade.query.filter_by(trade_date=date_obj).all()
+    alarms_result, violations = date_alarms(date_obj, accounts, tickers)
     
-    if not trades:
+    if not alarms_result:
         return jsonify({'date': date_str, 'alarms': {}}), 200
     
-    account_positions = {}
-    
-    for trade in trades:
-        account_id = trade.account_id
-        ticker = trade.ticker
-        
-        if account_id not in account_positions:
-            account_positions[account_id] = {}
-        
-        if trade.market_value is not None:
-            market_value = float(trade.market_value)
-        elif trade.price is not None and trade.shares is not None:
-            market_value = float(trade.price) * float(trade.shares)
-        else:
-            market_value = 0
-        
-        if ticker in account_positions[account_id]:
-            account_positions[account_id][ticker] += market_value
-        else:
-            account_positions[account_id][ticker] = market_value
+    return jsonify({
+        'date': date_str,
+        'alarms': alarms_result,
+        'violations': violations
+    }), 200
+
+
+def get_alarms_range(accounts=None, tickers=None):
+    start, end, error = parse_range()
+    if error:
+        return error
     
-    alarms_result = {}
-    violations = []
+    alarms = {}
+    violations = {}
+    for trade_date, (date_alarm_states, date_violations) in range_alarms(start, end, accounts, tickers).items():
+        alarms[trade_date.isoformat()] = date_alarm_states
+        violations[trade_date.isoformat()] = date_violations
     
-    for account_id, tickers in account_positions.items():
-        total_value = sum(tickers.values())
-        has_violation = False
-        account_violations = []
-        
-        if total_value > 0:
-            for ticker, value in tickers.items():
-                percentage = (value / total_value) * 100
-                if percentage > 20.0:
-                    has_violation = True
-                    account_violations.append({
-                        'ticker': ticker,
-                        'percentage': round(percentage, 2),
-                        'market_value': round(value, 2)
-                    })
-        
-        alarms_result[account_id] = has_violation
-        
-        if has_violation:
-            violations.append({
-                'account_id': account_id,
-                'violations': account_violations
-            })
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'alarms': alarms,
+        'violations': violations
+    }), 200
+
+
+def account_position_items(total_value, holdings, tickers=None):
+    return {
+        ticker: {
+            'market_value': market_value,
+            'shares': shares,
+            'percentage': round((market_value / total_value) * 100, 2) if total_value else 0.0,
+        }
+        for ticker, (market_value, shares) in holdings.items()
+        if tickers is None or ticker in tickers
+    }
 
-            send_violation_alert(account_id, account_violations)
+
+@api_bp.route('/accounts/<account_id>/positions', methods=['GET'])
+@require_api_key
+@cached_by_date(parse_date)
+def get_account_positions(account_id):
+    """
+    One account's market value, shares and percentage per ticker.
+
+    Takes ``date`` or a ``start``/``end`` range (one entry per date with
+    positions). Reads only that account's snapshot rows through
+    idx_snapshot_account. ``ticker`` narrows the tickers listed; totals and
+    percentages stay those of the whole account.
+    """
+    _, tickers, error = parse_filters()
+    if error:
+        return error
+    
+    if is_range_request():
+        start, end, error = parse_range()
+        if error:
+            return error
+        return jsonify({
+            'account_id': account_id,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'positions': {
+                trade_date.isoformat(): {
+                    'total_market_value': round(total_value, 2),
+                    'positions': account_position_items(total_value, holdings, tickers),
+                }
+                for trade_date, (total_value, holdings) in account_history(account_id, start, end).items()
+            }
+        }), 200
+    
+    date_str = request.args.get('date')
+    if not date_str:
+        return jsonify({'error': 'Date parameter is required'}), 400
+    date_obj = parse_date(date_str)
+    if not date_obj:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
     
+    total_value, holdings = account_history(account_id, date_obj, date_obj).get(date_obj, (0.0, {}))
     return jsonify({
+        'account_id': account_id,
         'date': date_str,
-        'alarms': alarms_result,
-        'violations': violations
+        'total_market_value': round(total_value, 2),
+        'positions': account_position_items(total_value, holdings, tickers),
     }), 200
 
+
+@api_bp.route('/alerts/metrics', methods=['GET'])
+@require_api_key
+def get_alert_metrics():
+    """Queue depth, delivery counters and latency of the background alert dispatcher."""
+    dispatcher = current_app.extensions.get('alert_dispatcher')
+    if dispatcher is None:
+        return jsonify({'async': False}), 200
+    return jsonify({'async': True, **dispatcher.metrics()}), 200
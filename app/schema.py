@@ -0,0 +1,42 @@
+from sqlalchemy import inspect, text
+
+from app.models import db, ComplianceState, PositionSnapshot, Trade
+
+
+# Columns added to existing tables after their first release. create_all only
+# creates missing tables, so upgrade_schema adds these to older databases.
+ADDED_COLUMNS = (
+    (Trade.__table__, 'natural_key'),
+    (PositionSnapshot.__table__, 'first_trade_id'),
+    (ComplianceState.__table__, 'first_trade_id'),
+)
+
+# Tables whose indexes changed after their first release; missing ones are created.
+INDEXED_TABLES = (Trade.__table__, PositionSnapshot.__table__)
+
+# Indexes superseded by covering ones; trade_date alone is the prefix of
+# every trades index, and the planner preferred it over index-only scans.
+DROPPED_INDEXES = ('idx_trade_date_account', 'ix_trades_trade_date')
+
+
+def upgrade_schema():
+    """Create missing tables, then add columns and indexes that older databases lack and drop superseded indexes."""
+    db.create_all()
+    
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        for table, column_name in ADDED_COLUMNS:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            if column_name in existing:
+                continue
+            column = table.c[column_name]
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"Added column {table.name}.{column.name}")
+        
+        for index_name in DROPPED_INDEXES:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+        
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
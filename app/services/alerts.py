@@ -1,21 +1,267 @@
 import json
-from datetime import datetime
-from typing import List, Dict, Any
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
 
+from flask import current_app, has_app_context
 
-def send_violation_alert(account_id: str, violations: List[Dict[str, Any]]) -> None:
+
+Payload = Dict[str, Any]
+
+
+class LogSink:
+    """Prints each alert, the way alerts were always emitted."""
+
+    def send(self, batch: List[Payload]) -> None:
+        for payload in batch:
+            print(f"[ALERT] {json.dumps(payload)}")
+
+
+class FileSink:
+    """Appends alerts as JSON lines to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def send(self, batch: List[Payload]) -> None:
+        with open(self.path, 'a') as f:
+            for payload in batch:
+                f.write(json.dumps(payload) + '\n')
+
+
+class HttpSink:
+    """POSTs each batch as a JSON array; any non-2xx response raises and is retried."""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, batch: List[Payload]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(batch).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if not 200 <= response.status < 300:
+                raise RuntimeError(f"alert sink returned HTTP {response.status}")
+
+
+def make_sink(spec: str):
+    """Build a sink from ``log``, ``file:<path>`` or an ``http(s)://`` URL."""
+    if spec == 'log':
+        return LogSink()
+    if spec.startswith('file:'):
+        return FileSink(spec[len('file:'):])
+    if spec.startswith(('http://', 'https://')):
+        return HttpSink(spec)
+    raise ValueError(f"Unknown alert sink: {spec}")
+
+
+class AlertDispatcher:
+    """
+    Bounded in-process alert queue drained by a background thread.
+
+    Payloads are coalesced per (account_id, trade_date): a newer alert for a
+    key that is still queued replaces the pending one. The worker delivers
+    batches of up to ``batch_size`` and retries a failed batch with
+    exponential backoff. ``submit`` never blocks; when the queue is full the
+    alert is dropped and counted.
+    """
+
+    def __init__(self, sink, max_queue: int = 1000, batch_size: int = 50, flush_interval: float = 1.0,
+                 max_retries: int = 5, backoff: float = 0.5, sleep: Callable[[float], None] = time.sleep):
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._sleep = sleep
+        self._pending: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stopping = False
+        self._counters = {
+            'enqueued': 0, 'coalesced': 0, 'dropped': 0,
+            'delivered': 0, 'failed': 0, 'retries': 0, 'batches': 0,
+        }
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+
+    def submit(self, payload: Payload) -> bool:
+        key = (payload.get('account_id'), payload.get('trade_date'))
+        with self._cond:
+            if key in self._pending:
+                enqueued_at = self._pending[key][1]
+                self._pending[key] = (payload, enqueued_at)
+                self._counters['coalesced'] += 1
+                return True
+            if len(self._pending) >= self.max_queue:
+                self._counters['dropped'] += 1
+                return False
+            self._pending[key] = (payload, time.monotonic())
+            self._counters['enqueued'] += 1
+            self._cond.notify()
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self) -> None:
+        # Threads do not survive fork, so a worker forked from a parent that
+        # already started one gets its own.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._stopping = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> List[tuple]:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popitem(last=False)[1])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                if not self._pending and self._stopping:
+                    return
+                batch = self._take_batch()
+            if batch:
+                self._deliver(batch)
+
+    def _deliver(self, batch: List[tuple]) -> bool:
+        payloads = [payload for payload, _ in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.sink.send(payloads)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Alert delivery failed after {attempt + 1} attempts: {e}")
+                    with self._cond:
+                        self._counters['failed'] += len(batch)
+                    return False
+                with self._cond:
+                    self._counters['retries'] += 1
+                self._sleep(min(self.backoff * 2 ** attempt, 30.0))
+            else:
+                now = time.monotonic()
+                with self._cond:
+                    self._counters['batches'] += 1
+                    self._counters['delivered'] += len(batch)
+                    for _, enqueued_at in batch:
+                        latency = now - enqueued_at
+                        self._latency_total += latency
+                        self._latency_max = max(self._latency_max, latency)
+                        self._latency_last = latency
+                return True
+        return False
+
+    def flush(self) -> None:
+        """Deliver everything queued in the calling thread."""
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch:
+                return
+            self._deliver(batch)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            delivered = self._counters['delivered']
+            return {
+                'queue_depth': len(self._pending),
+                **self._counters,
+                'latency_seconds': {
+                    'last': round(self._latency_last, 6),
+                    'avg': round(self._latency_total / delivered, 6) if delivered else 0.0,
+                    'max': round(self._latency_max, 6),
+                },
+            }
+
+
+def init_alerts(app) -> Optional[AlertDispatcher]:
+    """Attach an AlertDispatcher to the app when ``ALERTS_ASYNC`` is enabled."""
+    if not app.config.get('ALERTS_ASYNC'):
+        app.extensions['alert_sink'] = make_sink(app.config.get('ALERT_SINK', 'log'))
+        return None
+    dispatcher = AlertDispatcher(
+        make_sink(app.config.get('ALERT_SINK', 'log')),
+        max_queue=app.config.get('ALERT_QUEUE_SIZE', 1000),
+        batch_size=app.config.get('ALERT_BATCH_SIZE', 50),
+        flush_interval=app.config.get('ALERT_FLUSH_INTERVAL', 1.0),
+        max_retries=app.config.get('ALERT_MAX_RETRIES', 5),
+    )
+    app.extensions['alert_dispatcher'] = dispatcher
+    return dispatcher
+
+
+def flush_alerts() -> None:
+    """Deliver anything the current app's dispatcher still has queued."""
+    dispatcher = current_app.extensions.get('alert_dispatcher')
+    if dispatcher is not None:
+        dispatcher.flush()
+
+
+def _dispatch(payload: Payload) -> None:
+    if has_app_context():
+        dispatcher = current_app.extensions.get('alert_dispatcher')
+        if dispatcher is not None:
+            dispatcher.submit(payload)
+            return
+        sink = current_app.extensions.get('alert_sink')
+        if sink is not None:
+            sink.send([payload])
+            return
+
+    LogSink().send([payload])
+
+
+def send_violation_alert(account_id: str, violations: List[Dict[str, Any]],
+                         trade_date: Optional[date] = None) -> None:
     """
-    Simple alert sender for accounts that violate the 20% rule.
+    Alert for an account that violates the 20% rule.
 
-    In a real system, this would publish to SNS/Slack/Email/etc.
-    For this exercise, we just format and log the payload.
+    Inside an app with ``ALERTS_ASYNC`` the payload is queued for the
+    background dispatcher and this returns immediately; otherwise it is
+    delivered to the configured sink (printed, by default) right away.
     """
-    payload = {
+    _dispatch({
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "type": "POSITION_LIMIT_VIOLATION",
         "account_id": account_id,
+        "trade_date": trade_date.isoformat() if trade_date else None,
         "violations": violations,
-    }
+    })
+
 
-    # For now: just print. In real life this would be a call to an external service.
-    print(f"[ALERT] {json.dumps(payload)}")
+def send_cleared_alert(account_id: str, trade_date: Optional[date] = None) -> None:
+    """Alert that an account previously in violation is back within the 20% rule."""
+    _dispatch({
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "type": "POSITION_LIMIT_CLEARED",
+        "account_id": account_id,
+        "trade_date": trade_date.isoformat() if trade_date else None,
+        "violations": [],
+    })
@@ -0,0 +1,179 @@
+import csv
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from io import StringIO
+from itertools import islice
+
+from sqlalchemy import insert
+
+from app.models import db, Trade
+from app.services.upsert import on_conflict_insert
+
+
+# Column order of the row tuples produced by the parsers.
+TRADE_COLUMNS = (
+    'trade_date',
+    'account_id',
+    'ticker',
+    'shares',
+    'price',
+    'trade_type',
+    'settlement_date',
+    'market_value',
+    'source_system',
+    'file_format',
+)
+WRITE_COLUMNS = TRADE_COLUMNS + ('natural_key', 'created_at')
+NATURAL_KEY_INDEX = ('trade_date', 'natural_key')
+
+COPY_NULL = '\\N'
+DEFAULT_BATCH_SIZE = 10000
+STAGING_TABLE = 'trades_staging'
+
+
+def analyze_trades():
+    """
+    Refresh the Postgres planner statistics of ``trades``, in its own transaction.
+
+    A date missing from the statistics is estimated at one row, so until
+    autovacuum's next ANALYZE a blotter page for it reads and sorts the whole
+    date rather than walking idx_trade_blotter. No-op on other databases.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return
+    connection.exec_driver_sql('ANALYZE trades')
+    db.session.commit()
+
+
+def iter_batches(rows, batch_size=DEFAULT_BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def natural_key(row):
+    """
+    Hash of every parsed field of a row, used to spot re-delivered trades.
+
+    Decimals are normalised first so ``100`` and ``100.00`` hash the same.
+    """
+    parts = []
+    for value in row:
+        if value is None:
+            parts.append('')
+        elif isinstance(value, Decimal):
+            parts.append(format(value.normalize(), 'f'))
+        else:
+            parts.append(str(value))
+    return hashlib.sha1('\x1f'.join(parts).encode()).hexdigest()
+
+
+def _with_write_columns(row, created_at, dedup):
+    return row + (natural_key(row) if dedup else None, created_at)
+
+
+def supports_copy(connection):
+    return connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2'
+
+
+def _copy_into(cursor, table, rows):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([COPY_NULL if value is None else value for value in row])
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(WRITE_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+        buffer,
+    )
+
+
+def copy_rows(connection, rows, created_at, dedup=False):
+    """
+    Stream a batch of row tuples into the trades table with COPY FROM STDIN.
+
+    Runs on the DBAPI connection behind ``connection`` so the rows land in
+    the same transaction as the surrounding session. With ``dedup`` the batch
+    is copied into a temporary staging table and moved over with
+    ``INSERT ... ON CONFLICT DO NOTHING`` on the natural key. Returns the
+    row tuples that were inserted.
+    """
+    if not rows:
+        return []
+    write_rows = [_with_write_columns(row, created_at, dedup) for row in rows]
+
+    table = Trade.__tablename__
+    columns = ', '.join(WRITE_COLUMNS)
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        if not dedup:
+            _copy_into(cursor, table, write_rows)
+            return rows
+
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        _copy_into(cursor, STAGING_TABLE, write_rows)
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {STAGING_TABLE} "
+            f"ON CONFLICT ({', '.join(NATURAL_KEY_INDEX)}) DO NOTHING "
+            f"RETURNING {', '.join(TRADE_COLUMNS)}"
+        )
+        inserted = cursor.fetchall()
+        cursor.execute(f"TRUNCATE {STAGING_TABLE}")
+        return inserted
+    finally:
+        cursor.close()
+
+
+def insert_rows(connection, rows, created_at, dedup=False):
+    """
+    Executemany fallback for databases without COPY (SQLite in tests).
+
+    Returns the row tuples that were inserted, like ``copy_rows``.
+    """
+    if not rows:
+        return []
+    params = [dict(zip(WRITE_COLUMNS, _with_write_columns(row, created_at, dedup))) for row in rows]
+
+    dialect_insert = on_conflict_insert(connection)
+    if not (dedup and dialect_insert is not None):
+        connection.execute(insert(Trade.__table__), params)
+        return rows
+
+    table = Trade.__table__
+    statement = (
+        dialect_insert(table)
+        .on_conflict_do_nothing(index_elements=NATURAL_KEY_INDEX)
+        .returning(*(table.c[column] for column in TRADE_COLUMNS))
+    )
+    return [tuple(row) for row in connection.execute(statement, params)]
+
+
+def bulk_load_rows(rows, batch_size=DEFAULT_BATCH_SIZE, dedup=False, on_written=None):
+    """
+    Write parsed row tuples to the trades table in batches.
+
+    Uses COPY on Postgres and a Core executemany insert everywhere else.
+    With ``dedup`` rows whose natural key already exists for their date are
+    skipped by the database. ``on_written`` is called with each batch of
+    rows that was actually inserted. Does not commit; the caller owns the
+    transaction. Returns the number of rows inserted.
+    """
+    connection = db.session.connection()
+    writer = copy_rows if supports_copy(connection) else insert_rows
+    created_at = datetime.utcnow()
+
+    written = 0
+    for batch in iter_batches(rows, batch_size):
+        inserted = writer(connection, batch, created_at, dedup)
+        written += len(inserted)
+        if on_written is not None:
+            on_written(inserted)
+    return written
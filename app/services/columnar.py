@@ -0,0 +1,152 @@
+from decimal import Decimal
+
+from app.models import db, Trade
+from app.services.queries import position_rows_query
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; the columnar formats are disabled without it
+    pa = None
+    pq = None
+
+
+COLUMNAR_FORMATS = ('arrow', 'parquet')
+MIMETYPES = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Rows per record batch / Parquet row group, fetched from the DB in one partition.
+COLUMNAR_BATCH_SIZE = 65536
+
+
+def columnar_available():
+    return pa is not None
+
+
+def _dictionary():
+    return pa.dictionary(pa.int32(), pa.string())
+
+
+def blotter_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('trade_date', pa.date32()),
+        ('account_id', _dictionary()),
+        ('ticker', _dictionary()),
+        ('shares', pa.decimal128(15, 4)),
+        ('price', pa.decimal128(15, 4)),
+        ('trade_type', _dictionary()),
+        ('settlement_date', pa.date32()),
+        ('market_value', pa.decimal128(15, 2)),
+        ('source_system', _dictionary()),
+        ('file_format', _dictionary()),
+    ])
+
+
+def positions_schema():
+    return pa.schema([
+        ('trade_date', pa.date32()),
+        ('account_id', _dictionary()),
+        ('ticker', _dictionary()),
+        ('market_value', pa.decimal128(20, 4)),
+        ('shares', pa.decimal128(20, 4)),
+        ('percentage', pa.float64()),
+    ])
+
+
+def blotter_query(query):
+    """A ``blotter_select`` query narrowed to the schema's columns, keeping its filters and order."""
+    columns = [Trade.__table__.c[field.name] for field in blotter_schema()]
+    return query.with_only_columns(*columns)
+
+
+def _scaled(values, scale):
+    # SQLite hands back floats that only approximate the column scale.
+    exponent = Decimal(1).scaleb(-scale)
+    return [None if value is None else Decimal(value).quantize(exponent) for value in values]
+
+
+def _to_array(values, field):
+    if pa.types.is_dictionary(field.type):
+        return pa.array(values, pa.string()).dictionary_encode()
+    if pa.types.is_decimal(field.type):
+        return pa.array(_scaled(values, field.type.scale), field.type)
+    return pa.array(values, field.type)
+
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [_to_array(list(values), field) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _position_rows(rows, tickers=None):
+    for trade_date, account_id, ticker, market_value, shares, account_total in rows:
+        if tickers is not None and ticker not in tickers:
+            continue
+        total = float(account_total)
+        percentage = 0.0 if total == 0 else round((float(market_value) / total) * 100, 2)
+        yield trade_date, account_id, ticker, market_value, shares, percentage
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after every batch."""
+
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _stream(partitions, schema, output_format):
+    sink = _ChunkSink()
+    if output_format == 'arrow':
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode='w'), schema)
+        write = writer.write_batch
+    else:
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+        
+        def write(batch):
+            writer.write_table(pa.Table.from_batches([batch]))
+    
+    yield sink.drain()
+    for rows in partitions:
+        # Filtering in Python (see stream_positions) can empty a partition.
+        if not rows:
+            continue
+        write(_record_batch(rows, schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_blotter(query, output_format, batch_size=COLUMNAR_BATCH_SIZE):
+    """Yield Arrow IPC stream or Parquet bytes for a blotter query, one DB partition at a time."""
+    result = db.session.execute(blotter_query(query).execution_options(yield_per=batch_size))
+    yield from _stream(result.partitions(), blotter_schema(), output_format)
+
+
+def stream_positions(date_obj, output_format, batch_size=COLUMNAR_BATCH_SIZE, accounts=None, tickers=None):
+    """Yield Arrow IPC stream or Parquet bytes of the snapshot positions for a date."""
+    query = position_rows_query(date_obj, accounts, tickers)
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    partitions = (list(_position_rows(rows, tickers)) for rows in result.partitions())
+    yield from _stream(partitions, positions_schema(), output_format)
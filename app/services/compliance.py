@@ -0,0 +1,199 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+
+from app.models import db, ComplianceState, PositionSnapshot
+from app.services.alerts import send_cleared_alert, send_violation_alert
+from app.services.rules import evaluate_rules
+from app.services.queries import range_alarms_query
+from app.services.snapshots import account_positions, bump_date_versions, position_first_trade_ids
+from app.services.upsert import on_conflict_insert
+
+
+# Accounts per IN (...) list when re-evaluating a date; each chunk is one
+# vectorized rule pass.
+EVALUATE_CHUNK_SIZE = 5000
+
+
+def _chunks(values, size=EVALUATE_CHUNK_SIZE):
+    values = sorted(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def trade_order(first_id):
+    """Sort key for first trade ids; rows without one (not rebuilt yet) go last."""
+    return (first_id is None, first_id or 0)
+
+
+def _in_trade_order(positions, first_ids):
+    """
+    ``positions`` with accounts and their tickers ordered by first trade id.
+
+    That is the order the original per-trade loop met them in, which
+    ``evaluate_rules`` keeps in its violations. Returns the positions and
+    ``{account_id: first_trade_id}``.
+    """
+    ordered = {}
+    account_first_ids = {}
+    for account_id, (total_value, holdings) in positions.items():
+        tickers = sorted(holdings, key=lambda ticker: trade_order(first_ids.get((account_id, ticker))))
+        ordered[account_id] = (total_value, {ticker: holdings[ticker] for ticker in tickers})
+        known = [first_ids[(account_id, ticker)] for ticker in tickers
+                 if first_ids.get((account_id, ticker)) is not None]
+        account_first_ids[account_id] = min(known) if known else None
+    accounts = sorted(ordered, key=lambda account_id: trade_order(account_first_ids[account_id]))
+    return {account_id: ordered[account_id] for account_id in accounts}, account_first_ids
+
+
+def _previous_states(trade_date, accounts):
+    query = select(ComplianceState.account_id, ComplianceState.in_violation, ComplianceState.changed_at).where(
+        ComplianceState.trade_date == trade_date,
+        ComplianceState.account_id.in_(accounts),
+    )
+    return {account_id: (in_violation, changed_at) for account_id, in_violation, changed_at in db.session.execute(query)}
+
+
+def _write_states(params):
+    table = ComplianceState.__table__
+    connection = db.session.connection()
+    dialect_insert = on_conflict_insert(connection)
+    if dialect_insert is not None:
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.trade_date, table.c.account_id],
+            set_={
+                'in_violation': statement.excluded.in_violation,
+                'violations': statement.excluded.violations,
+                'evaluated_at': statement.excluded.evaluated_at,
+                'changed_at': statement.excluded.changed_at,
+                'first_trade_id': statement.excluded.first_trade_id,
+            },
+        )
+        connection.execute(statement, params)
+        return
+    
+    for param in params:
+        updated = connection.execute(
+            update(table)
+            .where(table.c.trade_date == param['trade_date'], table.c.account_id == param['account_id'])
+            .values(**{key: value for key, value in param.items() if key not in ('trade_date', 'account_id')})
+        )
+        if not updated.rowcount:
+            connection.execute(insert(table), param)
+
+
+def evaluate_accounts(keys):
+    """
+    Re-evaluate the compliance rules for ``(trade_date, account_id)`` pairs.
+
+    Reads the accounts' snapshots and upserts their ``compliance_states``
+    rows in the current transaction. Returns the transitions as
+    ``(trade_date, account_id, in_violation, violations)`` tuples: accounts
+    whose state flipped, plus accounts first seen already in violation.
+    Does not commit.
+    """
+    by_date = defaultdict(set)
+    for trade_date, account_id in keys:
+        by_date[trade_date].add(account_id)
+    
+    now = datetime.utcnow()
+    transitions = []
+    for trade_date in sorted(by_date):
+        for accounts in _chunks(by_date[trade_date]):
+            previous = _previous_states(trade_date, accounts)
+            positions, first_ids = _in_trade_order(account_positions(trade_date, accounts),
+                                                   position_first_trade_ids(trade_date, accounts))
+            alarms, violations = evaluate_rules(positions)
+            details = {violation['account_id']: violation['violations'] for violation in violations}
+            
+            params = []
+            for account_id, in_violation in alarms.items():
+                was_in_violation, changed_at = previous.get(account_id, (False, None))
+                if in_violation != was_in_violation:
+                    transitions.append((trade_date, account_id, in_violation, details.get(account_id, [])))
+                if changed_at is None or in_violation != was_in_violation:
+                    changed_at = now
+                params.append({
+                    'trade_date': trade_date,
+                    'account_id': account_id,
+                    'in_violation': in_violation,
+                    'violations': details.get(account_id, []),
+                    'evaluated_at': now,
+                    'changed_at': changed_at,
+                    'first_trade_id': first_ids[account_id],
+                })
+            if params:
+                _write_states(params)
+    return transitions
+
+
+def notify_transitions(transitions):
+    """Send one alert per transition: a violation alert on entry, a cleared alert on exit."""
+    for trade_date, account_id, in_violation, violations in transitions:
+        if in_violation:
+            send_violation_alert(account_id, violations, trade_date=trade_date)
+        else:
+            send_cleared_alert(account_id, trade_date=trade_date)
+
+
+def rebuild_compliance(dates=None):
+    """
+    Re-evaluate every account with snapshots on ``dates`` (or on all dates).
+
+    For backfills, repairs and rule changes, alongside ``rebuild_snapshots``;
+    states for accounts that no longer have snapshots are removed, and the
+    versions of the re-evaluated dates are bumped so cached alarms are
+    dropped. Returns the transitions without sending alerts. Does not commit.
+    """
+    table = ComplianceState.__table__
+    accounts = select(PositionSnapshot.trade_date, PositionSnapshot.account_id).distinct()
+    existing = select(table.c.trade_date, table.c.account_id)
+    if dates is not None:
+        dates = list(dates)
+        accounts = accounts.where(PositionSnapshot.trade_date.in_(dates))
+        existing = existing.where(table.c.trade_date.in_(dates))
+    
+    keys = {tuple(key) for key in db.session.execute(accounts)}
+    evaluated_dates = {trade_date for trade_date, _ in keys}
+    for trade_date, account_id in db.session.execute(existing).all():
+        evaluated_dates.add(trade_date)
+        if (trade_date, account_id) not in keys:
+            db.session.execute(
+                delete(table).where(table.c.trade_date == trade_date, table.c.account_id == account_id)
+            )
+    transitions = evaluate_accounts(keys)
+    bump_date_versions(evaluated_dates)
+    return transitions
+
+
+def date_alarms(date_obj, accounts=None, tickers=None):
+    """
+    Stored compliance state for a date as ``(alarms, violations)``, shaped like ``evaluate_rules``.
+
+    A primary-key range read of ``compliance_states``; nothing is aggregated.
+    ``accounts`` and ``tickers`` filter as in ``account_positions``.
+    """
+    return range_alarms(date_obj, date_obj, accounts, tickers).get(date_obj, ({}, []))
+
+
+def range_alarms(start, end, accounts=None, tickers=None):
+    """
+    ``date_alarms`` for every date in ``[start, end]`` that has state, keyed by date.
+
+    Violations are listed in first trade id order, as the original per-trade
+    loop produced them.
+    """
+    by_date = {}
+    first_ids = {}
+    query = range_alarms_query(start, end, accounts, tickers)
+    for trade_date, account_id, in_violation, violations, first_id in db.session.execute(query):
+        alarms, date_violations = by_date.setdefault(trade_date, ({}, []))
+        alarms[account_id] = in_violation
+        if in_violation:
+            date_violations.append({'account_id': account_id, 'violations': violations})
+            first_ids[(trade_date, account_id)] = first_id
+    for trade_date, (_, date_violations) in by_date.items():
+        date_violations.sort(key=lambda violation: trade_order(first_ids[(trade_date, violation['account_id'])]))
+    return by_date
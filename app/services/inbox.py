@@ -0,0 +1,176 @@
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from app.services.alerts import flush_alerts
+from app.services.ingestion import ingest_file_from_path
+from app.services.ingestion_runs import RunTimer, save_run
+
+
+EXTENSION_FORMATS = {'.csv': 'format1', '.txt': 'format2'}
+DEFAULT_WORKERS = 4
+
+# Set in each pool worker by _init_worker so create_app and the engine are
+# paid for once per process rather than once per file.
+_worker_app = None
+
+
+def detect_file_format(path):
+    """Guess the format of a drop file from its first non-empty line, falling back to the extension."""
+    with open(path, 'r', newline='') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('TradeDate,'):
+                return 'format1'
+            if line.count('|') == 5:
+                return 'format2'
+            break
+    return EXTENSION_FORMATS.get(Path(path).suffix.lower())
+
+
+def archive_file(path, archive_dir):
+    """
+    Move ``path`` into ``archive_dir`` so it appears there atomically.
+
+    Uses a rename when both live on the same filesystem; otherwise copies to a
+    temporary name inside the archive and renames that into place. An existing
+    archive entry with the same name is never overwritten.
+    """
+    path = Path(path)
+    archive_dir = Path(archive_dir)
+    target = archive_dir / path.name
+    if target.exists():
+        target = archive_dir / f"{path.stem}.{datetime.utcnow():%Y%m%dT%H%M%S%f}{path.suffix}"
+    
+    try:
+        os.rename(path, target)
+    except OSError:
+        partial = target.with_name(target.name + '.partial')
+        shutil.copy2(path, partial)
+        os.replace(partial, target)
+        os.remove(path)
+    return target
+
+
+def ingest_inbox_file(path, archive_dir):
+    """Ingest one inbox file in the current app context, archive it on success and record the run."""
+    path = Path(path)
+    result = {
+        'file': path.name,
+        'format': None,
+        'bytes': path.stat().st_size,
+        'success': 0,
+        'errors': 0,
+        'seconds': 0.0,
+        'status': 'skipped',
+    }
+    
+    file_format = detect_file_format(path)
+    if file_format is None:
+        print(f"Skipping {path}: unrecognised file format")
+        return result
+    result['format'] = file_format
+    
+    run = RunTimer(path.name, file_format, 'bulk')
+    start = time.perf_counter()
+    try:
+        success, errors = ingest_file_from_path(str(path), file_format, run=run)
+    except Exception as e:
+        print(f"Error ingesting {path}: {e}")
+        success, errors = 0, 0
+        result['status'] = 'failed'
+        run.status = 'failed'
+        run.error = str(e)
+    else:
+        # Only a rolled-back load is marked failed; a file whose lines all
+        # failed to parse still committed its ledger row and is archived.
+        result['status'] = 'failed' if run.status == 'failed' else 'ingested'
+    result['seconds'] = time.perf_counter() - start
+    result['success'] = success
+    result['errors'] = errors
+    
+    if result['status'] == 'ingested':
+        with run.stage('archive'):
+            archive_file(path, archive_dir)
+        result['status'] = 'archived'
+        if run.status == 'ingested':
+            run.status = 'archived'
+    save_run(run)
+    return result
+
+
+def _init_worker(config_name):
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(config_name)
+
+
+def _ingest_in_worker(path, archive_dir):
+    # Pool workers exit without running atexit hooks, so queued alerts are
+    # delivered before the result goes back.
+    with _worker_app.app_context():
+        try:
+            return ingest_inbox_file(path, archive_dir)
+        finally:
+            flush_alerts()
+
+
+def list_inbox(inbox_dir):
+    return sorted(
+        path for path in Path(inbox_dir).iterdir()
+        if path.is_file() and not path.name.startswith('.') and not path.name.endswith('.partial')
+    )
+
+
+def ingest_directory(inbox_dir, archive_dir, workers=DEFAULT_WORKERS, config_name=None):
+    """
+    Ingest every file in ``inbox_dir`` and archive the ones that committed.
+
+    With ``workers`` > 1 files are parsed and loaded in a process pool of at
+    most that many processes, each with its own app and connection. With one
+    worker files are processed serially in the caller's app context. Returns
+    one result dict per file.
+    """
+    paths = list_inbox(inbox_dir)
+    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+    if not paths:
+        return []
+    
+    if workers <= 1:
+        return [ingest_inbox_file(path, archive_dir) for path in paths]
+    
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(paths)),
+        initializer=_init_worker,
+        initargs=(config_name,),
+    ) as pool:
+        futures = {pool.submit(_ingest_in_worker, str(path), str(archive_dir)): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                path = futures[future]
+                print(f"Worker failed on {path}: {e}")
+                results.append({'file': path.name, 'format': None, 'bytes': 0, 'success': 0,
+                                'errors': 0, 'seconds': 0.0, 'status': 'failed'})
+    return sorted(results, key=lambda result: result['file'])
+
+
+def format_summary(results, elapsed):
+    lines = [f"{'file':<40} {'format':<8} {'status':<9} {'rows':>10} {'errors':>7} {'seconds':>8} {'rows/s':>10}"]
+    for result in results:
+        rate = result['success'] / result['seconds'] if result['seconds'] else 0
+        lines.append(
+            f"{result['file']:<40} {result['format'] or '-':<8} {result['status']:<9} "
+            f"{result['success']:>10} {result['errors']:>7} {result['seconds']:>8.2f} {rate:>10,.0f}"
+        )
+    total_rows = sum(result['success'] for result in results)
+    rate = total_rows / elapsed if elapsed else 0
+    lines.append(f"{len(results)} files, {total_rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s overall)")
+    return '\n'.join(lines)
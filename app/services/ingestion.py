@@ -1,81 +1,203 @@
 import csv
-from datetime import datetime
+import hashlib
+import os
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
 from io import StringIO
-from app.models import db, Trade
+from flask import current_app
+from app.models import db, IngestionLedger, Trade
+from app.services.bulk_load import DEFAULT_BATCH_SIZE, TRADE_COLUMNS, analyze_trades, bulk_load_rows
+from app.services.compliance import evaluate_accounts, notify_transitions
+from app.services.ingestion_runs import RunTimer, save_run
+from app.services.snapshots import (
+    PositionDeltas, apply_deltas, bump_date_versions, first_trade_ids, last_trade_id, lock_dates, unversioned_dates,
+)
 
 
-def parse_format1_file(file_content):
-    trades = []
-    reader = csv.DictReader(StringIO(file_content))
+INGEST_METHODS = ('bulk', 'orm')
+FORMAT1_FIELDS = ('TradeDate', 'AccountID', 'Ticker', 'Quantity', 'Price', 'TradeType', 'SettlementDate')
+
+# Read buffer for ingest_file_from_path; lines are parsed as each chunk arrives.
+READ_CHUNK_SIZE = 1024 * 1024
+
+# A file rarely carries more than a handful of distinct dates; the cap only
+# guards against pathological input.
+DATE_CACHE_SIZE = 4096
+
+
+def make_date_decoder(dashed):
+    """
+    Return a decoder for ``YYYY-MM-DD`` (``dashed``) or ``YYYYMMDD`` strings.
+
+    Slices the fixed layout instead of going through ``strptime`` and
+    memoizes results, so each decoder should live for one file. Raises
+    ``ValueError`` on anything that is not a valid date in that layout.
+    """
+    cache = {}
+    if dashed:
+        length, year, month, day = 10, slice(0, 4), slice(5, 7), slice(8, 10)
+    else:
+        length, year, month, day = 8, slice(0, 4), slice(4, 6), slice(6, 8)
+    
+    def decode(text):
+        try:
+            return cache[text]
+        except KeyError:
+            pass
+        
+        if len(text) != length or (dashed and (text[4] != '-' or text[7] != '-')):
+            raise ValueError(f"invalid date {text!r}")
+        digits = text[year] + text[month] + text[day]
+        if not (digits.isascii() and digits.isdigit()):
+            raise ValueError(f"invalid date {text!r}")
+        
+        value = date(int(text[year]), int(text[month]), int(text[day]))
+        if len(cache) < DATE_CACHE_SIZE:
+            cache[text] = value
+        return value
+    
+    return decode
+
+
+def parse_decimal(text):
+    """Parse a quantity/price/value as an exact ``Decimal`` (no float round trip)."""
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"invalid number {text!r}") from None
+    if not value.is_finite():
+        raise ValueError(f"invalid number {text!r}")
+    return value
+
+
+def iter_format1_rows(lines, on_error=None):
+    """
+    Yield row tuples (see ``TRADE_COLUMNS``) from Format 1 CSV lines.
+
+    ``lines`` is any iterable of text lines, typically an open file handle,
+    so the file is consumed incrementally rather than loaded whole. Rows that
+    fail to parse are reported and skipped, calling ``on_error`` for each.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    
+    try:
+        index = {name: header.index(name) for name in FORMAT1_FIELDS}
+    except ValueError as e:
+        print(f"Invalid Format 1 header: {header}. Error: {e}")
+        return
+    
+    i_trade_date = index['TradeDate']
+    i_account = index['AccountID']
+    i_ticker = index['Ticker']
+    i_quantity = index['Quantity']
+    i_price = index['Price']
+    i_trade_type = index['TradeType']
+    i_settlement = index['SettlementDate']
+    decode_date = make_date_decoder(dashed=True)
     
     for row in reader:
+        if not row:
+            continue
         try:
-            trade_date = datetime.strptime(row['TradeDate'], '%Y-%m-%d').date()
-            settlement_date = datetime.strptime(row['SettlementDate'], '%Y-%m-%d').date()
+            trade_date = decode_date(row[i_trade_date])
+            settlement_date = decode_date(row[i_settlement])
             
-            shares = float(row['Quantity'])
-            if row['TradeType'].upper() == 'SELL':
+            trade_type = row[i_trade_type]
+            shares = parse_decimal(row[i_quantity])
+            if trade_type.upper() == 'SELL':
                 shares = -abs(shares)
             
-            trade = Trade(
-                trade_date=trade_date,
-                account_id=row['AccountID'],
-                ticker=row['Ticker'],
-                shares=shares,
-                price=float(row['Price']),
-                trade_type=row['TradeType'],
-                settlement_date=settlement_date,
-                file_format='format1'
+            yield (
+                trade_date,
+                row[i_account],
+                row[i_ticker],
+                shares,
+                parse_decimal(row[i_price]),
+                trade_type,
+                settlement_date,
+                None,
+                None,
+                'format1',
             )
-            trades.append(trade)
-        except (KeyError, ValueError) as e:
+        except (IndexError, ValueError) as e:
             print(f"Error parsing Format 1 row: {row}. Error: {e}")
+            if on_error is not None:
+                on_error()
             continue
-    
-    return trades
 
 
-def parse_format2_file(file_content):
-    trades = []
-    lines = file_content.strip().split('\n')
+def iter_format2_rows(lines, on_error=None):
+    """Yield row tuples (see ``TRADE_COLUMNS``) from Format 2 pipe-delimited lines; see ``iter_format1_rows``."""
+    decode_date = make_date_decoder(dashed=False)
     
     for line in lines:
-        if not line.strip():
+        line = line.strip()
+        if not line:
             continue
             
         try:
             parts = line.split('|')
             if len(parts) != 6:
                 print(f"Invalid Format 2 line (expected 6 fields): {line}")
+                if on_error is not None:
+                    on_error()
                 continue
             
-            report_date_str = parts[0].strip()
-            trade_date = datetime.strptime(report_date_str, '%Y%m%d').date()
+            trade_date = decode_date(parts[0].strip())
             
-            trade = Trade(
-                trade_date=trade_date,
-                account_id=parts[1].strip(),
-                ticker=parts[2].strip(),
-                shares=float(parts[3].strip()),
-                market_value=float(parts[4].strip()),
-                source_system=parts[5].strip(),
-                file_format='format2'
+            yield (
+                trade_date,
+                parts[1].strip(),
+                parts[2].strip(),
+                parse_decimal(parts[3].strip()),
+                None,
+                None,
+                None,
+                parse_decimal(parts[4].strip()),
+                parts[5].strip(),
+                'format2',
             )
-            trades.append(trade)
         except (ValueError, IndexError) as e:
             print(f"Error parsing Format 2 line: {line}. Error: {e}")
+            if on_error is not None:
+                on_error()
             continue
-    
-    return trades
 
 
-def ingest_file(file_content, file_format):
+def iter_rows(lines, file_format, on_error=None):
     if file_format == 'format1':
-        trades = parse_format1_file(file_content)
+        return iter_format1_rows(lines, on_error)
     elif file_format == 'format2':
-        trades = parse_format2_file(file_content)
-    else:
-        raise ValueError(f"Unknown file format: {file_format}")
+        return iter_format2_rows(lines, on_error)
+    raise ValueError(f"Unknown file format: {file_format}")
+
+
+def _row_to_trade(row):
+    return Trade(**dict(zip(TRADE_COLUMNS, row)))
+
+
+def parse_format1_file(file_content):
+    return [_row_to_trade(row) for row in iter_format1_rows(StringIO(file_content))]
+
+
+def parse_format2_file(file_content):
+    return [_row_to_trade(row) for row in iter_format2_rows(StringIO(file_content))]
+
+
+def _batch_size(batch_size):
+    if batch_size is not None:
+        return batch_size
+    return current_app.config.get('INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def _add_trades(rows, deltas):
+    rows = list(rows)
+    trades = [_row_to_trade(row) for row in rows]
+    deltas.add_rows(rows)
     
     success_count = 0
     error_count = 0
@@ -88,19 +210,175 @@ def ingest_file(file_content, file_format):
             print(f"Error saving trade: {trade}. Error: {e}")
             error_count += 1
     
+    return success_count, error_count
+
+
+def content_sha256(file_content):
+    # Ledger hashes are taken over the text with its line endings made '\n',
+    # so a CRLF file hashes the same whether it arrives by path or as a string.
+    normalized = file_content.replace('\r\n', '\n').replace('\r', '\n')
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'r', newline=None) as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), ''):
+            digest.update(chunk.encode())
+    return digest.hexdigest()
+
+
+def is_already_ingested(content_hash):
+    return db.session.get(IngestionLedger, content_hash) is not None
+
+
+def ingest_stream(lines, file_format, method='bulk', batch_size=None, content_hash=None, file_name=None,
+                  run=None):
+    """
+    Parse and write trades from an iterable of lines (e.g. an open file).
+
+    ``method`` selects the write path: ``bulk`` streams rows through COPY
+    (Core executemany on non-Postgres databases) ``batch_size`` rows at a
+    time, ``orm`` adds one ``Trade`` per row to the session. Both return
+    ``(success_count, error_count)``; lines that fail to parse are errors.
+
+    When ``content_hash`` is given the file is recorded in the ingestion
+    ledger in the same transaction as its trades, and a file whose hash is
+    already there is skipped, returning ``(0, 0)``. With
+    ``INGEST_DEDUP_ROWS`` the bulk path also drops rows already loaded for
+    the same date. Position snapshots for the keys the file touched, the
+    compliance state of the accounts it touched and the cache versions of
+    its dates are updated in the same transaction, one load per date at a
+    time (``lock_dates``); alerts for accounts whose compliance state
+    flipped are sent once the transaction commits, and a load that brings
+    new dates then refreshes the planner statistics of ``trades``
+    (``analyze_trades``).
+    
+    Each stage is timed into ``run`` (a ``RunTimer``); without one a run is
+    created here and saved to ``ingestion_runs`` when the load finishes.
+    """
+    if file_format not in ('format1', 'format2'):
+        raise ValueError(f"Unknown file format: {file_format}")
+    if method not in INGEST_METHODS:
+        raise ValueError(f"Unknown ingest method: {method}")
+    
+    owns_run = run is None
+    if owns_run:
+        run = RunTimer(file_name, file_format, method)
+    result = _ingest_stream(lines, file_format, method, batch_size, content_hash, file_name, run)
+    if owns_run:
+        save_run(run)
+    return result
+
+
+def _ingest_stream(lines, file_format, method, batch_size, content_hash, file_name, run):
+    with run.stage('validate'):
+        already_ingested = content_hash is not None and is_already_ingested(content_hash)
+    if already_ingested:
+        print(f"Skipping {file_name or 'file'}: already ingested (sha256 {content_hash[:12]})")
+        run.status = 'duplicate'
+        return 0, 0
+    
+    parsed = 0
+    bad_rows = 0
+    
+    def counted(rows):
+        nonlocal parsed
+        for row in rows:
+            parsed += 1
+            yield row
+    
+    def count_bad_row():
+        nonlocal bad_rows
+        bad_rows += 1
+    
+    rows = counted(run.timed_rows(iter_rows(lines, file_format, count_bad_row)))
+    deltas = PositionDeltas()
     try:
-        db.session.commit()
+        after_id = last_trade_id()
+        write_start = time.perf_counter()
+        if method == 'bulk':
+            dedup = current_app.config.get('INGEST_DEDUP_ROWS', False)
+            success_count = bulk_load_rows(rows, _batch_size(batch_size), dedup=dedup, on_written=deltas.add_rows)
+            write_errors = 0
+        else:
+            success_count, write_errors = _add_trades(rows, deltas)
+        # Parsing happens as the writer pulls rows; charge it to parse only.
+        run.add('write', time.perf_counter() - write_start - run.stages.get('parse', 0.0))
+        
+        with run.stage('snapshots'):
+            lock_dates(deltas.dates)
+            apply_deltas(deltas, first_trade_ids(deltas.dates, after_id))
+            new_dates = unversioned_dates(deltas.dates)
+            bump_date_versions(deltas.dates)
+        with run.stage('compliance'):
+            transitions = evaluate_accounts(deltas.accounts)
+        with run.stage('commit'):
+            if content_hash is not None:
+                db.session.add(IngestionLedger(
+                    content_hash=content_hash,
+                    file_name=file_name,
+                    file_format=file_format,
+                    row_count=success_count,
+                ))
+            db.session.commit()
     except Exception as e:
         db.session.rollback()
         print(f"Error committing trades: {e}")
-        return 0, len(trades)
+        run.status = 'failed'
+        run.error = str(e)
+        run.errors = parsed + bad_rows
+        return 0, parsed + bad_rows
+    
+    notify_transitions(transitions)
+    if new_dates:
+        # After the commit, so parallel loads don't queue on ANALYZE's lock.
+        with run.stage('analyze'):
+            analyze_trades()
+    
+    duplicates = parsed - success_count - write_errors
+    error_count = write_errors + bad_rows
+    if duplicates:
+        print(f"Skipped {duplicates} rows already loaded for their trade date")
+    run.rows = success_count
+    run.errors = error_count
+    run.duplicates = duplicates
     
     return success_count, error_count
 
 
-def ingest_file_from_path(file_path, file_format):
-    with open(file_path, 'r') as f:
-        file_content = f.read()
-    
-    return ingest_file(file_content, file_format)
+def ingest_file(file_content, file_format, method='bulk', batch_size=None, file_name=None):
+    run = RunTimer(file_name, file_format, method)
+    with run.stage('read'):
+        encoded = file_content.encode()
+        run.bytes = len(encoded)
+        content_hash = content_sha256(file_content)
+    result = ingest_stream(
+        StringIO(file_content), file_format, method=method, batch_size=batch_size,
+        content_hash=content_hash, file_name=file_name, run=run,
+    )
+    save_run(run)
+    return result
+
+
+def ingest_file_from_path(file_path, file_format, method='bulk', batch_size=None, run=None):
+    """
+    Ingest a file from disk, hashing it first for the ledger.
 
+    Pass a ``RunTimer`` as ``run`` to add later stages (the inbox adds
+    archive) before saving it; otherwise the run is saved here.
+    """
+    owns_run = run is None
+    if owns_run:
+        run = RunTimer(os.path.basename(file_path), file_format, method)
+    run.bytes = os.path.getsize(file_path)
+    with run.stage('read'):
+        content_hash = file_sha256(file_path)
+    with open(file_path, 'r', newline='', buffering=READ_CHUNK_SIZE) as f:
+        result = ingest_stream(
+            f, file_format, method=method, batch_size=batch_size,
+            content_hash=content_hash, file_name=os.path.basename(file_path), run=run,
+        )
+    if owns_run:
+        save_run(run)
+    return result
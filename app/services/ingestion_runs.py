@@ -0,0 +1,163 @@
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from app.models import db, IngestionRun
+
+
+# Stages in pipeline order. read is the full-file hash pass, validate the
+# ledger check, parse the decoding of lines into rows (including the buffered
+# line reads), write the inserts, snapshots/compliance the derived tables in
+# the same transaction, analyze the statistics refresh after a load brings
+# new dates (Postgres only), and archive the move out of the inbox.
+STAGES = ('read', 'validate', 'parse', 'write', 'snapshots', 'compliance', 'commit', 'analyze', 'archive')
+
+# Rows are parsed this many at a time under one timer, so timing costs two
+# clock reads per chunk rather than per row.
+PARSE_CHUNK_SIZE = 1000
+
+
+class RunTimer:
+    """Stage timings and counts for one ingested file, saved as an ``IngestionRun``."""
+
+    def __init__(self, file_name=None, file_format=None, method=None, size=None):
+        self.file_name = file_name
+        self.file_format = file_format
+        self.method = method
+        self.bytes = size
+        self.status = 'ingested'
+        self.rows = 0
+        self.errors = 0
+        self.duplicates = 0
+        self.error = None
+        self.stages = {}
+        self.started_at = datetime.utcnow()
+        self._start = time.perf_counter()
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed_rows(self, rows, stage='parse'):
+        """Yield ``rows``, charging the time spent producing them to ``stage``."""
+        rows = iter(rows)
+        while True:
+            start = time.perf_counter()
+            chunk = list(islice(rows, PARSE_CHUNK_SIZE))
+            self.add(stage, time.perf_counter() - start)
+            if not chunk:
+                return
+            yield from chunk
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self._start
+
+    def record(self):
+        """The run as a JSON-ready dict: totals, rates and per-stage seconds and rows/s."""
+        seconds = self.seconds
+        return {
+            'file': self.file_name,
+            'format': self.file_format,
+            'method': self.method,
+            'status': self.status,
+            'bytes': self.bytes,
+            'rows': self.rows,
+            'errors': self.errors,
+            'duplicates': self.duplicates,
+            'started_at': self.started_at.isoformat(timespec='seconds') + 'Z',
+            'seconds': round(seconds, 4),
+            'rows_per_second': round(self.rows / seconds) if seconds else None,
+            'bytes_per_second': round(self.bytes / seconds) if seconds and self.bytes else None,
+            'stages': {
+                stage: {
+                    'seconds': round(self.stages[stage], 4),
+                    'rows_per_second': round(self.rows / self.stages[stage]) if self.stages[stage] else None,
+                }
+                for stage in STAGES if stage in self.stages
+            },
+            'error': self.error,
+        }
+
+
+def save_run(run):
+    """
+    Print the run record and store it in ``ingestion_runs``.
+
+    Runs in its own transaction after the load has committed or rolled back,
+    so failed loads are recorded too. A failure to record is printed, never
+    raised.
+    """
+    record = run.record()
+    print(f"[INGEST_RUN] {json.dumps(record)}")
+    try:
+        db.session.add(IngestionRun(
+            file_name=run.file_name,
+            file_format=run.file_format,
+            method=run.method,
+            status=run.status,
+            bytes=run.bytes,
+            rows=run.rows,
+            errors=run.errors,
+            duplicates=run.duplicates,
+            seconds=record['seconds'],
+            stages={stage: values['seconds'] for stage, values in record['stages'].items()},
+            error=run.error[:500] if run.error else None,
+            started_at=run.started_at,
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error recording ingestion run: {e}")
+    return record
+
+
+def recent_runs(limit=100):
+    """The latest ``limit`` runs, oldest first."""
+    runs = IngestionRun.query.order_by(IngestionRun.started_at.desc(), IngestionRun.id.desc()).limit(limit).all()
+    return runs[::-1]
+
+
+def summarize_runs(runs):
+    """
+    Throughput trend of ``runs`` as a printable table.
+
+    One line per day and format with files, rows, rows/s and the share of
+    time spent in each stage, followed by the same totals over all runs.
+    """
+    if not runs:
+        return 'No ingestion runs recorded.'
+
+    groups = defaultdict(list)
+    for run in runs:
+        groups[(run.started_at.date().isoformat(), run.file_format)].append(run)
+    groups['all', ''] = list(runs)
+
+    stage_header = ' '.join(f'{stage[:8]:>8}' for stage in STAGES)
+    lines = [f"{'day':<10} {'format':<8} {'files':>5} {'failed':>6} {'rows':>11} {'seconds':>9} {'rows/s':>10}  "
+             f"time share %: {stage_header}"]
+    for (day, file_format), group in sorted(groups.items(), key=lambda item: item[0][0] == 'all'):
+        rows = sum(run.rows for run in group)
+        seconds = sum(run.seconds or 0 for run in group)
+        failed = sum(run.status == 'failed' for run in group)
+        stage_seconds = defaultdict(float)
+        for run in group:
+            for stage, value in (run.stages or {}).items():
+                stage_seconds[stage] += value
+        shares = ' '.join(
+            f'{100 * stage_seconds[stage] / seconds:>8.1f}' if seconds else f"{'-':>8}" for stage in STAGES
+        )
+        rate = rows / seconds if seconds else 0
+        lines.append(f"{day:<10} {file_format or '-':<8} {len(group):>5} {failed:>6} {rows:>11} {seconds:>9.2f} "
+                     f"{rate:>10,.0f}                {shares}")
+    return '\n'.join(lines)
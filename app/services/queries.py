@@ -0,0 +1,173 @@
+"""
+Read-only queries behind the blotter, positions and alarms endpoints.
+
+Each builder selects only the columns its caller reads, from the tables
+rather than the mapped classes, so executing one returns plain row tuples
+(attribute access by column name still works) and never builds ``Trade``,
+``PositionSnapshot`` or ``ComplianceState`` instances, identity-map entries
+or change-tracking state.
+"""
+from sqlalchemy import exists, func, select
+
+from app.models import BLOTTER_COLUMNS, ComplianceState, PositionSnapshot, Trade
+
+
+trades = Trade.__table__
+snapshots = PositionSnapshot.__table__
+compliance_states = ComplianceState.__table__
+
+# Columns of the rows ``blotter_select`` returns, in order.
+BLOTTER_ROW_COLUMNS = ('id', 'trade_date') + BLOTTER_COLUMNS
+
+
+def holder_filters(table, accounts=None, tickers=None):
+    """
+    WHERE clauses limiting ``table`` rows to ``accounts`` and to accounts that
+    hold any of ``tickers`` on the row's date.
+
+    ``table`` is any table with ``trade_date`` and ``account_id``. Whole
+    accounts are kept, not just the matching tickers, so account totals and
+    percentages stay those of the full portfolio; callers drop the other
+    tickers afterwards. The ticker test is an EXISTS on
+    idx_snapshot_date_ticker.
+    """
+    clauses = []
+    if accounts is not None:
+        clauses.append(table.c.account_id.in_(accounts))
+    if tickers is not None:
+        held = snapshots.alias('held')
+        clauses.append(exists().where(
+            held.c.trade_date == table.c.trade_date,
+            held.c.account_id == table.c.account_id,
+            held.c.ticker.in_(tickers),
+        ))
+    return clauses
+
+
+def blotter_select(date_obj, accounts=None, tickers=None, after_id=None):
+    """
+    ``BLOTTER_ROW_COLUMNS`` of the trades for a date, in id order.
+
+    Covered by idx_trade_blotter. With ``accounts`` the predicate goes to
+    idx_trade_date_account_cover and only the matching trades are sorted.
+    ``ticker`` is an included column of idx_trade_blotter, so ``tickers``
+    pages still walk that index in id order and filter inside it (index
+    only, but reading past the other tickers' trades); the planner only
+    switches to idx_trade_date_ticker for rare tickers. ``after_id`` starts
+    after that trade, for keyset paging.
+    """
+    query = (
+        select(*(trades.c[column] for column in BLOTTER_ROW_COLUMNS))
+        .where(trades.c.trade_date == date_obj)
+        .order_by(trades.c.id)
+    )
+    if accounts is not None:
+        query = query.where(trades.c.account_id.in_(accounts))
+    if tickers is not None:
+        query = query.where(trades.c.ticker.in_(tickers))
+    if after_id is not None:
+        query = query.where(trades.c.id > after_id)
+    return query
+
+
+def account_positions_query(date_obj, accounts=None, tickers=None):
+    """``(account_id, ticker, market_value, account_total)`` per snapshot row of a date."""
+    return (
+        select(
+            snapshots.c.account_id,
+            snapshots.c.ticker,
+            snapshots.c.market_value,
+            func.sum(snapshots.c.market_value).over(partition_by=snapshots.c.account_id),
+        )
+        .where(snapshots.c.trade_date == date_obj, *holder_filters(snapshots, accounts, tickers))
+        .order_by(snapshots.c.account_id, snapshots.c.ticker)
+    )
+
+
+def position_rows_query(date_obj, accounts=None, tickers=None):
+    """Full snapshot rows of a date with their account total, for the columnar formats."""
+    return (
+        select(
+            snapshots.c.trade_date,
+            snapshots.c.account_id,
+            snapshots.c.ticker,
+            snapshots.c.market_value,
+            snapshots.c.shares,
+            func.sum(snapshots.c.market_value).over(partition_by=snapshots.c.account_id),
+        )
+        .where(snapshots.c.trade_date == date_obj, *holder_filters(snapshots, accounts, tickers))
+        .order_by(snapshots.c.account_id, snapshots.c.ticker)
+    )
+
+
+def range_positions_query(start, end, accounts=None, tickers=None):
+    """``account_positions_query`` over ``[start, end]``, with ``trade_date`` first."""
+    return (
+        select(
+            snapshots.c.trade_date,
+            snapshots.c.account_id,
+            snapshots.c.ticker,
+            snapshots.c.market_value,
+            func.sum(snapshots.c.market_value).over(partition_by=(snapshots.c.trade_date, snapshots.c.account_id)),
+        )
+        .where(snapshots.c.trade_date.between(start, end), *holder_filters(snapshots, accounts, tickers))
+        .order_by(snapshots.c.trade_date, snapshots.c.account_id, snapshots.c.ticker)
+    )
+
+
+def account_history_query(account_id, start, end):
+    return (
+        select(
+            snapshots.c.trade_date,
+            snapshots.c.ticker,
+            snapshots.c.market_value,
+            snapshots.c.shares,
+        )
+        .where(snapshots.c.account_id == account_id, snapshots.c.trade_date.between(start, end))
+        .order_by(snapshots.c.trade_date, snapshots.c.ticker)
+    )
+
+
+def cumulative_positions_query(start, end, accounts=None, tickers=None):
+    """
+    Running ``(shares, market_value)`` per account and ticker over ``[start, end]``.
+
+    Running totals are per account and ticker, so ``accounts`` and
+    ``tickers`` filter the rows directly.
+    """
+    window = {
+        'partition_by': (snapshots.c.account_id, snapshots.c.ticker),
+        'order_by': snapshots.c.trade_date,
+        'rows': (None, 0),
+    }
+    query = (
+        select(
+            snapshots.c.trade_date,
+            snapshots.c.account_id,
+            snapshots.c.ticker,
+            func.sum(snapshots.c.shares).over(**window),
+            func.sum(snapshots.c.market_value).over(**window),
+        )
+        .where(snapshots.c.trade_date.between(start, end))
+        .order_by(snapshots.c.trade_date, snapshots.c.account_id, snapshots.c.ticker)
+    )
+    if accounts is not None:
+        query = query.where(snapshots.c.account_id.in_(accounts))
+    if tickers is not None:
+        query = query.where(snapshots.c.ticker.in_(tickers))
+    return query
+
+
+def range_alarms_query(start, end, accounts=None, tickers=None):
+    return (
+        select(
+            compliance_states.c.trade_date,
+            compliance_states.c.account_id,
+            compliance_states.c.in_violation,
+            compliance_states.c.violations,
+            compliance_states.c.first_trade_id,
+        )
+        .where(compliance_states.c.trade_date.between(start, end),
+               *holder_filters(compliance_states, accounts, tickers))
+        .order_by(compliance_states.c.trade_date, compliance_states.c.account_id)
+    )
@@ -0,0 +1,257 @@
+import json
+from itertools import chain
+
+import numpy as np
+from flask import current_app, has_app_context
+
+
+# Percent of an account's market value any one ticker may hold, unless a
+# ticker limit or account override says otherwise.
+DEFAULT_MAX_POSITION_PCT = 20.0
+
+OVERRIDE_SETTINGS = frozenset({'max_position_pct', 'ticker_limits', 'sector_caps', 'min_cash_pct'})
+
+
+class RuleSet:
+    """
+    Compliance rule definitions.
+
+    ``max_position_pct`` caps every ticker, ``ticker_limits`` replaces the
+    cap for specific tickers, ``sector_caps`` caps the combined weight of the
+    tickers mapped to a sector in ``sectors``, and ``min_cash_pct`` sets a
+    floor on the weight held in ``cash_tickers`` (which are exempt from the
+    position caps). ``account_overrides`` maps an account id to any of
+    ``max_position_pct``, ``ticker_limits``, ``sector_caps`` and
+    ``min_cash_pct`` for that account. The defaults are the original 20%
+    concentration rule.
+    """
+
+    def __init__(self, max_position_pct=DEFAULT_MAX_POSITION_PCT, ticker_limits=None, sectors=None,
+                 sector_caps=None, min_cash_pct=None, cash_tickers=(), account_overrides=None):
+        self.max_position_pct = float(max_position_pct)
+        self.ticker_limits = {ticker: float(limit) for ticker, limit in (ticker_limits or {}).items()}
+        self.sectors = dict(sectors or {})
+        self.sector_caps = {sector: float(cap) for sector, cap in (sector_caps or {}).items()}
+        self.min_cash_pct = float(min_cash_pct) if min_cash_pct is not None else None
+        self.cash_tickers = frozenset(cash_tickers)
+        self.account_overrides = dict(account_overrides or {})
+        for account_id, override in self.account_overrides.items():
+            unknown = set(override) - OVERRIDE_SETTINGS
+            if unknown:
+                raise ValueError(f"Unknown override settings for {account_id}: {', '.join(sorted(unknown))}")
+
+    @property
+    def position_limit_only(self):
+        """True when the only rule is the one ``max_position_pct`` for every account and ticker."""
+        return not (self.ticker_limits or self.sector_caps or self.min_cash_pct is not None
+                    or self.cash_tickers or self.account_overrides)
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - {'max_position_pct', 'ticker_limits', 'sectors', 'sector_caps', 'min_cash_pct',
+                               'cash_tickers', 'account_overrides'}
+        if unknown:
+            raise ValueError(f"Unknown rule settings: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+def load_rules(path):
+    """Read a ``RuleSet`` from a JSON file."""
+    with open(path) as f:
+        return RuleSet.from_dict(json.load(f))
+
+
+def current_rules():
+    """
+    The app's rule set, from ``COMPLIANCE_RULES_FILE`` or the defaults.
+
+    Loaded once per app and kept in ``app.extensions``.
+    """
+    if not has_app_context():
+        return RuleSet()
+    path = current_app.config.get('COMPLIANCE_RULES_FILE')
+    cached = current_app.extensions.get('compliance_rules')
+    if cached is None or cached[0] != path:
+        cached = (path, load_rules(path) if path else RuleSet())
+        current_app.extensions['compliance_rules'] = cached
+    return cached[1]
+
+
+def _evaluate_position_limit(positions, limit):
+    """
+    ``evaluate_rules`` for a single position limit, as a plain loop.
+
+    Building the weight matrix costs about as much as this whole loop, so
+    the original 20% rule on its own stays on it.
+    """
+    alarms, violations = {}, []
+    for account_id, (total_value, tickers) in positions.items():
+        account_violations = []
+        if total_value > 0:
+            for ticker, value in tickers.items():
+                percentage = (value / total_value) * 100
+                if percentage > limit:
+                    account_violations.append({
+                        'ticker': ticker,
+                        'percentage': round(percentage, 2),
+                        'market_value': round(value, 2),
+                    })
+        alarms[account_id] = bool(account_violations)
+        if account_violations:
+            violations.append({'account_id': account_id, 'violations': account_violations})
+    return alarms, violations
+
+
+def _weight_matrix(positions):
+    """
+    The accounts x tickers weight matrix in coordinate form.
+
+    Portfolios are sparse, so only held positions get an entry. Entries are
+    grouped by account in ``positions`` order, tickers within an account in
+    their original order, and ``offsets[i]:offsets[i + 1]`` are account
+    ``i``'s entries.
+    """
+    totals, holdings = zip(*positions.values())
+    counts = list(map(len, holdings))
+    size = sum(counts)
+
+    entry_tickers = list(chain.from_iterable(holdings))
+    ticker_index = {ticker: i for i, ticker in enumerate(dict.fromkeys(entry_tickers))}
+    columns = np.fromiter(map(ticker_index.__getitem__, entry_tickers), dtype=np.intp, count=size)
+    values = np.fromiter(chain.from_iterable(map(dict.values, holdings)), dtype=float, count=size)
+    totals = np.array(totals, dtype=float)
+    rows = np.repeat(np.arange(len(holdings)), counts)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    positive = totals > 0
+    weights = np.zeros(size)
+    np.divide(values, totals[rows], out=weights, where=positive[rows])
+    weights *= 100
+    return list(positions), list(ticker_index), rows, columns, offsets, values, weights, positive
+
+
+def _account_vector(account_index, default, overrides, key):
+    vector = np.full(len(account_index), np.nan if default is None else default)
+    for account_id, override in overrides.items():
+        value = override.get(key)
+        if value is not None and account_id in account_index:
+            vector[account_index[account_id]] = value
+    return vector
+
+
+def evaluate_rules(positions, rules=None):
+    """
+    Evaluate every rule for every account in one vectorized pass.
+
+    ``positions`` is ``{account_id: (total_value, {ticker: value})}`` as
+    returned by ``account_positions``. Returns ``(alarms, violations)`` in
+    the ``/api/alarms`` shape: ``alarms`` maps each account to whether it
+    breaks any rule, ``violations`` lists ``{'account_id', 'violations'}``
+    for those that do. Position limit breaches are ``{'ticker',
+    'percentage', 'market_value'}`` as before; sector and cash breaches
+    carry a ``rule`` key plus the ``limit`` they crossed.
+    """
+    if rules is None:
+        rules = current_rules()
+    if not positions:
+        return {}, []
+    if rules.position_limit_only:
+        return _evaluate_position_limit(positions, rules.max_position_pct)
+
+    accounts, tickers, rows, columns, offsets, values, weights, positive = _weight_matrix(positions)
+    account_index = {account_id: i for i, account_id in enumerate(accounts)}
+    ticker_index = {ticker: i for i, ticker in enumerate(tickers)}
+    overrides = rules.account_overrides
+
+    # Per-entry limit: the account's cap, replaced by a ticker limit, replaced
+    # by that account's own limit for the ticker.
+    limits = _account_vector(account_index, rules.max_position_pct, overrides, 'max_position_pct')[rows]
+    ticker_limits = np.full(len(tickers), np.nan)
+    for ticker, limit in rules.ticker_limits.items():
+        if ticker in ticker_index:
+            ticker_limits[ticker_index[ticker]] = limit
+    entry_limits = ticker_limits[columns]
+    limits = np.where(np.isnan(entry_limits), limits, entry_limits)
+    for account_id, override in overrides.items():
+        if account_id in account_index and override.get('ticker_limits'):
+            row = account_index[account_id]
+            for entry in range(offsets[row], offsets[row + 1]):
+                limit = override['ticker_limits'].get(tickers[columns[entry]])
+                if limit is not None:
+                    limits[entry] = limit
+
+    cash = np.array([ticker in rules.cash_tickers for ticker in tickers], dtype=bool)[columns]
+    position_breaches = (weights > limits) & positive[rows] & ~cash
+    breached = np.bincount(rows[position_breaches], minlength=len(accounts)) > 0
+
+    sector_names = sorted(set(rules.sector_caps) | {
+        sector for override in overrides.values() for sector in override.get('sector_caps', {})
+    })
+    sector_breaches = None
+    if sector_names:
+        sector_index = {sector: i for i, sector in enumerate(sector_names)}
+        ticker_sectors = np.array([sector_index.get(rules.sectors.get(ticker), -1) for ticker in tickers],
+                                  dtype=np.intp)[columns]
+        in_sector = ticker_sectors >= 0
+        cells = rows[in_sector] * len(sector_names) + ticker_sectors[in_sector]
+        shape = (len(accounts), len(sector_names))
+        sector_weights = np.bincount(cells, weights=weights[in_sector], minlength=shape[0] * shape[1]).reshape(shape)
+        sector_values = np.bincount(cells, weights=values[in_sector], minlength=shape[0] * shape[1]).reshape(shape)
+        sector_caps = np.full(shape, np.inf)
+        for sector, cap in rules.sector_caps.items():
+            sector_caps[:, sector_index[sector]] = cap
+        for account_id, override in overrides.items():
+            for sector, cap in override.get('sector_caps', {}).items():
+                if account_id in account_index:
+                    sector_caps[account_index[account_id], sector_index[sector]] = cap
+        sector_breaches = (sector_weights > sector_caps) & positive[:, None]
+        breached |= sector_breaches.any(axis=1)
+
+    min_cash = _account_vector(account_index, rules.min_cash_pct, overrides, 'min_cash_pct')
+    cash_breaches = np.zeros(len(accounts), dtype=bool)
+    if not np.isnan(min_cash).all():
+        cash_weights = np.bincount(rows[cash], weights=weights[cash], minlength=len(accounts))
+        cash_values = np.bincount(rows[cash], weights=values[cash], minlength=len(accounts))
+        with np.errstate(invalid='ignore'):
+            cash_breaches = (cash_weights < min_cash) & positive
+        breached |= cash_breaches
+
+    # Build the payload from plain lists; per-element numpy scalars are slow.
+    found = {}
+    entries = np.flatnonzero(position_breaches)
+    for row, column, percentage, value in zip(rows[entries].tolist(), columns[entries].tolist(),
+                                              weights[entries].tolist(), values[entries].tolist()):
+        found.setdefault(row, []).append({
+            'ticker': tickers[column],
+            'percentage': round(percentage, 2),
+            'market_value': round(value, 2),
+        })
+    if sector_breaches is not None:
+        breach_rows, breach_columns = np.nonzero(sector_breaches)
+        for row, column, percentage, value, cap in zip(
+            breach_rows.tolist(), breach_columns.tolist(),
+            sector_weights[breach_rows, breach_columns].tolist(),
+            sector_values[breach_rows, breach_columns].tolist(),
+            sector_caps[breach_rows, breach_columns].tolist(),
+        ):
+            found.setdefault(row, []).append({
+                'rule': 'sector_cap',
+                'sector': sector_names[column],
+                'percentage': round(percentage, 2),
+                'market_value': round(value, 2),
+                'limit': cap,
+            })
+    breach_rows = np.flatnonzero(cash_breaches)
+    if len(breach_rows):
+        for row, percentage, value, limit in zip(breach_rows.tolist(), cash_weights[breach_rows].tolist(),
+                                                 cash_values[breach_rows].tolist(), min_cash[breach_rows].tolist()):
+            found.setdefault(row, []).append({
+                'rule': 'min_cash',
+                'percentage': round(percentage, 2),
+                'market_value': round(value, 2),
+                'limit': limit,
+            })
+
+    alarms = dict(zip(accounts, breached.tolist()))
+    violations = [{'account_id': accounts[row], 'violations': found[row]} for row in sorted(found)]
+    return alarms, violations
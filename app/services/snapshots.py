@@ -0,0 +1,320 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, literal, select, update
+
+from app.models import db, DateVersion, PositionSnapshot, Trade
+from app.services.queries import (
+    account_history_query, account_positions_query, cumulative_positions_query, range_positions_query,
+)
+from app.services.upsert import on_conflict_insert
+
+
+def market_value_expr():
+    return func.coalesce(Trade.market_value, Trade.price * Trade.shares, 0)
+
+
+def row_market_value(trade_row):
+    """Python twin of ``market_value_expr`` for a row tuple (see ``TRADE_COLUMNS``)."""
+    _, _, _, shares, price, _, _, market_value, _, _ = trade_row
+    if market_value is not None:
+        return market_value
+    if price is not None and shares is not None:
+        return price * shares
+    return 0
+
+
+class PositionDeltas:
+    """Per (date, account, ticker) market value and share changes from one ingest."""
+    
+    def __init__(self):
+        self.values = defaultdict(lambda: [0, 0])
+    
+    def add_rows(self, trade_rows):
+        values = self.values
+        for row in trade_rows:
+            delta = values[(row[0], row[1], row[2])]
+            delta[0] += row_market_value(row)
+            delta[1] += row[3]
+    
+    @property
+    def dates(self):
+        return {trade_date for trade_date, _, _ in self.values}
+    
+    @property
+    def accounts(self):
+        """The (date, account) pairs the ingest touched."""
+        return {(trade_date, account_id) for trade_date, account_id, _ in self.values}
+    
+    def __bool__(self):
+        return bool(self.values)
+
+
+def last_trade_id():
+    """The highest trade id visible now; trades written afterwards get higher ones."""
+    return db.session.scalar(select(func.max(Trade.id))) or 0
+
+
+def first_trade_ids_query(dates, after_id):
+    """Lowest id per date, account and ticker among the trades above ``after_id`` (a trades_pkey range)."""
+    return (
+        select(Trade.trade_date, Trade.account_id, Trade.ticker, func.min(Trade.id))
+        .where(Trade.trade_date.in_(sorted(dates)), Trade.id > after_id)
+        .group_by(Trade.trade_date, Trade.account_id, Trade.ticker)
+    )
+
+
+def first_trade_ids(dates, after_id):
+    """``{(trade_date, account_id, ticker): lowest id}`` of the trades on ``dates`` with ids above ``after_id``."""
+    if not dates:
+        return {}
+    query = first_trade_ids_query(dates, after_id)
+    return {(trade_date, account_id, ticker): first_id
+            for trade_date, account_id, ticker, first_id in db.session.execute(query)}
+
+
+def _earliest(current, new):
+    """The lower of two trade ids, either of which may be NULL."""
+    return func.coalesce(case((new < current, new), else_=current), new)
+
+
+def apply_deltas(deltas, first_ids=None):
+    """
+    Add ingest deltas to ``position_snapshots`` in the current transaction.
+
+    Existing keys are incremented with ``INSERT ... ON CONFLICT DO UPDATE``;
+    only keys touched by the ingest are written. Keys are written in sorted
+    order, so concurrent ingests lock shared snapshot rows in the same order
+    and cannot deadlock. ``first_ids`` (from ``first_trade_ids``) lowers
+    each key's ``first_trade_id``.
+    """
+    if not deltas:
+        return
+    first_ids = first_ids or {}
+    table = PositionSnapshot.__table__
+    params = [
+        {'trade_date': trade_date, 'account_id': account_id, 'ticker': ticker,
+         'market_value': market_value, 'shares': shares,
+         'first_trade_id': first_ids.get((trade_date, account_id, ticker))}
+        for (trade_date, account_id, ticker), (market_value, shares) in sorted(deltas.values.items())
+    ]
+    
+    connection = db.session.connection()
+    dialect_insert = on_conflict_insert(connection)
+    if dialect_insert is not None:
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.trade_date, table.c.account_id, table.c.ticker],
+            set_={
+                'market_value': table.c.market_value + statement.excluded.market_value,
+                'shares': table.c.shares + statement.excluded.shares,
+                'first_trade_id': _earliest(table.c.first_trade_id, statement.excluded.first_trade_id),
+            },
+        )
+        connection.execute(statement, params)
+        return
+    
+    for param in params:
+        updated = connection.execute(
+            update(table)
+            .where(table.c.trade_date == param['trade_date'],
+                   table.c.account_id == param['account_id'],
+                   table.c.ticker == param['ticker'])
+            .values(market_value=table.c.market_value + param['market_value'],
+                    shares=table.c.shares + param['shares'],
+                    first_trade_id=_earliest(table.c.first_trade_id,
+                                             literal(param['first_trade_id'], table.c.first_trade_id.type)))
+        )
+        if not updated.rowcount:
+            connection.execute(insert(table), param)
+
+
+def unversioned_dates(dates):
+    """The ``dates`` without a ``date_versions`` row, i.e. loaded for the first time."""
+    if not dates:
+        return set()
+    query = select(DateVersion.trade_date).where(DateVersion.trade_date.in_(sorted(dates)))
+    return set(dates) - set(db.session.scalars(query))
+
+
+def bump_date_versions(dates):
+    """
+    Increment the data version of each date, in the current transaction.
+
+    Response caches key on these versions, so bumping a date invalidates
+    exactly the cached responses for it.
+    """
+    if not dates:
+        return
+    table = DateVersion.__table__
+    now = datetime.utcnow()
+    params = [{'trade_date': trade_date, 'version': 1, 'updated_at': now} for trade_date in sorted(dates)]
+    
+    connection = db.session.connection()
+    dialect_insert = on_conflict_insert(connection)
+    if dialect_insert is not None:
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.trade_date],
+            set_={'version': table.c.version + 1, 'updated_at': statement.excluded.updated_at},
+        )
+        connection.execute(statement, params)
+        return
+    
+    for param in params:
+        updated = connection.execute(
+            update(table)
+            .where(table.c.trade_date == param['trade_date'])
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if not updated.rowcount:
+            connection.execute(insert(table), param)
+
+
+# First key of the two-key advisory locks held per trade date.
+DATE_LOCK_NAMESPACE = 7013
+
+
+def lock_dates(dates):
+    """
+    Hold a transaction-level advisory lock on each date, in date order.
+
+    Ingests of the same date then update snapshots and evaluate compliance
+    one at a time, each after the previous one committed, instead of
+    judging an account from a partial portfolio. Released on commit or
+    rollback. A no-op off Postgres, where SQLite already serializes writers.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return
+    for trade_date in sorted(dates):
+        connection.execute(
+            select(func.pg_advisory_xact_lock(DATE_LOCK_NAMESPACE, trade_date.toordinal()))
+        )
+
+
+def snapshot_rollup_query():
+    """Trades summed per date, account and ticker, with their first trade id (covered by idx_trade_blotter)."""
+    return (
+        select(
+            Trade.trade_date,
+            Trade.account_id,
+            Trade.ticker,
+            func.sum(market_value_expr()),
+            func.sum(Trade.shares),
+            func.min(Trade.id),
+        )
+        .group_by(Trade.trade_date, Trade.account_id, Trade.ticker)
+    )
+
+
+def rebuild_snapshots(dates=None):
+    """
+    Recompute snapshots from the trades table, for ``dates`` or for everything.
+
+    Meant for backfills and repairs; ingestion keeps snapshots current on its
+    own. Does not commit.
+    """
+    table = PositionSnapshot.__table__
+    grouped = snapshot_rollup_query()
+    clear = delete(table)
+    if dates is not None:
+        dates = list(dates)
+        grouped = grouped.where(Trade.trade_date.in_(dates))
+        clear = clear.where(table.c.trade_date.in_(dates))
+    else:
+        dates = set(db.session.execute(select(Trade.trade_date).distinct()).scalars())
+        dates.update(db.session.execute(select(table.c.trade_date).distinct()).scalars())
+    
+    db.session.execute(clear)
+    db.session.execute(
+        insert(table).from_select(['trade_date', 'account_id', 'ticker', 'market_value', 'shares', 'first_trade_id'],
+                                  grouped)
+    )
+    bump_date_versions(dates)
+
+
+def position_first_trade_ids(date_obj, accounts):
+    """``{(account_id, ticker): first_trade_id}`` of the snapshot rows of ``accounts`` on a date."""
+    table = PositionSnapshot.__table__
+    query = select(table.c.account_id, table.c.ticker, table.c.first_trade_id).where(
+        table.c.trade_date == date_obj,
+        table.c.account_id.in_(accounts),
+    )
+    return {(account_id, ticker): first_id for account_id, ticker, first_id in db.session.execute(query)}
+
+
+def account_positions(date_obj, accounts=None, tickers=None):
+    """
+    Market value per account and ticker for a date, read from snapshots.
+
+    Returns ``{account_id: (total_value, {ticker: value})}`` ordered by
+    account and ticker, with the account total from a window function.
+    ``accounts`` restricts the result to those account ids, ``tickers`` to
+    the accounts holding any of them and to those tickers; totals are always
+    over the whole account.
+    """
+    positions = {}
+    for account_id, ticker, market_value, account_total in db.session.execute(
+        account_positions_query(date_obj, accounts, tickers)
+    ):
+        if account_id not in positions:
+            positions[account_id] = (float(account_total), {})
+        if tickers is None or ticker in tickers:
+            positions[account_id][1][ticker] = float(market_value)
+    return positions
+
+
+def range_positions(start, end, accounts=None, tickers=None):
+    """
+    ``account_positions`` for every date in ``[start, end]`` from one query.
+
+    Returns ``{trade_date: {account_id: (total_value, {ticker: value})}}``
+    for the dates that have snapshots, in date order. ``accounts`` and
+    ``tickers`` filter as in ``account_positions``.
+    """
+    by_date = {}
+    query = range_positions_query(start, end, accounts, tickers)
+    for trade_date, account_id, ticker, market_value, account_total in db.session.execute(query):
+        positions = by_date.setdefault(trade_date, {})
+        if account_id not in positions:
+            positions[account_id] = (float(account_total), {})
+        if tickers is None or ticker in tickers:
+            positions[account_id][1][ticker] = float(market_value)
+    return by_date
+
+
+def account_history(account_id, start, end):
+    """
+    One account's positions for each date in ``[start, end]`` that has any.
+
+    Returns ``{trade_date: (total_value, {ticker: (market_value, shares)})}``
+    in date and ticker order, read through idx_snapshot_account.
+    """
+    by_date = {}
+    for trade_date, ticker, market_value, shares in db.session.execute(account_history_query(account_id, start, end)):
+        by_date.setdefault(trade_date, {})[ticker] = (float(market_value), float(shares))
+    return {
+        trade_date: (sum(value for value, _ in holdings.values()), holdings)
+        for trade_date, holdings in by_date.items()
+    }
+
+
+def cumulative_positions(start, end, accounts=None, tickers=None):
+    """
+    Running share and market value totals per account and ticker over ``[start, end]``.
+
+    The running sums are window functions ordered by date, so each position
+    is reported on the dates it changed with its total so far. Returns
+    ``{trade_date: {account_id: {ticker: {'shares': ..., 'market_value': ...}}}}``.
+    Running totals are per account and ticker, so ``accounts`` and
+    ``tickers`` filter the rows directly.
+    """
+    by_date = {}
+    query = cumulative_positions_query(start, end, accounts, tickers)
+    for trade_date, account_id, ticker, shares, market_value in db.session.execute(query):
+        by_date.setdefault(trade_date, {}).setdefault(account_id, {})[ticker] = {
+            'shares': float(shares),
+            'market_value': float(market_value),
+        }
+    return by_date
@@ -0,0 +1,14 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# Dialects whose insert() supports ON CONFLICT. Callers fall back to plain
+# statements on anything else.
+ON_CONFLICT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def on_conflict_insert(connection):
+    """The ``insert`` construct with ON CONFLICT support for ``connection``'s dialect, or None."""
+    return ON_CONFLICT_INSERTS.get(connection.dialect.name)
@@ -0,0 +1,283 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+
+from flask import current_app, request
+from sqlalchemy import func, select
+
+from app.models import db, DateVersion
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process LRU, one per worker.
+
+    Bounded to ``maxsize`` entries and, with ``max_bytes``, to that total
+    ``sizeof(value)``; the least recently used entries go first.
+    """
+    
+    def __init__(self, maxsize, max_bytes=None, sizeof=len):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+    
+    def set(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None and self.max_bytes is not None:
+                self.total_bytes -= self.sizeof(previous)
+            self._data[key] = value
+            self.total_bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                if self.max_bytes is not None:
+                    self.total_bytes -= self.sizeof(evicted)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+    
+    def __len__(self):
+        return len(self._data)
+
+
+class FileCache:
+    """
+    Cache shared by every worker on the host, one file per key.
+
+    Entries are written to a temporary file and renamed into place, so readers
+    never see partial writes. Keys embed the date version, so entries for
+    superseded versions are simply never read again; ``prune`` removes the
+    oldest files once there are more than ``max_entries``.
+    """
+    
+    def __init__(self, directory, max_entries=1000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.cache')
+    
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                header, body = f.read().split(b'\n', 1)
+        except (OSError, ValueError):
+            return None
+        status, mimetype = header.decode().split(' ', 1)
+        return int(status), mimetype, body
+    
+    def set(self, key, value):
+        status, mimetype, body = value
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(f'{status} {mimetype}\n'.encode())
+                f.write(body)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.prune()
+    
+    def prune(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.cache'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _body_size(value):
+    return len(value[2])
+
+
+class ResponseCache:
+    """
+    Caches date-keyed GET responses, layered in-process LRU -> optional shared FileCache.
+
+    Keys combine endpoint, query string and the date's row in ``date_versions``,
+    which ingestion bumps for every date it touches, so a load only evicts the
+    dates it changed, in every worker. The LRU holds at most
+    ``RESPONSE_CACHE_MAX_BYTES`` of bodies, and bodies over
+    ``RESPONSE_CACHE_MAX_ENTRY_BYTES`` (whole-date blotters) are not cached.
+    """
+    
+    def __init__(self, app=None):
+        self.local = None
+        self.shared = None
+        self.max_entry_bytes = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.local = LRUCache(
+            app.config.get('RESPONSE_CACHE_SIZE', 256),
+            max_bytes=app.config.get('RESPONSE_CACHE_MAX_BYTES'),
+            sizeof=_body_size,
+        )
+        self.max_entry_bytes = app.config.get('RESPONSE_CACHE_MAX_ENTRY_BYTES')
+        shared_dir = app.config.get('RESPONSE_CACHE_DIR')
+        self.shared = FileCache(shared_dir) if shared_dir else None
+        app.extensions['response_cache'] = self
+    
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+    
+    def set(self, key, value):
+        if self.max_entry_bytes is not None and _body_size(value) > self.max_entry_bytes:
+            return
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+    
+    def clear(self):
+        self.local.clear()
+
+
+def date_version(start, end):
+    """
+    ``(version_token, last_modified)`` for the dates in ``[start, end]``.
+
+    Versions only ever increase, so the sum changes whenever any date in the
+    range is bumped; the count catches dates that appear for the first time.
+    ``last_modified`` is the latest ingest into any of the dates (UTC), None
+    if none has data. One primary-key range read of ``date_versions``.
+    """
+    count, total, last_modified = db.session.execute(
+        select(func.count(), func.coalesce(func.sum(DateVersion.version), 0), func.max(DateVersion.updated_at))
+        .where(DateVersion.trade_date.between(start, end))
+    ).one()
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+    return f'{count}.{total}', last_modified
+
+
+def requested_dates(parse_date):
+    """
+    The ``(start, end)`` a request covers, from ``date`` or ``start``/``end``.
+
+    None if the dates are invalid or ``date`` is mixed with ``start``/``end``:
+    the range views reject that mix and the blotter ignores the range, so
+    neither response can be keyed on one set of dates.
+    """
+    has_range = 'start' in request.args or 'end' in request.args
+    if 'date' in request.args:
+        if has_range:
+            return None
+        date_obj = parse_date(request.args.get('date'))
+        return (date_obj, date_obj) if date_obj else None
+    start = parse_date(request.args.get('start'))
+    end = parse_date(request.args.get('end'))
+    if start and end and start <= end:
+        return start, end
+    return None
+
+
+def cache_key(start, end):
+    """``(key, last_modified)`` of the current request; the key changes whenever its dates are re-ingested."""
+    version, last_modified = date_version(start, end)
+    args = '&'.join(f'{name}={value}' for name, value in sorted(request.args.items(multi=True)))
+    path_args = '&'.join(f'{name}={value}' for name, value in sorted((request.view_args or {}).items()))
+    raw = f'{request.endpoint}|{path_args}|{args}|{start.isoformat()}|{end.isoformat()}|{version}'
+    return hashlib.sha1(raw.encode()).hexdigest(), last_modified
+
+
+def is_not_modified(key, last_modified):
+    """
+    Whether the client's copy is current: its ``If-None-Match`` holds ``key``
+    or, without one, ``If-Modified-Since`` is strictly newer than ``last_modified``.
+
+    ``last_modified`` is truncated to the second, so a second ingest within
+    the same second leaves it unchanged; a client echoing it back is not
+    trusted to be current.
+    """
+    if request.if_none_match:
+        # Weak comparison: compressed responses carry the key as a weak ETag.
+        return request.if_none_match.contains_weak(key)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and last_modified < since
+
+
+def cached_by_date(parse_date):
+    """
+    Serve a date-keyed view with conditional requests and the response cache.
+
+    ``parse_date`` turns the ``date`` (or ``start``/``end``) query parameters
+    into dates; requests without valid dates go straight to the view.
+    Responses carry an ``ETag`` and ``Last-Modified`` from ``date_versions``,
+    and a matching ``If-None-Match`` or ``If-Modified-Since`` gets a 304
+    without running the view (``CONDITIONAL_REQUESTS_ENABLED``). Only complete
+    200 responses are cached; streamed ones (ndjson, arrow, parquet) pass through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED'):
+                cache = None
+            conditional = current_app.config.get('CONDITIONAL_REQUESTS_ENABLED', True)
+            dates = requested_dates(parse_date)
+            if (cache is None and not conditional) or dates is None:
+                return view(*args, **kwargs)
+            
+            key, last_modified = cache_key(*dates)
+            if conditional and is_not_modified(key, last_modified):
+                response = current_app.response_class(status=304)
+                response.set_etag(key)
+                response.last_modified = last_modified
+                return response
+            
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                status, mimetype, body = cached
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if cache is not None and not response.is_streamed:
+                    cache.set(key, (response.status_code, response.mimetype, response.get_data()))
+            
+            response.set_etag(key)
+            response.last_modified = last_modified
+            return response
+        
+        return wrapper
+    
+    return decorator
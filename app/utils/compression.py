@@ -0,0 +1,103 @@
+import zlib
+
+from flask import request
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; only gzip is offered without it
+    zstandard = None
+
+
+# Already-compressed formats (Parquet pages are Snappy-compressed) are left alone.
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/vnd.apache.arrow.stream')
+
+
+class GzipEncoder:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+ENCODERS = {'gzip': GzipEncoder, 'zstd': ZstdEncoder}
+
+
+def compress_chunks(chunks, encoder):
+    """Compress an iterable of byte chunks as they arrive, skipping empty outputs."""
+    try:
+        for chunk in chunks:
+            data = encoder.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield encoder.flush()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class ResponseCompression:
+    """
+    Compresses JSON, NDJSON and Arrow responses with gzip or zstd, as ``Accept-Encoding`` allows.
+
+    Complete bodies below ``COMPRESSION_MIN_SIZE`` bytes are sent as they are.
+    Streamed bodies are compressed chunk by chunk as the view produces them,
+    since their size is unknown up front. zstd is preferred when the client
+    accepts it and ``zstandard`` is installed. Compressed responses carry a
+    weak ``ETag`` so one tag covers every encoding.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['response_compression'] = self
+        if not app.config.get('COMPRESSION_ENABLED', True):
+            return
+        self.min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+        self.levels = {
+            'gzip': app.config.get('COMPRESSION_GZIP_LEVEL', 6),
+            'zstd': app.config.get('COMPRESSION_ZSTD_LEVEL', 3),
+        }
+        self.encodings = ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+        app.after_request(self.compress_response)
+
+    def compress_response(self, response):
+        if (response.status_code != 200 or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers or request.method == 'HEAD'):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+        if not response.is_streamed and response.calculate_content_length() < self.min_size:
+            return response
+
+        encoder = ENCODERS[encoding](self.levels[encoding])
+        if response.is_streamed:
+            response.response = compress_chunks(response.response, encoder)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(encoder.compress(response.get_data()) + encoder.flush())
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,265 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+RESPONSE_BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ALERT_COUNTERS = ('enqueued', 'coalesced', 'dropped', 'delivered', 'failed', 'retries', 'batches')
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, label_values=(), amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{format_labels(zip(self.label_names, label_values))} {format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, label_values, value):
+        state = self._values.get(label_values)
+        if state is None:
+            state = self._values[label_values] = [[0] * len(self.buckets), 0, 0.0]
+        bucket = bisect_left(self.buckets, value)
+        if bucket < len(self.buckets):
+            state[0][bucket] += 1
+        state[1] += 1
+        state[2] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_values, (counts, count, total) in sorted(self._values.items()):
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{format_labels(labels + [("le", format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_bucket{format_labels(labels + [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(total)}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {count}')
+        return lines
+
+
+class RequestStats:
+    """What one request spent in the database, collected by the engine hooks."""
+
+    __slots__ = ('start', 'queries', 'db_seconds', 'rows', 'statements')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.statements = []
+
+
+# The stats of the request being handled on this thread. A ContextVar rather
+# than flask.g because the cursor hooks run for every statement, including
+# ones outside any request.
+request_stats = ContextVar('request_stats', default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_stats.get() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = request_stats.get()
+    starts = conn.info.get('query_start')
+    if stats is None or not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    # Drivers report row counts for client-side SELECTs (psycopg2 does,
+    # sqlite3 does not); server-side cursors report -1.
+    if cursor.rowcount > 0 and not executemany:
+        stats.rows += cursor.rowcount
+    stats.statements.append((elapsed, statement))
+
+
+def handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time.
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start'):
+        connection.info['query_start'].pop()
+
+
+_listeners_installed = False
+_listeners_lock = threading.Lock()
+
+
+def install_engine_listeners():
+    """Time every cursor execution on every engine; only requests with stats record anything."""
+    global _listeners_installed
+    with _listeners_lock:
+        if not _listeners_installed:
+            event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+            event.listen(Engine, 'handle_error', handle_error)
+            _listeners_installed = True
+
+
+class RequestMetrics:
+    """
+    Per-route request metrics, exposed in Prometheus text format on ``/metrics``.
+
+    Records latency, query count, database time, rows fetched and response
+    size per route, and logs requests slower than ``SLOW_REQUEST_MS`` with
+    their most expensive queries. Streamed responses are recorded when the
+    server closes them, so their numbers include generating the body.
+    Metrics live in the process, so each gunicorn worker reports its own.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        route = ('route', 'method')
+        self.requests = Counter('http_requests_total', 'HTTP requests by route, method and status.',
+                                ('route', 'method', 'status'))
+        self.latency = Histogram('http_request_duration_seconds', 'Time to build the response.', route)
+        self.db_time = Histogram('http_request_db_seconds', 'Time spent executing SQL per request.', route)
+        self.queries = Histogram('http_request_db_queries', 'SQL statements executed per request.', route,
+                                 QUERY_COUNT_BUCKETS)
+        self.rows = Counter('http_request_db_rows_total', 'Rows returned by SQL statements, as reported by the driver.',
+                            route)
+        self.response_bytes = Histogram('http_response_bytes', 'Response body size; streamed responses are not counted.',
+                                        route, RESPONSE_BYTES_BUCKETS)
+        self.slow_requests = Counter('http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.', route)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['request_metrics'] = self
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        self.slow_request_seconds = app.config.get('SLOW_REQUEST_MS', 0) / 1000
+        self.slow_request_top_queries = app.config.get('SLOW_REQUEST_TOP_QUERIES', 3)
+        install_engine_listeners()
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.clear_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view, methods=['GET'])
+
+    def start_request(self):
+        request_stats.set(RequestStats())
+
+    def clear_request(self, exc=None):
+        request_stats.set(None)
+
+    def finish_request(self, response):
+        stats = request_stats.get()
+        if stats is None:
+            return response
+        labels = (request.url_rule.rule if request.url_rule else 'unmatched', request.method)
+        status = str(response.status_code)
+        path = request.full_path.rstrip('?')
+        logger = current_app.logger
+        if response.is_streamed:
+            # The body is generated after this hook; statements run while it
+            # streams are still collected until the request is torn down.
+            response.call_on_close(lambda: self.record(labels, status, stats, None, path, logger))
+        else:
+            request_stats.set(None)
+            self.record(labels, status, stats, response.calculate_content_length() or 0, path, logger)
+        return response
+
+    def record(self, labels, status, stats, response_bytes, path, logger):
+        elapsed = time.perf_counter() - stats.start
+        with self._lock:
+            self.requests.inc(labels + (status,))
+            self.latency.observe(labels, elapsed)
+            self.db_time.observe(labels, stats.db_seconds)
+            self.queries.observe(labels, stats.queries)
+            if stats.rows:
+                self.rows.inc(labels, stats.rows)
+            if response_bytes is not None:
+                self.response_bytes.observe(labels, response_bytes)
+
+        if self.slow_request_seconds and elapsed >= self.slow_request_seconds:
+            with self._lock:
+                self.slow_requests.inc(labels)
+            self.log_slow_request(labels, elapsed, stats, path, logger)
+
+    def log_slow_request(self, labels, elapsed, stats, path, logger):
+        top = sorted(stats.statements, key=lambda entry: entry[0], reverse=True)
+        top = top[:self.slow_request_top_queries]
+        queries = '; '.join(f"{seconds * 1000:.1f}ms {' '.join(statement.split())[:200]}" for seconds, statement in top)
+        logger.warning(
+            "Slow request %s %s %s: %.1fms, %d queries, %.1fms in db, %d rows. Top queries: %s",
+            labels[1], path, labels[0], elapsed * 1000, stats.queries,
+            stats.db_seconds * 1000, stats.rows, queries or 'none',
+        )
+
+    def alert_lines(self):
+        dispatcher = current_app.extensions.get('alert_dispatcher')
+        if dispatcher is None:
+            return []
+        metrics = dispatcher.metrics()
+        lines = [
+            '# HELP alert_queue_depth Alerts waiting for delivery.',
+            '# TYPE alert_queue_depth gauge',
+            f"alert_queue_depth {metrics['queue_depth']}",
+            '# HELP alerts_total Alert dispatcher counters by event.',
+            '# TYPE alerts_total counter',
+        ]
+        lines.extend(f'alerts_total{{event="{name}"}} {metrics[name]}' for name in ALERT_COUNTERS)
+        lines.extend([
+            '# HELP alert_delivery_latency_max_seconds Slowest alert delivery so far.',
+            '# TYPE alert_delivery_latency_max_seconds gauge',
+            f"alert_delivery_latency_max_seconds {format_value(metrics['latency_seconds']['max'])}",
+        ])
+        return lines
+
+    def expose(self):
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.latency, self.db_time, self.queries, self.rows,
+                           self.response_bytes, self.slow_requests):
+                lines.extend(metric.expose())
+        lines.extend(self.alert_lines())
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return current_app.response_class(self.expose(), mimetype='text/plain; version=0.0.4')
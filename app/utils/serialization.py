@@ -0,0 +1,85 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used without it
+    orjson = None
+
+
+# A blotter response holds one trade date plus the few settlement dates its
+# Format 1 trades carry. The bound is for streamed responses, whose formatter
+# lives as long as the stream: dates past it are formatted on every row.
+ISO_CACHE_SIZE = 4096
+
+
+def make_iso_formatter():
+    """
+    Return a memoizing ``date -> 'YYYY-MM-DD'`` formatter (None stays None).
+
+    Blotter rows share a handful of trade and settlement dates, so each is
+    formatted once per response instead of once per row.
+    """
+    cache = {None: None}
+
+    def iso(value):
+        try:
+            return cache[value]
+        except KeyError:
+            pass
+        text = value.isoformat()
+        if len(cache) < ISO_CACHE_SIZE:
+            cache[value] = text
+        return text
+
+    return iso
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it is installed.
+
+    Output matches the default provider's: keys are sorted when
+    ``sort_keys`` is set, dates use ``http_date`` and decimals become strings
+    (both through ``default``), and debug responses are indented. orjson
+    writes UTF-8 rather than ``\\u`` escapes. Calls with stdlib ``json``
+    arguments, values orjson cannot encode (integers beyond 64 bits) and
+    installs without orjson go through the default provider.
+    """
+
+    def _options(self, indent=False):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _encode(self, obj, indent=False):
+        """``obj`` as UTF-8 JSON bytes, or None when orjson cannot encode it."""
+        if orjson is None:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(indent))
+        except orjson.JSONEncodeError:
+            # The default provider encodes big ints and raises the usual TypeError otherwise.
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            encoded = self._encode(obj)
+            if encoded is not None:
+                return encoded.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        encoded = self._encode(obj, indent)
+        if encoded is None:
+            return super().response(obj)
+        return self._app.response_class(encoded + b'\n', mimetype=self.mimetype)
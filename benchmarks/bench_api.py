@@ -0,0 +1,214 @@
+"""
+HTTP load driver for the read endpoints.
+
+Seeds a database with synthetic trades, serves the app on a local port and
+hits ``/api/blotter``, ``/api/positions`` and ``/api/alarms`` from a pool of
+client threads, reporting throughput, p50/p95/p99 latency and server RSS
+per endpoint.
+
+Usage:
+  python -m benchmarks.bench_api --rows 200000 --days 5 --requests 2000 --concurrency 8
+  python -m benchmarks.bench_api --database-url postgresql://... --json results.json
+  python -m benchmarks.bench_api --base-url http://localhost:8000 --dates 2025-01-15 --server-pid 1234
+
+Without --base-url the app runs in this process on werkzeug's threaded
+server, so the reported RSS includes the client threads. Against
+--base-url nothing is seeded; pass the --dates to query and, for RSS, the
+--server-pid of the server (read from /proc, Linux only). The response
+cache is disabled for the in-process server unless --cache is given.
+"""
+import argparse
+import http.client
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.datagen import business_days, generate
+from benchmarks.report import build_report, milliseconds, percentile, rss_bytes, write_report
+
+
+ENDPOINTS = ('blotter', 'positions', 'alarms')
+
+
+def seed(app, args, workdir):
+    from app.models import db
+    from app.services.inbox import ingest_directory
+
+    inbox = os.path.join(workdir, 'inbox')
+    generate(inbox, args.rows, args.accounts, args.tickers, args.days)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        results = ingest_directory(inbox, os.path.join(workdir, 'archive'), workers=1)
+    return sum(result['success'] for result in results)
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+class RssSampler:
+    """Polls the server's RSS in the background and keeps the peak."""
+
+    def __init__(self, pid=None, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = self.sample()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        return rss_bytes(self.pid)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = self.sample()
+            if current is not None:
+                self.peak = max(self.peak or 0, current)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def endpoint_path(endpoint, trade_date, limit):
+    params = {'date': trade_date}
+    if endpoint == 'blotter' and limit:
+        params['limit'] = limit
+    return f"/api/{endpoint}?{urlencode(params)}"
+
+
+def client(base_url, api_key, paths, latencies, errors, response_bytes):
+    """Issue each request in ``paths`` over one keep-alive connection."""
+    url = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(url.netloc, timeout=60)
+    headers = {'X-API-Key': api_key, 'Accept-Encoding': 'identity'}
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            errors.append(path)
+            continue
+        latencies.append(time.perf_counter() - start)
+        response_bytes.append(len(body))
+        if response.status != 200:
+            errors.append(path)
+    connection.close()
+
+
+def run_load(base_url, api_key, endpoint, dates, args, server_pid):
+    rng = random.Random(0)
+    paths = [endpoint_path(endpoint, rng.choice(dates), args.limit) for _ in range(args.requests)]
+    latencies, errors, response_bytes = [], [], []
+    chunks = [paths[i::args.concurrency] for i in range(args.concurrency)]
+    threads = [
+        threading.Thread(target=client, args=(base_url, api_key, chunk, latencies, errors, response_bytes))
+        for chunk in chunks
+    ]
+
+    with RssSampler(server_pid) as sampler:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': len(paths),
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': milliseconds(percentile(latencies, 50)),
+            'p95': milliseconds(percentile(latencies, 95)),
+            'p99': milliseconds(percentile(latencies, 99)),
+            'max': milliseconds(latencies[-1] if latencies else None),
+        },
+        'avg_response_bytes': round(sum(response_bytes) / len(response_bytes)) if response_bytes else 0,
+        'peak_rss_bytes': sampler.peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='trades to seed')
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--limit', type=int, default=None, help='page size for blotter requests')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--cache', action='store_true', help='keep the response cache enabled')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--base-url', default=None, help='load an already running server instead')
+    parser.add_argument('--dates', nargs='+', default=None, help='dates to query with --base-url')
+    parser.add_argument('--server-pid', type=int, default=None, help='pid to sample RSS from with --base-url')
+    parser.add_argument('--api-key', default=os.environ.get('API_KEY', 'dev-api-key-12345'))
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    params = {key: value for key, value in vars(args).items() if key not in ('json', 'database_url', 'api_key')}
+    if args.base_url:
+        if not args.dates:
+            parser.error('--dates is required with --base-url')
+        base_url, dates, server_pid = args.base_url, args.dates, args.server_pid
+    else:
+        os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+        os.environ.setdefault('ALERT_SINK', f"file:{os.path.join(tmpdir.name, 'alerts.jsonl')}")
+        os.environ['API_KEY'] = args.api_key
+        if not args.cache:
+            os.environ['RESPONSE_CACHE_ENABLED'] = 'false'
+
+        from app import create_app
+        app = create_app('production')
+        params['database'] = app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1]
+
+        start = time.perf_counter()
+        seeded = seed(app, args, tmpdir.name)
+        print(f"seeded {seeded} trades over {args.days} days in {time.perf_counter() - start:.1f}s")
+        dates = [day.isoformat() for day in business_days(date(2025, 1, 15), args.days)]
+        server, base_url = start_server(app)
+        server_pid = None
+
+    results = {}
+    for endpoint in args.endpoints:
+        result = run_load(base_url, args.api_key, endpoint, dates, args, server_pid)
+        results[endpoint] = result
+        latency = result['latency_ms']
+        print(f"{endpoint:>9}: {result['requests_per_second']:>8.1f} req/s  p50 {latency['p50']}ms  "
+              f"p95 {latency['p95']}ms  p99 {latency['p99']}ms  errors {result['errors']}  "
+              f"rss {(result['peak_rss_bytes'] or 0) / 2**20:.0f}MiB")
+
+    if args.json:
+        write_report(build_report('api', params, results), args.json)
+
+    if not args.base_url:
+        server.shutdown()
+    tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
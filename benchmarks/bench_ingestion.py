@@ -0,0 +1,108 @@
+"""
+Compare ingestion throughput of the ORM and bulk (COPY / executemany) paths.
+
+Usage:
+  python -m benchmarks.bench_ingestion --rows 200000
+  python -m benchmarks.bench_ingestion --rows 1000000 --database-url postgresql://...
+  python -m benchmarks.bench_ingestion --rows 1000000 --days 20 --workers 4 --json results.json
+
+Without --database-url a throwaway SQLite file is used, which exercises the
+executemany fallback rather than COPY. With --days the generated trades are
+also spread over one file per day and format and loaded through
+``ingest_directory``, the path ``manage.py ingest_dir`` takes.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.datagen import generate, make_file
+from benchmarks.report import build_report, peak_rss_bytes, write_report
+
+
+def reset_tables(app):
+    from app.models import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def run(app, file_content, file_format, method):
+    from app.models import Trade
+    from app.services.ingestion import ingest_file
+
+    reset_tables(app)
+    with app.app_context():
+        start = time.perf_counter()
+        success, errors = ingest_file(file_content, file_format, method=method)
+        elapsed = time.perf_counter() - start
+        assert errors == 0 and Trade.query.count() == success
+    return success, elapsed
+
+
+def run_directory(app, args, workdir):
+    from app.services.inbox import ingest_directory
+
+    inbox = os.path.join(workdir, 'inbox')
+    paths = generate(inbox, args.rows, args.accounts, args.tickers, args.days)
+    reset_tables(app)
+    with app.app_context():
+        start = time.perf_counter()
+        results = ingest_directory(inbox, os.path.join(workdir, 'archive'), workers=args.workers,
+                                   config_name='production')
+        elapsed = time.perf_counter() - start
+    rows = sum(result['success'] for result in results)
+    assert rows == args.rows, f"loaded {rows} of {args.rows} rows"
+    return {'files': len(paths), 'rows': rows, 'seconds': round(elapsed, 3), 'rows_per_second': round(rows / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--tickers', type=int, default=10)
+    parser.add_argument('--days', type=int, default=0, help='also load the rows as a multi-day inbox')
+    parser.add_argument('--workers', type=int, default=1, help='ingest_directory workers for --days')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    os.environ.setdefault('ALERT_SINK', f"file:{os.path.join(tmpdir.name, 'alerts.jsonl')}")
+
+    from app import create_app
+    app = create_app('production')
+
+    database = app.config['SQLALCHEMY_DATABASE_URI'].split('@')[-1]
+    print(f"database: {database}")
+    results = {}
+    for file_format in ('format1', 'format2'):
+        file_content = make_file(file_format, args.rows, args.accounts, args.tickers)
+        timings = {}
+        for method in ('orm', 'bulk'):
+            rows, elapsed = run(app, file_content, file_format, method)
+            timings[method] = {'rows': rows, 'seconds': round(elapsed, 3), 'rows_per_second': round(rows / elapsed)}
+            print(f"{file_format} {method:>4}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+        speedup = timings['orm']['seconds'] / timings['bulk']['seconds']
+        print(f"{file_format} speedup: {speedup:.1f}x")
+        results[file_format] = dict(timings, speedup=round(speedup, 2))
+
+    if args.days:
+        results['directory'] = run_directory(app, args, tmpdir.name)
+        directory = results['directory']
+        print(f"ingest_directory: {directory['rows']} rows in {directory['files']} files, "
+              f"{directory['seconds']:.2f}s ({directory['rows_per_second']:,} rows/s, {args.workers} workers)")
+
+    results['peak_rss_bytes'] = peak_rss_bytes()
+    if args.json:
+        params = {key: value for key, value in vars(args).items() if key not in ('json', 'database_url')}
+        params['database'] = database
+        write_report(build_report('ingestion', params, results), args.json)
+
+    tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
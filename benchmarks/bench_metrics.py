@@ -0,0 +1,113 @@
+"""
+Overhead of the request instrumentation (app/utils/metrics.py).
+
+Serves the same seeded SQLite database from two apps, one with
+METRICS_ENABLED and one without, through Flask's test client so network
+noise does not swamp the difference. Each round times both apps, in
+alternating order, and the median round per endpoint is compared.
+``/health`` (one trivial query) shows the fixed per-request cost.
+
+Usage:
+  python -m benchmarks.bench_metrics --rows 5000 --requests 100 --rounds 11
+"""
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.datagen import business_days, generate
+from benchmarks.report import build_report, write_report
+
+
+ENDPOINTS = ('health', 'blotter', 'positions', 'alarms')
+
+
+def make_app(database_url, metrics_enabled):
+    from app import create_app
+    from config import ProductionConfig, config
+
+    class BenchConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+        RESPONSE_CACHE_ENABLED = False
+        METRICS_ENABLED = metrics_enabled
+        SLOW_REQUEST_MS = 0
+
+    name = 'bench_metrics' if metrics_enabled else 'bench_no_metrics'
+    config[name] = BenchConfig
+    return create_app(name)
+
+
+def time_requests(app, paths):
+    client = app.test_client()
+    headers = {'X-API-Key': app.config['API_KEY']}
+    gc.collect()
+    start = time.perf_counter()
+    for path in paths:
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.status_code
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--tickers', type=int, default=50)
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=50, help='requests per endpoint per round')
+    parser.add_argument('--rounds', type=int, default=11)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    os.environ.setdefault('ALERT_SINK', f"file:{os.path.join(tmpdir.name, 'alerts.jsonl')}")
+    database_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    instrumented = make_app(database_url, True)
+    plain = make_app(database_url, False)
+
+    from app.models import db
+    from app.services.inbox import ingest_directory
+
+    inbox = os.path.join(tmpdir.name, 'inbox')
+    generate(inbox, args.rows, args.accounts, args.tickers, args.days)
+    with plain.app_context():
+        db.create_all()
+        ingest_directory(inbox, os.path.join(tmpdir.name, 'archive'), workers=1)
+
+    dates = [day.isoformat() for day in business_days(date(2025, 1, 15), args.days)]
+    results = {}
+    for endpoint in ENDPOINTS:
+        if endpoint == 'health':
+            paths = ['/health'] * args.requests
+        else:
+            paths = [f'/api/{endpoint}?date={dates[i % len(dates)]}' for i in range(args.requests)]
+        time_requests(plain, paths[:10])
+        time_requests(instrumented, paths[:10])
+        timings = {'plain': [], 'instrumented': []}
+        for round_number in range(args.rounds):
+            order = ('plain', 'instrumented') if round_number % 2 == 0 else ('instrumented', 'plain')
+            for name in order:
+                timings[name].append(time_requests(plain if name == 'plain' else instrumented, paths))
+        plain_time = statistics.median(timings['plain'])
+        instrumented_time = statistics.median(timings['instrumented'])
+        overhead = (instrumented_time / plain_time - 1) * 100
+        results[endpoint] = {
+            'plain_ms_per_request': round(plain_time * 1000 / args.requests, 3),
+            'instrumented_ms_per_request': round(instrumented_time * 1000 / args.requests, 3),
+            'overhead_pct': round(overhead, 2),
+        }
+        print(f"{endpoint:>9}: {results[endpoint]['plain_ms_per_request']:.3f}ms -> "
+              f"{results[endpoint]['instrumented_ms_per_request']:.3f}ms per request ({overhead:+.2f}%)")
+
+    if args.json:
+        write_report(build_report('metrics_overhead', {k: v for k, v in vars(args).items() if k != 'json'}, results),
+                     args.json)
+    tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
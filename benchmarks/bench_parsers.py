@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for the Format 1 / Format 2 parsers on the sample_data files.
+
+Compares the previous per-row ``strptime`` + ``float`` decoding with the
+fixed-layout date decoder and ``Decimal`` parsing now used by the parsers.
+
+Usage:
+  python -m benchmarks.bench_parsers --repeat 20000
+"""
+import argparse
+import csv
+import time
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+
+from app.services.ingestion import iter_format1_rows, iter_format2_rows
+
+
+SAMPLE_DIR = Path(__file__).resolve().parent.parent / 'sample_data'
+
+
+def legacy_format1_rows(lines):
+    for row in csv.DictReader(lines):
+        trade_date = datetime.strptime(row['TradeDate'], '%Y-%m-%d').date()
+        settlement_date = datetime.strptime(row['SettlementDate'], '%Y-%m-%d').date()
+        shares = float(row['Quantity'])
+        if row['TradeType'].upper() == 'SELL':
+            shares = -abs(shares)
+        yield (trade_date, row['AccountID'], row['Ticker'], shares, float(row['Price']),
+               row['TradeType'], settlement_date, None, None, 'format1')
+
+
+def legacy_format2_rows(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        parts = line.split('|')
+        trade_date = datetime.strptime(parts[0].strip(), '%Y%m%d').date()
+        yield (trade_date, parts[1].strip(), parts[2].strip(), float(parts[3].strip()),
+               None, None, None, float(parts[4].strip()), parts[5].strip(), 'format2')
+
+
+def load_sample(name, repeat, header):
+    lines = (SAMPLE_DIR / name).read_text().splitlines()
+    if header:
+        head, body = lines[:1], [line for line in lines[1:] if line.strip()]
+    else:
+        head, body = [], [line for line in lines if line.strip()]
+    return '\n'.join(head + body * repeat), len(body) * repeat
+
+
+def time_parser(parse, content):
+    start = time.perf_counter()
+    count = sum(1 for _ in parse(StringIO(content)))
+    return count, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parser micro-benchmark')
+    parser.add_argument('--repeat', type=int, default=20000,
+                        help='times to repeat the sample rows (10 rows per sample file)')
+    args = parser.parse_args()
+
+    cases = (
+        ('format1', 'format1_sample.csv', True, legacy_format1_rows, iter_format1_rows),
+        ('format2', 'format2_sample.txt', False, legacy_format2_rows, iter_format2_rows),
+    )
+    for name, sample, header, legacy, current in cases:
+        content, rows = load_sample(sample, args.repeat, header)
+        legacy_count, legacy_elapsed = time_parser(legacy, content)
+        current_count, current_elapsed = time_parser(current, content)
+        assert legacy_count == current_count == rows
+        print(f"{name} legacy:  {rows / legacy_elapsed:>12,.0f} rows/s")
+        print(f"{name} current: {rows / current_elapsed:>12,.0f} rows/s "
+              f"({legacy_elapsed / current_elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Compliance rule evaluation benchmark over synthetic positions.
+
+Compares the vectorized rule engine with per-account Python loops, first
+on the original 20% rule alone (which ``evaluate_rules`` runs as a loop
+too) and then with ticker limits, sector caps, a cash floor and account
+overrides. Positions arrive as the dicts
+``account_positions`` returns, so flattening them into arrays is part of
+the engine's measured cost.
+
+Usage:
+  python -m benchmarks.bench_rules --accounts 50000 --tickers 25
+"""
+import argparse
+import random
+import time
+
+from app.services.rules import RuleSet, evaluate_rules
+
+
+UNIVERSE = [f'T{i:03d}' for i in range(500)]
+SECTORS = ('TECH', 'ENERGY', 'HEALTH', 'FINANCE', 'INDUSTRIAL')
+
+
+def make_positions(accounts, tickers_per_account, seed=0):
+    rng = random.Random(seed)
+    positions = {}
+    for i in range(accounts):
+        tickers = rng.sample(UNIVERSE, tickers_per_account) + ['CASH']
+        values = {ticker: round(rng.uniform(100, 100000), 2) for ticker in sorted(tickers)}
+        positions[f'ACC{i:06d}'] = (sum(values.values()), values)
+    return positions
+
+
+def legacy_alarms(positions):
+    alarms, violations = {}, []
+    for account_id, (total_value, tickers) in positions.items():
+        account_violations = []
+        if total_value > 0:
+            for ticker, value in tickers.items():
+                percentage = (value / total_value) * 100
+                if percentage > 20.0:
+                    account_violations.append({'ticker': ticker, 'percentage': round(percentage, 2),
+                                               'market_value': round(value, 2)})
+        alarms[account_id] = bool(account_violations)
+        if account_violations:
+            violations.append({'account_id': account_id, 'violations': account_violations})
+    return alarms, violations
+
+
+def loop_rules(positions, rules):
+    """Every rule in the engine, written as a per-account, per-ticker Python loop."""
+    alarms, violations = {}, []
+    for account_id, (total_value, tickers) in positions.items():
+        override = rules.account_overrides.get(account_id, {})
+        max_pct = override.get('max_position_pct', rules.max_position_pct)
+        ticker_limits = {**rules.ticker_limits, **override.get('ticker_limits', {})}
+        sector_caps = {**rules.sector_caps, **override.get('sector_caps', {})}
+        min_cash = override.get('min_cash_pct', rules.min_cash_pct)
+        account_violations = []
+        if total_value > 0:
+            sector_weights, sector_values = {}, {}
+            cash_weight = cash_value = 0.0
+            for ticker, value in tickers.items():
+                percentage = (value / total_value) * 100
+                if ticker in rules.cash_tickers:
+                    cash_weight += percentage
+                    cash_value += value
+                elif percentage > ticker_limits.get(ticker, max_pct):
+                    account_violations.append({'ticker': ticker, 'percentage': round(percentage, 2),
+                                               'market_value': round(value, 2)})
+                sector = rules.sectors.get(ticker)
+                if sector in sector_caps:
+                    sector_weights[sector] = sector_weights.get(sector, 0.0) + percentage
+                    sector_values[sector] = sector_values.get(sector, 0.0) + value
+            for sector in sorted(sector_weights):
+                if sector_weights[sector] > sector_caps[sector]:
+                    account_violations.append({'rule': 'sector_cap', 'sector': sector,
+                                               'percentage': round(sector_weights[sector], 2),
+                                               'market_value': round(sector_values[sector], 2),
+                                               'limit': sector_caps[sector]})
+            if min_cash is not None and cash_weight < min_cash:
+                account_violations.append({'rule': 'min_cash', 'percentage': round(cash_weight, 2),
+                                           'market_value': round(cash_value, 2), 'limit': min_cash})
+        alarms[account_id] = bool(account_violations)
+        if account_violations:
+            violations.append({'account_id': account_id, 'violations': account_violations})
+    return alarms, violations
+
+
+def full_rules(accounts):
+    return RuleSet(
+        max_position_pct=15.0,
+        ticker_limits={'T000': 30.0, 'T001': 30.0},
+        sectors={ticker: SECTORS[i % len(SECTORS)] for i, ticker in enumerate(UNIVERSE)},
+        sector_caps={'TECH': 35.0, 'ENERGY': 30.0},
+        min_cash_pct=2.0,
+        cash_tickers=['CASH'],
+        account_overrides={f'ACC{i:06d}': {'max_position_pct': 25.0} for i in range(0, accounts, 100)},
+    )
+
+
+def timed(repeat, fn, *args):
+    """Best of ``repeat`` runs, so one-off allocation costs don't skew the comparison."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compliance rule engine benchmark')
+    parser.add_argument('--accounts', type=int, default=50000)
+    parser.add_argument('--tickers', type=int, default=25, help='tickers held per account')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the best is reported')
+    args = parser.parse_args()
+
+    positions = make_positions(args.accounts, args.tickers)
+
+    legacy, legacy_elapsed = timed(args.repeat, legacy_alarms, positions)
+    current, current_elapsed = timed(args.repeat, evaluate_rules, positions, RuleSet())
+    assert current == legacy
+    print(f"20% rule, legacy loop:  {legacy_elapsed:8.3f}s  ({args.accounts / legacy_elapsed:>10,.0f} accounts/s)")
+    print(f"20% rule, rule engine:  {current_elapsed:8.3f}s  ({args.accounts / current_elapsed:>10,.0f} accounts/s)")
+
+    rules = full_rules(args.accounts)
+    looped, looped_elapsed = timed(args.repeat, loop_rules, positions, rules)
+    (alarms, violations), full_elapsed = timed(args.repeat, evaluate_rules, positions, rules)
+    assert alarms == looped[0]
+    assert len(violations) == len(looped[1])
+    print(f"all rules, Python loop: {looped_elapsed:8.3f}s  ({args.accounts / looped_elapsed:>10,.0f} accounts/s)")
+    print(f"all rules, rule engine: {full_elapsed:8.3f}s  ({args.accounts / full_elapsed:>10,.0f} accounts/s, "
+          f"{sum(alarms.values()):,} in breach)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Blotter JSON serialization throughput, before and after the tuple serializer.
+
+``before`` is the previous path: a dict per ``Trade`` instance with
+``isoformat`` per row, encoded by Flask's default JSON provider. ``after``
+serializes ``blotter_rows`` tuples with memoized ISO dates and encodes with
+``FastJSONProvider`` (orjson when installed). Rows are built in memory, so
+only serialization and encoding are timed, not the query.
+
+Usage:
+  python -m benchmarks.bench_serialization --rows 1000000 --repeat 3
+"""
+import argparse
+import gc
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks.datagen import account_names, ticker_names
+from benchmarks.report import build_report, peak_rss_bytes, write_report
+
+
+def legacy_blotter_item(trade):
+    item = {
+        'date': trade.trade_date.isoformat(),
+        'account_id': trade.account_id,
+        'ticker': trade.ticker,
+        'shares': float(trade.shares),
+    }
+    if trade.file_format == 'format1':
+        item['price'] = float(trade.price) if trade.price else None
+        item['trade_type'] = trade.trade_type
+        item['settlement_date'] = trade.settlement_date.isoformat() if trade.settlement_date else None
+    elif trade.file_format == 'format2':
+        item['market_value'] = float(trade.market_value) if trade.market_value else None
+        item['source_system'] = trade.source_system
+    return item
+
+
+def make_rows(count, accounts, tickers, seed):
+    """``BLOTTER_ROW_COLUMNS`` tuples for one date, half Format 1 and half Format 2."""
+    rng = random.Random(seed)
+    account_ids = account_names(accounts)
+    symbols = ticker_names(tickers)
+    trade_date = date(2025, 1, 15)
+    settlement_date = trade_date + timedelta(days=2)
+    rows = []
+    for trade_id in range(1, count + 1):
+        shares = Decimal(rng.randint(1, 5000))
+        if trade_id % 2:
+            rows.append((trade_id, trade_date, rng.choice(account_ids), rng.choice(symbols), shares,
+                         Decimal(rng.randint(100, 100000)) / 100, 'BUY', settlement_date, None, None, 'format1'))
+        else:
+            rows.append((trade_id, trade_date, rng.choice(account_ids), rng.choice(symbols), shares, None, None,
+                         None, shares * rng.randint(100, 100000) / 100, 'CUSTODIAN_A', 'format2'))
+    return rows
+
+
+def to_trades(rows):
+    from app.models import Trade
+    from app.services.queries import BLOTTER_ROW_COLUMNS
+    return [Trade(**dict(zip(BLOTTER_ROW_COLUMNS, row))) for row in rows]
+
+
+def time_before(app, trades):
+    provider = DefaultJSONProvider(app)
+    start = time.perf_counter()
+    data = [legacy_blotter_item(trade) for trade in trades]
+    body = provider.response({'date': '2025-01-15', 'count': len(data), 'data': data}).get_data()
+    return time.perf_counter() - start, len(body)
+
+
+def time_after(app, rows):
+    from app.routes.api import blotter_row_serializer
+    from app.utils.serialization import FastJSONProvider
+    provider = FastJSONProvider(app)
+    start = time.perf_counter()
+    data = list(map(blotter_row_serializer(), rows))
+    body = provider.response({'date': '2025-01-15', 'count': len(data), 'data': data}).get_data()
+    return time.perf_counter() - start, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--accounts', type=int, default=10000)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many runs per path')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.utils import serialization
+    app = create_app('testing')
+
+    rows = make_rows(args.rows, args.accounts, args.tickers, args.seed)
+    with app.app_context():
+        trades = to_trades(rows)
+        results = {}
+        for name, run, source in (('before', time_before, trades), ('after', time_after, rows)):
+            timings = []
+            for _ in range(args.repeat):
+                gc.collect()
+                seconds, size = run(app, source)
+                timings.append(seconds)
+            best = min(timings)
+            results[name] = {
+                'seconds': round(best, 4),
+                'rows_per_second': round(args.rows / best),
+                'bytes': size,
+            }
+            print(f"{name:>6}: {best:.3f}s, {args.rows / best:,.0f} rows/s, {size / 1e6:.1f} MB")
+
+    speedup = results['before']['seconds'] / results['after']['seconds']
+    results['speedup'] = round(speedup, 2)
+    results['encoder'] = 'orjson' if serialization.orjson is not None else 'json'
+    results['peak_rss_bytes'] = peak_rss_bytes()
+    print(f"speedup: {speedup:.2f}x ({results['encoder']})")
+
+    if args.json:
+        write_report(build_report('blotter_serialization', {k: v for k, v in vars(args).items() if k != 'json'},
+                                  results), args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Concurrency per container of the gunicorn worker modes.
+
+Seeds a database, then for each mode starts gunicorn with ``gunicorn.conf.py``
+and drives it with two groups of keep-alive clients at once: ``slow`` clients
+fetching whole blotter dates and ``fast`` clients polling one account's
+positions and alarms, as the dashboards do. It reports throughput and latency per group, and the peak RSS of the
+whole gunicorn process tree (master and workers), so modes with the same
+worker count can be compared at equal memory.
+
+Modes are ``WORKERSxTHREADS``; ``4x1`` is the default sync deployment and
+``4x8`` the threaded one (GUNICORN_THREADS=8).
+
+Usage:
+  python -m benchmarks.bench_workers --modes 4x1 4x8 --rows 100000 --fast-clients 32 --slow-clients 4
+  python -m benchmarks.bench_workers --database-url postgresql://... --json workers.json
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from urllib.parse import urlencode
+
+from benchmarks.bench_api import RssSampler, client, endpoint_path, seed
+from benchmarks.datagen import account_names, business_days
+from benchmarks.report import build_report, milliseconds, percentile, rss_bytes, write_report
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+class TreeRssSampler(RssSampler):
+    """Peak RSS of a process and all of its children."""
+
+    def sample(self):
+        pids = [self.pid]
+        for pid in pids:
+            pids.extend(child_pids(pid))
+        return sum(rss_bytes(pid) or 0 for pid in pids)
+
+
+def start_gunicorn(mode, port, env, log_path):
+    workers, threads = mode.split('x')
+    env = {**env, 'GUNICORN_WORKERS': workers, 'GUNICORN_THREADS': threads,
+           'GUNICORN_BIND': f'127.0.0.1:{port}', 'GUNICORN_TIMEOUT': '120'}
+    with open(log_path, 'ab') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+            cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {process.returncode}; see {log_path}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                # Every worker imports the app; give the rest time to finish booting.
+                time.sleep(1)
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'gunicorn did not start; see {log_path}')
+
+
+def summarize(latencies, errors, elapsed, requests):
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': milliseconds(percentile(latencies, 50)),
+            'p95': milliseconds(percentile(latencies, 95)),
+            'p99': milliseconds(percentile(latencies, 99)),
+            'max': milliseconds(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def fast_path(rng, dates, accounts):
+    account_id = rng.choice(accounts)
+    if rng.random() < 0.5:
+        return f"/api/accounts/{account_id}/positions?{urlencode({'date': rng.choice(dates)})}"
+    return f"/api/alarms?{urlencode({'date': rng.choice(dates), 'account_id': account_id})}"
+
+
+def run_mode(base_url, api_key, dates, args, server_pid):
+    rng = random.Random(0)
+    accounts = account_names(args.accounts)
+    groups = {
+        'slow': [[endpoint_path('blotter', rng.choice(dates), None) for _ in range(args.slow_requests)]
+                 for _ in range(args.slow_clients)],
+        'fast': [[fast_path(rng, dates, accounts) for _ in range(args.fast_requests)]
+                 for _ in range(args.fast_clients)],
+    }
+    recorded = {name: ([], [], []) for name in groups}
+    threads = [
+        threading.Thread(target=client, args=(base_url, api_key, paths, *recorded[name]))
+        for name, clients in groups.items() for paths in clients
+    ]
+
+    with TreeRssSampler(server_pid) as sampler:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    result = {
+        name: summarize(recorded[name][0], recorded[name][1], elapsed, sum(map(len, clients)))
+        for name, clients in groups.items()
+    }
+    result['seconds'] = round(elapsed, 3)
+    result['peak_rss_bytes'] = sampler.peak
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', nargs='+', default=['4x1', '4x8'], help='WORKERSxTHREADS per run')
+    parser.add_argument('--rows', type=int, default=100000, help='trades to seed')
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--slow-clients', type=int, default=4)
+    parser.add_argument('--slow-requests', type=int, default=5, help='whole-date blotter requests per slow client')
+    parser.add_argument('--fast-clients', type=int, default=32)
+    parser.add_argument('--fast-requests', type=int, default=50, help='account positions/alarms requests per fast client')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--api-key', default=os.environ.get('API_KEY', 'dev-api-key-12345'))
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    env = {
+        **os.environ,
+        'FLASK_ENV': 'production',
+        'DATABASE_URL': args.database_url or f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}",
+        'ALERT_SINK': f"file:{os.path.join(tmpdir.name, 'alerts.jsonl')}",
+        'API_KEY': args.api_key,
+        'RESPONSE_CACHE_ENABLED': 'false',
+        'CONDITIONAL_REQUESTS_ENABLED': 'false',
+        'LOG_LEVEL': 'WARNING',
+    }
+    os.environ.update(env)
+
+    from app import create_app
+    app = create_app('production')
+    start = time.perf_counter()
+    seeded = seed(app, args, tmpdir.name)
+    print(f"seeded {seeded} trades over {args.days} days in {time.perf_counter() - start:.1f}s")
+    dates = [day.isoformat() for day in business_days(date(2025, 1, 15), args.days)]
+
+    results = {}
+    for mode in args.modes:
+        process = start_gunicorn(mode, args.port, env, os.path.join(tmpdir.name, 'gunicorn.log'))
+        try:
+            result = run_mode(f'http://127.0.0.1:{args.port}', args.api_key, dates, args, process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+        results[mode] = result
+        fast, slow = result['fast'], result['slow']
+        print(f"{mode:>6}: fast {fast['requests_per_second']:>7.1f} req/s p50 {fast['latency_ms']['p50']}ms "
+              f"p99 {fast['latency_ms']['p99']}ms | slow {slow['requests_per_second']:>5.1f} req/s "
+              f"p50 {slow['latency_ms']['p50']}ms | errors {fast['errors'] + slow['errors']} | "
+              f"rss {result['peak_rss_bytes'] / 2**20:.0f}MiB")
+
+    if args.json:
+        params = {key: value for key, value in vars(args).items() if key not in ('json', 'database_url', 'api_key')}
+        write_report(build_report('workers', params, results), args.json)
+    tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Synthetic trade files in both feed formats.
+
+Trades are spread evenly over ``days`` business days starting at
+``--start``, drawn from ``accounts`` accounts and ``tickers`` tickers, with
+one file per day and format in the output directory (the way files arrive
+over SFTP).
+
+Usage:
+  python -m benchmarks.datagen --out /tmp/inbox --accounts 5000 --tickers 200 --rows 1000000 --days 20
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+
+FORMAT1_HEADER = 'TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate'
+FORMATS = ('format1', 'format2')
+
+
+def business_days(start, days):
+    current = start
+    result = []
+    while len(result) < days:
+        if current.weekday() < 5:
+            result.append(current)
+        current += timedelta(days=1)
+    return result
+
+
+def ticker_names(tickers):
+    return [f'T{i:04d}' for i in range(tickers)]
+
+
+def account_names(accounts):
+    return [f'ACC{i:06d}' for i in range(accounts)]
+
+
+def format1_lines(trade_date, rows, accounts, tickers, rng):
+    settlement = (trade_date + timedelta(days=2)).isoformat()
+    day = trade_date.isoformat()
+    yield FORMAT1_HEADER
+    for _ in range(rows):
+        yield (
+            f"{day},{rng.choice(accounts)},{rng.choice(tickers)},{rng.randint(1, 1000)},"
+            f"{rng.uniform(10, 900):.2f},{'SELL' if rng.random() < 0.3 else 'BUY'},{settlement}"
+        )
+
+
+def format2_lines(trade_date, rows, accounts, tickers, rng):
+    day = trade_date.strftime('%Y%m%d')
+    for _ in range(rows):
+        shares = rng.randint(-1000, 1000)
+        yield (
+            f"{day}|{rng.choice(accounts)}|{rng.choice(tickers)}|{shares}|"
+            f"{shares * rng.uniform(10, 900):.2f}|CUSTODIAN_{rng.choice('ABC')}"
+        )
+
+
+LINE_GENERATORS = {'format1': format1_lines, 'format2': format2_lines}
+
+
+def make_file(file_format, rows, accounts=5000, tickers=10, trade_date=date(2025, 1, 15), seed=0):
+    """One file's content as a string."""
+    rng = random.Random(seed)
+    lines = LINE_GENERATORS[file_format](trade_date, rows, account_names(accounts), ticker_names(tickers), rng)
+    return '\n'.join(lines) + '\n'
+
+
+def generate(out_dir, rows, accounts=5000, tickers=200, days=1, formats=FORMATS, start=date(2025, 1, 15), seed=0):
+    """
+    Write ``rows`` trades split over ``days`` and ``formats`` into ``out_dir``.
+
+    Format 1 files are named ``<date>_format1.csv`` and Format 2 files
+    ``<date>_format2.txt``, which ``manage.py ingest_dir`` detects. Returns
+    the written paths.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    account_list = account_names(accounts)
+    ticker_list = ticker_names(tickers)
+    rng = random.Random(seed)
+
+    files = [(trade_date, file_format) for trade_date in business_days(start, days) for file_format in formats]
+    per_file, remainder = divmod(rows, len(files))
+    paths = []
+    for i, (trade_date, file_format) in enumerate(files):
+        count = per_file + (1 if i < remainder else 0)
+        suffix = 'csv' if file_format == 'format1' else 'txt'
+        path = out_dir / f"{trade_date:%Y%m%d}_{file_format}.{suffix}"
+        with open(path, 'w', newline='') as f:
+            for line in LINE_GENERATORS[file_format](trade_date, count, account_list, ticker_list, rng):
+                f.write(line + '\n')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic trade files')
+    parser.add_argument('--out', required=True, help='directory to write the files into')
+    parser.add_argument('--rows', type=int, default=100000, help='total trades across all files')
+    parser.add_argument('--accounts', type=int, default=5000)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--days', type=int, default=1, help='business days to spread the trades over')
+    parser.add_argument('--start', type=date.fromisoformat, default=date(2025, 1, 15))
+    parser.add_argument('--formats', choices=('format1', 'format2', 'both'), default='both')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    formats = FORMATS if args.formats == 'both' else (args.formats,)
+    paths = generate(args.out, args.rows, args.accounts, args.tickers, args.days, formats, args.start, args.seed)
+    print(f"Wrote {args.rows} trades to {len(paths)} files in {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Machine-readable benchmark output.
+
+Every benchmark that takes ``--json`` writes one document with the
+benchmark name, its parameters, the environment it ran in and its results,
+so runs can be archived and compared across commits.
+"""
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def rss_bytes(pid=None):
+    """Current resident set size of ``pid`` (default: this process) from /proc, or None off Linux."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def milliseconds(seconds):
+    """``seconds`` in milliseconds, rounded for reports; None stays None."""
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def build_report(name, params, results):
+    return {
+        'benchmark': name,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'params': params,
+        'results': results,
+    }
+
+
+def write_report(report, path):
+    """Write ``report`` as JSON to ``path``, or to stdout for ``-``."""
+    text = json.dumps(report, indent=2, default=str)
+    if path == '-':
+        print(text)
+    else:
+        Path(path).write_text(text + '\n')
+        print(f"Wrote {path}")
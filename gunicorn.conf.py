@@ -0,0 +1,27 @@
+"""
+gunicorn settings, from the environment.
+
+  GUNICORN_WORKERS   worker processes (default 4)
+  GUNICORN_THREADS   request threads per worker (default 1). Above 1 gunicorn
+                     runs its threaded (gthread) workers: a slow request ties
+                     up one thread instead of a whole worker, and the
+                     connections waiting on Postgres release the GIL.
+  GUNICORN_TIMEOUT   seconds before a silent worker is restarted (default 30)
+  GUNICORN_BIND      address to listen on (default 0.0.0.0:5000)
+
+Each thread may hold a database connection, so with threads the pool size
+defaults to the thread count unless DB_POOL_SIZE is set.
+"""
+import os
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+if threads > 1:
+    worker_class = 'gthread'
+    # The app reads DB_POOL_SIZE when each worker imports it, after this file runs.
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
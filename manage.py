@@ -1,8 +1,20 @@
 from app import create_app
-from app.models import db, Trade
-from app.services.ingestion import ingest_file_from_path
+from app.models import db, ComplianceState, DateVersion, IngestionLedger, PositionSnapshot, Trade
+from app.partitions import DEFAULT_MONTHS_AHEAD, detach_partitions, ensure_partitions, migrate_to_partitioned
+from app.schema import upgrade_schema
+from app.services.compliance import notify_transitions, rebuild_compliance
+from app.services.snapshots import rebuild_snapshots
+from app.services.inbox import format_summary, ingest_directory
+from app.services.ingestion import INGEST_METHODS, ingest_file_from_path
+from app.services.ingestion_runs import recent_runs, summarize_runs
+from config import config
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
+import json
+import os
 import sys
+import time
 
 BASE_DIR = Path(__file__).resolve().parent
 SAMPLE_DIR = BASE_DIR / "sample_data"
@@ -10,7 +22,7 @@ SAMPLE_DIR = BASE_DIR / "sample_data"
 def init_db():
     app = create_app()
     with app.app_context():
-        db.create_all()
+        upgrade_schema()
         print("Database initialized successfully!")
 
 
@@ -35,29 +47,211 @@ def clear_data():
         confirm = input("Are you sure you want to delete all data? Type 'yes' to continue: ")
         if confirm.lower() == 'yes':
             Trade.query.delete()
+            IngestionLedger.query.delete()
+            PositionSnapshot.query.delete()
+            ComplianceState.query.delete()
+            # Bump rather than delete versions so cached responses for the old data can never match again.
+            DateVersion.query.update({DateVersion.version: DateVersion.version + 1})
             db.session.commit()
             print("All data has been cleared.")
         else:
             print("Operation cancelled.")
 
-def ingest_file_cli(file_path: str, file_format: str):
+def ingest_file_cli(file_path: str, file_format: str, method: str = 'bulk'):
     """
     CLI helper to ingest a single file into the database.
 
     Usage:
       python manage.py ingest_file /path/to/file.csv format1
       python manage.py ingest_file /path/to/file.txt format2
+      python manage.py ingest_file /path/to/file.txt format2 orm
     """
     app = create_app()
     with app.app_context():
-        success, error = ingest_file_from_path(file_path, file_format)
-        print(f"Ingested {file_path} as {file_format}: {success} successes, {error} errors")
+        success, error = ingest_file_from_path(file_path, file_format, method=method)
+        print(f"Ingested {file_path} as {file_format} ({method}): {success} successes, {error} errors")
 
 
+def ingest_dir_cli(inbox_dir: str, archive_dir: str, workers: int = None):
+    """
+    CLI helper to ingest every file in an inbox directory in parallel.
+
+    Formats are detected per file; files whose load committed are moved to
+    the archive directory, failures stay in the inbox for the next run.
+
+    Usage:
+      python manage.py ingest_dir /sftp/inbox /sftp/uploads
+      python manage.py ingest_dir /sftp/inbox /sftp/uploads 8
+    """
+    config_name = os.getenv('FLASK_ENV', 'development')
+    if workers is None:
+        workers = config[config_name].INGEST_WORKERS
+
+    start = time.perf_counter()
+    if workers <= 1:
+        with create_app(config_name).app_context():
+            results = ingest_directory(inbox_dir, archive_dir, workers=1)
+    else:
+        # Workers build their own app; none is created here so nothing is
+        # connected when the pool forks.
+        results = ingest_directory(inbox_dir, archive_dir, workers=workers, config_name=config_name)
+    print(format_summary(results, time.perf_counter() - start))
+    if any(result['status'] == 'failed' for result in results):
+        sys.exit(1)
+
+
+
+def ingest_stats_cli(limit: int = 100):
+    """
+    Summarize throughput and per-stage time share over the latest ingestion runs.
+
+    Usage:
+      python manage.py ingest_stats
+      python manage.py ingest_stats 500
+    """
+    app = create_app()
+    with app.app_context():
+        print(summarize_runs(recent_runs(limit)))
+
+
+def rebuild_snapshots_cli(date_strings):
+    """
+    Recompute position snapshots from the trades table, then the compliance
+    state derived from them. No alerts are sent for the changes this finds.
+
+    Usage:
+      python manage.py rebuild_snapshots
+      python manage.py rebuild_snapshots 2025-01-15 2025-01-16
+    """
+    dates = None
+    if date_strings:
+        try:
+            dates = [date.fromisoformat(date_string) for date_string in date_strings]
+        except ValueError:
+            print("Dates must be YYYY-MM-DD")
+            sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        rebuild_snapshots(dates)
+        transitions = rebuild_compliance(dates)
+        db.session.commit()
+        print(f"Rebuilt position snapshots for {'all dates' if dates is None else ', '.join(date_strings)}")
+        print(f"Compliance state changed for {len(transitions)} account/date pairs")
+
+
+def evaluate_compliance_cli(date_strings):
+    """
+    Re-evaluate every account against the current rules and alert on changes.
+
+    Run after editing COMPLIANCE_RULES_FILE, or from cron.
+
+    Usage:
+      python manage.py evaluate_compliance
+      python manage.py evaluate_compliance 2025-01-15 2025-01-16
+    """
+    dates = None
+    if date_strings:
+        try:
+            dates = [date.fromisoformat(date_string) for date_string in date_strings]
+        except ValueError:
+            print("Dates must be YYYY-MM-DD")
+            sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        transitions = rebuild_compliance(dates)
+        db.session.commit()
+        notify_transitions(transitions)
+        print(f"Evaluated compliance in {time.perf_counter() - started:.2f}s; "
+              f"{len(transitions)} account/date pairs changed state")
+
+
+def partition_trades_cli(months_ahead: int = DEFAULT_MONTHS_AHEAD):
+    """
+    Convert trades into a table partitioned by month on trade_date (Postgres).
+
+    Usage:
+      python manage.py partition_trades [months_ahead]
+    """
+    app = create_app()
+    with app.app_context():
+        try:
+            copied = migrate_to_partitioned(months_ahead)
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        print(f"Partitioned trades; {copied} rows moved")
+
+
+def create_partitions_cli(months_ahead: int = DEFAULT_MONTHS_AHEAD):
+    """
+    Pre-create monthly partitions through ``months_ahead`` months from now. Meant for cron.
+
+    Usage:
+      python manage.py create_partitions [months_ahead]
+    """
+    app = create_app()
+    with app.app_context():
+        try:
+            created = ensure_partitions(months_ahead)
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        print(f"Created partitions: {', '.join(created)}" if created else "All partitions already exist")
+
+
+def detach_partitions_cli(before: str, archive_schema: str = None):
+    """
+    Detach the monthly partitions for every month before the given one.
+
+    Usage:
+      python manage.py detach_partitions 2024-01 [archive_schema]
+    """
+    try:
+        cutoff = date.fromisoformat(f"{before}-01")
+    except ValueError:
+        print("Month must be YYYY-MM")
+        sys.exit(1)
+
+    app = create_app()
+    with app.app_context():
+        try:
+            detached = detach_partitions(cutoff, archive_schema)
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        where = f" into schema {archive_schema}" if archive_schema else ""
+        print(f"Detached{where}: {', '.join(detached)}" if detached else "No partitions to detach")
+
+
+def alert_sink_server_cli(port: int = 8099):
+    """
+    Local stand-in for an alert webhook: prints every batch it receives.
+
+    Usage:
+      python manage.py alert_sink_server [port]
+      ALERT_SINK=http://localhost:8099/alerts flask run
+    """
+    class AlertHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            for payload in json.loads(body):
+                print(f"[ALERT RECEIVED] {json.dumps(payload)}")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"Listening for alerts on http://localhost:{port}/alerts")
+    HTTPServer(('', port), AlertHandler).serve_forever()
+
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Usage: python manage.py [init_db|load_sample|clear_data|ingest_file]")
+        print("Usage: python manage.py [init_db|load_sample|clear_data|ingest_file|ingest_dir|ingest_stats|rebuild_snapshots|evaluate_compliance|partition_trades|create_partitions|detach_partitions|alert_sink_server]")
         sys.exit(1)
 
     command = sys.argv[1]
@@ -69,12 +263,36 @@ if __name__ == '__main__':
     elif command == 'clear_data':
         clear_data()
     elif command == 'ingest_file':
-        if len(sys.argv) != 4:
-            print("Usage: python manage.py ingest_file <file_path> <format1|format2>")
+        if len(sys.argv) not in (4, 5) or (len(sys.argv) == 5 and sys.argv[4] not in INGEST_METHODS):
+            print("Usage: python manage.py ingest_file <file_path> <format1|format2> [bulk|orm]")
             sys.exit(1)
         file_path = sys.argv[2]
         file_format = sys.argv[3]
-        ingest_file_cli(file_path, file_format)
+        method = sys.argv[4] if len(sys.argv) == 5 else 'bulk'
+        ingest_file_cli(file_path, file_format, method)
+    elif command == 'ingest_dir':
+        if len(sys.argv) not in (4, 5):
+            print("Usage: python manage.py ingest_dir <inbox_dir> <archive_dir> [workers]")
+            sys.exit(1)
+        workers = int(sys.argv[4]) if len(sys.argv) == 5 else None
+        ingest_dir_cli(sys.argv[2], sys.argv[3], workers)
+    elif command == 'ingest_stats':
+        ingest_stats_cli(int(sys.argv[2]) if len(sys.argv) > 2 else 100)
+    elif command == 'rebuild_snapshots':
+        rebuild_snapshots_cli(sys.argv[2:])
+    elif command == 'evaluate_compliance':
+        evaluate_compliance_cli(sys.argv[2:])
+    elif command == 'partition_trades':
+        partition_trades_cli(int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MONTHS_AHEAD)
+    elif command == 'create_partitions':
+        create_partitions_cli(int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MONTHS_AHEAD)
+    elif command == 'detach_partitions':
+        if len(sys.argv) not in (3, 4):
+            print("Usage: python manage.py detach_partitions <YYYY-MM> [archive_schema]")
+            sys.exit(1)
+        detach_partitions_cli(sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None)
+    elif command == 'alert_sink_server':
+        alert_sink_server_cli(int(sys.argv[2]) if len(sys.argv) > 2 else 8099)
     else:
         print("Unknown command:", command)
         sys.exit(1)
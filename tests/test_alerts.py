@@ -0,0 +1,131 @@
+import json
+import threading
+from datetime import date
+
+import pytest
+
+from app import create_app
+from app.services.alerts import AlertDispatcher, FileSink, HttpSink, LogSink, make_sink, send_violation_alert
+
+
+class RecordingSink:
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.delivered = threading.Event()
+
+    def send(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('sink unavailable')
+        self.batches.append(batch)
+        self.delivered.set()
+
+
+def _payload(account_id, trade_date='2025-01-15', violations=None):
+    return {'account_id': account_id, 'trade_date': trade_date, 'violations': violations or []}
+
+
+def test_dispatcher_batches_and_coalesces_per_account_and_date():
+    sink = RecordingSink()
+    dispatcher = AlertDispatcher(sink, batch_size=2)
+    dispatcher._ensure_started = lambda: None
+    
+    dispatcher.submit(_payload('ACC1', violations=['old']))
+    dispatcher.submit(_payload('ACC2'))
+    dispatcher.submit(_payload('ACC1', violations=['new']))
+    dispatcher.submit(_payload('ACC1', trade_date='2025-01-16'))
+    assert dispatcher.metrics()['queue_depth'] == 3
+    
+    dispatcher.flush()
+    
+    assert [[p['account_id'] for p in batch] for batch in sink.batches] == [['ACC1', 'ACC2'], ['ACC1']]
+    assert sink.batches[0][0]['violations'] == ['new']
+    metrics = dispatcher.metrics()
+    assert metrics['queue_depth'] == 0
+    assert metrics['coalesced'] == 1
+    assert metrics['delivered'] == 3
+    assert metrics['batches'] == 2
+
+
+def test_dispatcher_drops_when_queue_is_full():
+    dispatcher = AlertDispatcher(RecordingSink(), max_queue=1)
+    dispatcher._ensure_started = lambda: None
+    
+    assert dispatcher.submit(_payload('ACC1')) is True
+    assert dispatcher.submit(_payload('ACC2')) is False
+    assert dispatcher.metrics()['dropped'] == 1
+
+
+def test_dispatcher_retries_with_backoff():
+    sleeps = []
+    sink = RecordingSink(failures=2)
+    dispatcher = AlertDispatcher(sink, max_retries=3, backoff=0.5, sleep=sleeps.append)
+    dispatcher._ensure_started = lambda: None
+    
+    dispatcher.submit(_payload('ACC1'))
+    dispatcher.flush()
+    
+    assert sleeps == [0.5, 1.0]
+    assert len(sink.batches) == 1
+    assert dispatcher.metrics()['retries'] == 2
+
+
+def test_dispatcher_gives_up_after_max_retries():
+    dispatcher = AlertDispatcher(RecordingSink(failures=10), max_retries=1, sleep=lambda _: None)
+    dispatcher._ensure_started = lambda: None
+    
+    dispatcher.submit(_payload('ACC1'))
+    dispatcher.flush()
+    
+    metrics = dispatcher.metrics()
+    assert metrics['failed'] == 1
+    assert metrics['delivered'] == 0
+
+
+def test_background_worker_delivers():
+    sink = RecordingSink()
+    dispatcher = AlertDispatcher(sink, flush_interval=0.05)
+    
+    dispatcher.submit(_payload('ACC1'))
+    assert sink.delivered.wait(5)
+    dispatcher.stop()
+    
+    assert sink.batches[0][0]['account_id'] == 'ACC1'
+    assert dispatcher.metrics()['latency_seconds']['max'] >= 0
+
+
+def test_make_sink(tmp_path):
+    assert isinstance(make_sink('log'), LogSink)
+    assert isinstance(make_sink('http://localhost:9999/alerts'), HttpSink)
+    file_sink = make_sink(f'file:{tmp_path / "alerts.jsonl"}')
+    assert isinstance(file_sink, FileSink)
+    
+    file_sink.send([_payload('ACC1'), _payload('ACC2')])
+    lines = (tmp_path / 'alerts.jsonl').read_text().splitlines()
+    assert [json.loads(line)['account_id'] for line in lines] == ['ACC1', 'ACC2']
+    
+    with pytest.raises(ValueError):
+        make_sink('smtp://mail')
+
+
+def test_send_violation_alert_queues_when_async(tmp_path):
+    app = create_app('testing')
+    app.config.update(ALERTS_ASYNC=True, ALERT_SINK=f'file:{tmp_path / "alerts.jsonl"}')
+    from app.services.alerts import init_alerts
+    dispatcher = init_alerts(app)
+    
+    with app.app_context():
+        send_violation_alert('ACC1', [{'ticker': 'AAPL'}], trade_date=date(2025, 1, 15))
+    dispatcher.stop()
+    
+    payload = json.loads((tmp_path / 'alerts.jsonl').read_text())
+    assert payload['account_id'] == 'ACC1'
+    assert payload['trade_date'] == '2025-01-15'
+    assert payload['type'] == 'POSITION_LIMIT_VIOLATION'
+
+
+def test_alert_metrics_endpoint(client, api_headers):
+    response = client.get('/api/alerts/metrics', headers=api_headers)
+    assert response.status_code == 200
+    assert response.get_json() == {'async': False}
@@ -1,5 +1,17 @@
+import json
 from datetime import date
-from app.models import db, Trade
+from app.models import db, PositionSnapshot, Trade
+from app.services.ingestion import ingest_file
+from app.services.compliance import rebuild_compliance
+from app.services.snapshots import PositionDeltas, apply_deltas, rebuild_snapshots
+
+
+def commit_trades():
+    """Commit seeded trades and derive snapshots and compliance state, as ingestion would."""
+    db.session.commit()
+    rebuild_snapshots()
+    rebuild_compliance()
+    db.session.commit()
 
 
 def test_health_endpoint(client):
@@ -106,7 +118,7 @@ def test_positions_with_data(app, client, api_headers):
         ]
         for trade in trades:
             db.session.add(trade)
-        db.session.commit()
+        commit_trades()
     
     response = client.get('/api/positions?date=2025-01-15', headers=api_headers)
     assert response.status_code == 200
@@ -150,7 +162,7 @@ def test_positions_multiple_accounts(app, client, api_headers):
         ]
         for trade in trades:
             db.session.add(trade)
-        db.session.commit()
+        commit_trades()
     
     response = client.get('/api/positions?date=2025-01-15', headers=api_headers)
     assert response.status_code == 200
@@ -209,7 +221,7 @@ def test_alarms_no_violations(app, client, api_headers):
         ]
         for trade in trades:
             db.session.add(trade)
-        db.session.commit()
+        commit_trades()
     
     response = client.get('/api/alarms?date=2025-01-15', headers=api_headers)
     assert response.status_code == 200
@@ -243,7 +255,7 @@ def test_alarms_with_violations(app, client, api_headers):
         ]
         for trade in trades:
             db.session.add(trade)
-        db.session.commit()
+        commit_trades()
     
     response = client.get('/api/alarms?date=2025-01-15', headers=api_headers)
     assert response.status_code == 200
@@ -275,44 +287,357 @@ def test_alarms_empty_date(client, api_headers):
     assert data['alarms'] == {}
 
 def test_alarms_triggers_alerts(app, client, api_headers, monkeypatch):
-    """Ensure that send_violation_alert is called when there are violations."""
+    """Ingestion alerts once when an account enters violation and once when it clears; reads never alert."""
     called = []
 
-    def fake_send_violation_alert(account_id, violations):
-        called.append((account_id, violations))
+    def fake_send_violation_alert(account_id, violations, trade_date=None):
+        called.append((account_id, violations, trade_date))
 
-    monkeypatch.setattr('app.routes.api.send_violation_alert', fake_send_violation_alert)
+    cleared = []
+    monkeypatch.setattr('app.services.compliance.send_violation_alert', fake_send_violation_alert)
+    monkeypatch.setattr('app.services.compliance.send_cleared_alert',
+                        lambda account_id, trade_date=None: cleared.append((account_id, trade_date)))
 
     with app.app_context():
-        trades = [
-            Trade(
-                trade_date=date(2025, 1, 15),
-                account_id='ACC_ALERT',
-                ticker='AAPL',
-                shares=500,
-                market_value=90000.00,
-                source_system='CUSTODIAN_X',
-                file_format='format2'
-            ),
-            Trade(
-                trade_date=date(2025, 1, 15),
-                account_id='ACC_ALERT',
-                ticker='MSFT',
-                shares=100,
-                market_value=10000.00,
-                source_system='CUSTODIAN_X',
-                file_format='format2'
-            ),
-        ]
-        db.session.add_all(trades)
-        db.session.commit()
-
-    response = client.get('/api/alarms?date=2025-01-15', headers=api_headers)
-    assert response.status_code == 200
+        ingest_file("""20250115|ACC_ALERT|AAPL|500|90000.00|CUSTODIAN_X
+20250115|ACC_ALERT|MSFT|100|10000.00|CUSTODIAN_X""", 'format2')
 
     assert len(called) == 1
-    account_id, violations = called[0]
+    account_id, violations, trade_date = called[0]
     assert account_id == 'ACC_ALERT'
-    assert len(violations) >= 1
+    assert trade_date == date(2025, 1, 15)
     tickers = {v['ticker'] for v in violations}
     assert 'AAPL' in tickers
+
+    for _ in range(2):
+        response = client.get('/api/alarms?date=2025-01-15', headers=api_headers)
+        assert response.status_code == 200
+        assert response.get_json()['alarms'] == {'ACC_ALERT': True}
+    assert len(called) == 1
+
+    with app.app_context():
+        ingest_file("20250115|ACC_ALERT|AAPL|1|1000.00|CUSTODIAN_X", 'format2')
+    assert len(called) == 1
+
+    with app.app_context():
+        ingest_file("\n".join(
+            f"20250115|ACC_ALERT|T{i}|100|100000.00|CUSTODIAN_X" for i in range(10)
+        ), 'format2')
+    assert len(called) == 1
+    assert cleared == [('ACC_ALERT', date(2025, 1, 15))]
+    assert client.get('/api/alarms?date=2025-01-15', headers=api_headers).get_json()['alarms'] == {'ACC_ALERT': False}
+
+
+def _seed_mixed_trades():
+    rows = [
+        ('ACC9', 'MSFT', 10, 101.13, None), ('ACC1', 'AAPL', 3, 185.55, None), ('ACC9', 'AAPL', 7, 33.33, None),
+        ('ACC1', 'TSLA', 5, None, 1000.07), ('ACC9', 'MSFT', -2, 99.99, None), ('ACC5', 'NVDA', 0, 505.3, None),
+        ('ACC1', 'NVDA', 1, None, None), ('ACC9', 'GOOGL', 4, None, 555.55), ('ACC1', 'AAPL', 1, 185.5, None),
+    ] + [('ACC7', ticker, 1, None, 1) for ticker in 'XYZWVU']
+    for account_id, ticker, shares, price, market_value in rows:
+        db.session.add(Trade(
+            trade_date=date(2025, 1, 15),
+            account_id=account_id,
+            ticker=ticker,
+            shares=shares,
+            price=price,
+            market_value=market_value,
+            file_format='format2' if market_value is not None else 'format1'
+        ))
+    db.session.add(Trade(trade_date=date(2025, 1, 16), account_id='ACC1', ticker='AAPL', shares=1, price=1,
+                         file_format='format1'))
+    commit_trades()
+
+
+def test_positions_and_alarms_payloads_are_stable(app, client, api_headers, monkeypatch):
+    """Byte-for-byte output of the Python aggregation that SQL grouping replaced."""
+    monkeypatch.setattr('app.services.compliance.send_violation_alert', lambda account_id, violations, trade_date=None: None)
+    with app.app_context():
+        _seed_mixed_trades()
+    
+    response = client.get('/api/positions?date=2025-01-15', headers=api_headers)
+    assert response.data == (
+        b'{"date":"2025-01-15","positions":{"ACC1":{"AAPL":42.6,"NVDA":0.0,"TSLA":57.4},"ACC5":{"NVDA":0.0},'
+        b'"ACC7":{"U":16.67,"V":16.67,"W":16.67,"X":16.67,"Y":16.67,"Z":16.67},'
+        b'"ACC9":{"AAPL":14.58,"GOOGL":34.72,"MSFT":50.7}}}\n'
+    )
+    
+    response = client.get('/api/alarms?date=2025-01-15', headers=api_headers)
+    assert response.data == (
+        b'{"alarms":{"ACC1":true,"ACC5":false,"ACC7":false,"ACC9":true},"date":"2025-01-15","violations":['
+        b'{"account_id":"ACC9","violations":[{"market_value":811.32,"percentage":50.7,"ticker":"MSFT"},'
+        b'{"market_value":555.55,"percentage":34.72,"ticker":"GOOGL"}]},'
+        b'{"account_id":"ACC1","violations":[{"market_value":742.15,"percentage":42.6,"ticker":"AAPL"},'
+        b'{"market_value":1000.07,"percentage":57.4,"ticker":"TSLA"}]}]}\n'
+    )
+
+
+def test_ingested_violations_keep_first_trade_order(app, client, api_headers):
+    ingest_file("20250115|ACC9|ZZZ|1|100.00|CUSTODIAN_A\n20250115|ACC1|ZZZ|1|100.00|CUSTODIAN_A", 'format2')
+    ingest_file("20250115|ACC0|ZZZ|1|100.00|CUSTODIAN_A\n20250115|ACC1|AAA|1|100.00|CUSTODIAN_A", 'format2')
+    
+    violations = client.get('/api/alarms?date=2025-01-15', headers=api_headers).get_json()['violations']
+    assert [violation['account_id'] for violation in violations] == ['ACC9', 'ACC1', 'ACC0']
+    assert [v['ticker'] for v in violations[1]['violations']] == ['ZZZ', 'AAA']
+
+
+def test_ingest_keeps_snapshots_in_step_with_trades(app, client, api_headers, monkeypatch):
+    monkeypatch.setattr('app.services.compliance.send_violation_alert', lambda account_id, violations, trade_date=None: None)
+    first = """20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A
+20250115|ACC001|MSFT|50|21012.50|CUSTODIAN_A"""
+    second = """TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate
+2025-01-15,ACC001,AAPL,20,185.50,SELL,2025-01-17
+2025-01-16,ACC002,TSLA,10,238.45,BUY,2025-01-18"""
+    
+    with app.app_context():
+        ingest_file(first, 'format2')
+        ingest_file(second, 'format1')
+        
+        snapshot = db.session.get(PositionSnapshot, (date(2025, 1, 15), 'ACC001', 'AAPL'))
+        assert float(snapshot.market_value) == 18550.00 - 20 * 185.50
+        assert float(snapshot.shares) == 80
+        
+        incremental = {(s.trade_date, s.account_id, s.ticker): (s.market_value, s.shares)
+                       for s in PositionSnapshot.query.all()}
+        rebuild_snapshots()
+        rebuilt = {(s.trade_date, s.account_id, s.ticker): (s.market_value, s.shares)
+                   for s in PositionSnapshot.query.all()}
+        assert incremental == rebuilt
+    
+    response = client.get('/api/positions?date=2025-01-16', headers=api_headers)
+    assert response.get_json()['positions'] == {'ACC002': {'TSLA': 100.0}}
+
+
+def test_apply_deltas_writes_keys_in_sorted_order(app):
+    from sqlalchemy import event
+    deltas = PositionDeltas()
+    deltas.add_rows([
+        (date(2025, 1, 16), 'ACC002', 'MSFT', 1, None, None, None, 10, 'C', 'format2'),
+        (date(2025, 1, 15), 'ACC002', 'AAPL', 1, None, None, None, 10, 'C', 'format2'),
+        (date(2025, 1, 15), 'ACC001', 'TSLA', 1, None, None, None, 10, 'C', 'format2'),
+    ])
+    written = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'position_snapshots' in statement:
+            written.extend(parameters if executemany else [parameters])
+    
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        apply_deltas(deltas)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    
+    keys = [tuple(params[:3]) for params in written]
+    assert keys == sorted(keys)
+    assert len(keys) == 3
+
+
+def _seed_blotter(count):
+    for i in range(count):
+        db.session.add(Trade(
+            trade_date=date(2025, 1, 15),
+            account_id=f'ACC{i:03d}',
+            ticker='AAPL',
+            shares=i + 1,
+            market_value=100.0 * (i + 1),
+            source_system='CUSTODIAN_A',
+            file_format='format2'
+        ))
+    db.session.add(Trade(trade_date=date(2025, 1, 16), account_id='ACC999', ticker='AAPL', shares=1,
+                         market_value=1, source_system='CUSTODIAN_A', file_format='format2'))
+    db.session.commit()
+
+
+def test_blotter_keyset_pagination(app, client, api_headers):
+    with app.app_context():
+        _seed_blotter(5)
+    
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = '/api/blotter?date=2025-01-15&limit=2' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url, headers=api_headers).get_json()
+        seen.extend(item['account_id'] for item in data['data'])
+        pages += 1
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+    
+    assert pages == 3
+    assert seen == ['ACC000', 'ACC001', 'ACC002', 'ACC003', 'ACC004']
+
+
+def test_blotter_rejects_bad_cursor_and_limit(app, client, api_headers):
+    with app.app_context():
+        _seed_blotter(3)
+    
+    data = client.get('/api/blotter?date=2025-01-15&limit=1', headers=api_headers).get_json()
+    other_date_cursor = data['next_cursor']
+    
+    assert client.get(f'/api/blotter?date=2025-01-16&cursor={other_date_cursor}',
+                      headers=api_headers).status_code == 400
+    assert client.get('/api/blotter?date=2025-01-15&cursor=garbage', headers=api_headers).status_code == 400
+    assert client.get('/api/blotter?date=2025-01-15&limit=0', headers=api_headers).status_code == 400
+    assert client.get('/api/blotter?date=2025-01-15&format=xml', headers=api_headers).status_code == 400
+
+
+def test_blotter_ndjson_stream(app, client, api_headers):
+    with app.app_context():
+        _seed_blotter(3)
+    
+    response = client.get('/api/blotter?date=2025-01-15&format=ndjson', headers=api_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    
+    lines = response.get_data(as_text=True).splitlines()
+    items = [json.loads(line) for line in lines]
+    assert [item['account_id'] for item in items] == ['ACC000', 'ACC001', 'ACC002']
+    assert items[2]['market_value'] == 300.0
+
+
+def test_blotter_ndjson_pages_end_with_next_cursor(app, client, api_headers):
+    with app.app_context():
+        _seed_blotter(3)
+    
+    url = '/api/blotter?date=2025-01-15&format=ndjson&limit=2'
+    first = [json.loads(line) for line in client.get(url, headers=api_headers).get_data(as_text=True).splitlines()]
+    assert [item['account_id'] for item in first[:-1]] == ['ACC000', 'ACC001']
+    
+    cursor = first[-1]['next_cursor']
+    second = [json.loads(line) for line in
+              client.get(f'{url}&cursor={cursor}', headers=api_headers).get_data(as_text=True).splitlines()]
+    assert [item['account_id'] for item in second[:-1]] == ['ACC002']
+    assert second[-1] == {'next_cursor': None}
+
+
+RANGE_FILE = """20250115|ACC001|AAPL|100|1000.00|CUSTODIAN_A
+20250115|ACC001|MSFT|100|3000.00|CUSTODIAN_A
+20250116|ACC001|AAPL|50|500.00|CUSTODIAN_A
+20250117|ACC002|TSLA|10|100.00|CUSTODIAN_B
+20250120|ACC001|AAPL|5|50.00|CUSTODIAN_A"""
+
+
+def test_positions_date_range(app, client, api_headers):
+    with app.app_context():
+        ingest_file(RANGE_FILE, 'format2')
+    
+    response = client.get('/api/positions?start=2025-01-15&end=2025-01-17', headers=api_headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    
+    assert data['start'] == '2025-01-15'
+    assert data['end'] == '2025-01-17'
+    assert data['positions'] == {
+        '2025-01-15': {'ACC001': {'AAPL': 25.0, 'MSFT': 75.0}},
+        '2025-01-16': {'ACC001': {'AAPL': 100.0}},
+        '2025-01-17': {'ACC002': {'TSLA': 100.0}},
+    }
+
+
+def test_positions_cumulative_range(app, client, api_headers):
+    with app.app_context():
+        ingest_file(RANGE_FILE, 'format2')
+    
+    response = client.get('/api/positions?start=2025-01-15&end=2025-01-31&cumulative=true', headers=api_headers)
+    data = response.get_json()
+    
+    assert data['cumulative'] is True
+    assert data['positions']['2025-01-15']['ACC001']['AAPL'] == {'shares': 100.0, 'market_value': 1000.0}
+    assert data['positions']['2025-01-16']['ACC001']['AAPL'] == {'shares': 150.0, 'market_value': 1500.0}
+    assert data['positions']['2025-01-20']['ACC001']['AAPL'] == {'shares': 155.0, 'market_value': 1550.0}
+    assert 'MSFT' not in data['positions']['2025-01-16']['ACC001']
+
+
+def test_alarms_date_range(app, client, api_headers, monkeypatch):
+    called = []
+    monkeypatch.setattr('app.services.compliance.send_violation_alert', lambda *args, **kwargs: called.append(args))
+    with app.app_context():
+        ingest_file(RANGE_FILE, 'format2')
+    alerted = len(called)
+    
+    data = client.get('/api/alarms?start=2025-01-15&end=2025-01-16', headers=api_headers).get_json()
+    
+    assert data['alarms'] == {'2025-01-15': {'ACC001': True}, '2025-01-16': {'ACC001': True}}
+    assert [v['ticker'] for v in data['violations']['2025-01-15'][0]['violations']] == ['AAPL', 'MSFT']
+    assert len(called) == alerted
+
+
+def test_date_range_validation(client, api_headers):
+    for query in ('start=2025-01-15', 'start=2025-01-16&end=2025-01-15', 'start=2024-01-01&end=2025-06-01',
+                  'start=bad&end=2025-01-15'):
+        assert client.get(f'/api/positions?{query}', headers=api_headers).status_code == 400
+        assert client.get(f'/api/alarms?{query}', headers=api_headers).status_code == 400
+
+
+FILTER_FILE = """20250115|ACC001|AAPL|10|1000.00|CUSTODIAN_A
+20250115|ACC001|MSFT|10|3000.00|CUSTODIAN_A
+20250115|ACC002|AAPL|10|500.00|CUSTODIAN_A
+20250115|ACC003|TSLA|10|700.00|CUSTODIAN_B
+20250116|ACC001|AAPL|5|1000.00|CUSTODIAN_A"""
+
+
+def test_blotter_account_and_ticker_filters(app, client, api_headers):
+    with app.app_context():
+        ingest_file(FILTER_FILE, 'format2')
+    
+    def accounts_and_tickers(query):
+        data = client.get(f'/api/blotter?date=2025-01-15&{query}', headers=api_headers).get_json()
+        return [(item['account_id'], item['ticker']) for item in data['data']]
+    
+    assert accounts_and_tickers('account_id=ACC001') == [('ACC001', 'AAPL'), ('ACC001', 'MSFT')]
+    assert accounts_and_tickers('account_id=ACC001&account_id=ACC003') == [
+        ('ACC001', 'AAPL'), ('ACC001', 'MSFT'), ('ACC003', 'TSLA')]
+    assert accounts_and_tickers('ticker=AAPL') == [('ACC001', 'AAPL'), ('ACC002', 'AAPL')]
+    assert accounts_and_tickers('account_id=ACC002&ticker=MSFT') == []
+    assert client.get('/api/blotter?date=2025-01-15&account_id=', headers=api_headers).status_code == 400
+
+
+def test_positions_and_alarms_filters(app, client, api_headers):
+    with app.app_context():
+        ingest_file(FILTER_FILE, 'format2')
+    
+    data = client.get('/api/positions?date=2025-01-15&account_id=ACC001', headers=api_headers).get_json()
+    assert data['positions'] == {'ACC001': {'AAPL': 25.0, 'MSFT': 75.0}}
+    
+    # Percentages stay those of the whole account when filtering by ticker.
+    data = client.get('/api/positions?date=2025-01-15&ticker=AAPL', headers=api_headers).get_json()
+    assert data['positions'] == {'ACC001': {'AAPL': 25.0}, 'ACC002': {'AAPL': 100.0}}
+    
+    data = client.get('/api/positions?start=2025-01-15&end=2025-01-16&ticker=MSFT', headers=api_headers).get_json()
+    assert data['positions'] == {'2025-01-15': {'ACC001': {'MSFT': 75.0}}}
+    
+    data = client.get('/api/alarms?date=2025-01-15&ticker=TSLA', headers=api_headers).get_json()
+    assert data['alarms'] == {'ACC003': True}
+    assert [item['account_id'] for item in data['violations']] == ['ACC003']
+    
+    data = client.get('/api/alarms?start=2025-01-15&end=2025-01-16&account_id=ACC002',
+                      headers=api_headers).get_json()
+    assert data['alarms'] == {'2025-01-15': {'ACC002': True}}
+
+
+def test_account_positions_endpoint(app, client, api_headers):
+    with app.app_context():
+        ingest_file(FILTER_FILE, 'format2')
+    
+    data = client.get('/api/accounts/ACC001/positions?date=2025-01-15', headers=api_headers).get_json()
+    assert data == {
+        'account_id': 'ACC001',
+        'date': '2025-01-15',
+        'total_market_value': 4000.0,
+        'positions': {
+            'AAPL': {'market_value': 1000.0, 'shares': 10.0, 'percentage': 25.0},
+            'MSFT': {'market_value': 3000.0, 'shares': 10.0, 'percentage': 75.0},
+        },
+    }
+    
+    data = client.get('/api/accounts/ACC001/positions?start=2025-01-15&end=2025-01-31&ticker=AAPL',
+                      headers=api_headers).get_json()
+    assert list(data['positions']) == ['2025-01-15', '2025-01-16']
+    assert data['positions']['2025-01-15']['total_market_value'] == 4000.0
+    assert list(data['positions']['2025-01-15']['positions']) == ['AAPL']
+    
+    empty = client.get('/api/accounts/NOPE/positions?date=2025-01-15', headers=api_headers).get_json()
+    assert empty['positions'] == {} and empty['total_market_value'] == 0.0
+    assert client.get('/api/accounts/ACC001/positions', headers=api_headers).status_code == 400
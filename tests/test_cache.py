@@ -0,0 +1,168 @@
+from datetime import timedelta
+
+import pytest
+from werkzeug.http import http_date
+
+from app.services.ingestion import ingest_file
+from app.utils.cache import FileCache, LRUCache, ResponseCache
+
+
+FORMAT2 = """20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A
+20250115|ACC001|MSFT|50|21012.50|CUSTODIAN_A"""
+
+
+@pytest.fixture
+def cached_app(app):
+    app.config['RESPONSE_CACHE_ENABLED'] = True
+    return app
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert len(cache) == 2
+
+
+def test_lru_cache_evicts_to_its_byte_budget():
+    cache = LRUCache(10, max_bytes=10)
+    cache.set('a', b'xxxx')
+    cache.set('b', b'xxxx')
+    cache.set('a', b'xxxxxx')
+    assert cache.total_bytes == 10
+    
+    cache.set('c', b'xxx')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'xxxxxx'
+    assert cache.total_bytes == 9
+
+
+def test_response_cache_skips_oversized_bodies(app):
+    app.config.update(RESPONSE_CACHE_MAX_BYTES=100, RESPONSE_CACHE_MAX_ENTRY_BYTES=10)
+    cache = ResponseCache(app)
+    cache.set('small', (200, 'application/json', b'{}'))
+    cache.set('large', (200, 'application/json', b'x' * 11))
+    
+    assert cache.get('small') == (200, 'application/json', b'{}')
+    assert cache.get('large') is None
+
+
+def test_file_cache_round_trip_and_prune(tmp_path):
+    cache = FileCache(str(tmp_path), max_entries=2)
+    cache.set('k1', (200, 'application/json', b'{"a":\n1}'))
+    cache.set('k2', (200, 'application/json', b'{}'))
+    cache.set('k3', (200, 'application/json', b'[]'))
+    
+    assert FileCache(str(tmp_path)).get('k1') == (200, 'application/json', b'{"a":\n1}')
+    cache.prune()
+    assert len(list(tmp_path.iterdir())) == 2
+    assert cache.get('missing') is None
+
+
+def test_cached_response_and_etag(cached_app, client, api_headers, monkeypatch):
+    calls = []
+    from app.routes import api
+    original = api.account_positions
+    monkeypatch.setattr(api, 'account_positions', lambda date_obj, *filters: calls.append(date_obj) or original(date_obj, *filters))
+    
+    with cached_app.app_context():
+        ingest_file(FORMAT2, 'format2')
+    
+    first = client.get('/api/positions?date=2025-01-15', headers=api_headers)
+    second = client.get('/api/positions?date=2025-01-15', headers=api_headers)
+    assert first.data == second.data
+    assert len(calls) == 1
+    
+    etag = first.headers['ETag']
+    revalidated = client.get('/api/positions?date=2025-01-15', headers={**api_headers, 'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert len(calls) == 1
+
+
+def test_conditional_requests_without_the_cache(app, client, api_headers, monkeypatch):
+    calls = []
+    from app.routes import api
+    original = api.account_positions
+    monkeypatch.setattr(api, 'account_positions', lambda date_obj, *filters: calls.append(date_obj) or original(date_obj, *filters))
+    ingest_file(FORMAT2, 'format2')
+    
+    first = client.get('/api/positions?date=2025-01-15', headers=api_headers)
+    assert not app.config['RESPONSE_CACHE_ENABLED']
+    assert first.last_modified is not None
+    
+    echoed = client.get('/api/positions?date=2025-01-15',
+                        headers={**api_headers, 'If-Modified-Since': first.headers['Last-Modified']})
+    since = client.get('/api/positions?date=2025-01-15',
+                       headers={**api_headers, 'If-Modified-Since': http_date(first.last_modified + timedelta(seconds=1))})
+    weak = client.get('/api/positions?date=2025-01-15',
+                      headers={**api_headers, 'If-None-Match': 'W/' + first.headers['ETag']})
+    stale = client.get('/api/positions?date=2025-01-15',
+                       headers={**api_headers, 'If-None-Match': '"other"',
+                                'If-Modified-Since': first.headers['Last-Modified']})
+    assert (echoed.status_code, since.status_code, weak.status_code, stale.status_code) == (200, 304, 304, 200)
+    assert since.headers['ETag'] == first.headers['ETag']
+    assert len(calls) == 3
+
+
+def test_date_mixed_with_a_range_is_rejected_not_cached(cached_app, client, api_headers):
+    with cached_app.app_context():
+        ingest_file(FORMAT2, 'format2')
+    
+    url = '/api/positions?date=2025-01-15&start=2025-01-15&end=2025-01-20'
+    response = client.get(url, headers=api_headers)
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
+    assert client.get(url.replace('positions', 'alarms'), headers=api_headers).status_code == 400
+    
+    blotter = client.get('/api/blotter?date=2025-01-15&start=2025-01-10&end=2025-01-12', headers=api_headers)
+    assert blotter.get_json()['count'] == 2
+    assert 'ETag' not in blotter.headers
+
+
+def test_ingest_invalidates_only_touched_dates(cached_app, client, api_headers):
+    with cached_app.app_context():
+        ingest_file(FORMAT2, 'format2')
+    
+    before = client.get('/api/blotter?date=2025-01-15', headers=api_headers)
+    other_before = client.get('/api/blotter?date=2025-01-16', headers=api_headers)
+    assert before.get_json()['count'] == 2
+    
+    with cached_app.app_context():
+        ingest_file("20250115|ACC002|TSLA|10|2384.50|CUSTODIAN_B", 'format2')
+    
+    after = client.get('/api/blotter?date=2025-01-15', headers=api_headers)
+    other_after = client.get('/api/blotter?date=2025-01-16', headers=api_headers)
+    assert after.get_json()['count'] == 3
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert other_after.headers['ETag'] == other_before.headers['ETag']
+
+
+def test_range_responses_invalidate_on_any_date_in_range(cached_app, client, api_headers):
+    with cached_app.app_context():
+        ingest_file(FORMAT2, 'format2')
+    
+    url = '/api/positions?start=2025-01-14&end=2025-01-20'
+    before = client.get(url, headers=api_headers)
+    assert client.get(url, headers=api_headers).headers['ETag'] == before.headers['ETag']
+    
+    with cached_app.app_context():
+        ingest_file("20250118|ACC002|TSLA|10|2384.50|CUSTODIAN_B", 'format2')
+    
+    after = client.get(url, headers=api_headers)
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert '2025-01-18' in after.get_json()['positions']
+
+
+def test_cache_keys_include_path_arguments(cached_app, client, api_headers):
+    with cached_app.app_context():
+        ingest_file(FORMAT2 + "\n20250115|ACC002|TSLA|10|700.00|CUSTODIAN_A", 'format2')
+    
+    first = client.get('/api/accounts/ACC001/positions?date=2025-01-15', headers=api_headers).get_json()
+    second = client.get('/api/accounts/ACC002/positions?date=2025-01-15', headers=api_headers).get_json()
+    assert (first['account_id'], second['account_id']) == ('ACC001', 'ACC002')
+    assert list(second['positions']) == ['TSLA']
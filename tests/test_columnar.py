@@ -0,0 +1,92 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.services.columnar import stream_positions
+from app.services.ingestion import ingest_file
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+FORMAT1 = """TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate
+2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17
+2025-01-15,ACC001,MSFT,50,420.25,SELL,2025-01-17"""
+
+FORMAT2 = """20250115|ACC002|AAPL|200|37100.00|CUSTODIAN_B"""
+
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        ingest_file(FORMAT1, 'format1')
+        ingest_file(FORMAT2, 'format2')
+
+
+def test_blotter_arrow_stream(client, api_headers, seeded):
+    response = client.get('/api/blotter?date=2025-01-15&format=arrow', headers=api_headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.apache.arrow.stream'
+    
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.num_rows == 3
+    assert pa.types.is_dictionary(table.schema.field('ticker').type)
+    assert table.schema.field('trade_date').type == pa.date32()
+    
+    rows = table.to_pylist()
+    assert rows[0]['trade_date'] == date(2025, 1, 15)
+    assert rows[1]['shares'] == Decimal('-50.0000')
+    assert rows[2]['market_value'] == Decimal('37100.00')
+    assert rows[2]['price'] is None
+
+
+def test_blotter_parquet_respects_limit(client, api_headers, seeded):
+    response = client.get('/api/blotter?date=2025-01-15&format=parquet&limit=2', headers=api_headers)
+    assert response.status_code == 200
+    
+    table = pq.read_table(io.BytesIO(response.data))
+    assert table.column('account_id').to_pylist() == ['ACC001', 'ACC001']
+
+
+def test_positions_parquet(client, api_headers, seeded):
+    response = client.get('/api/positions?date=2025-01-15&format=parquet', headers=api_headers)
+    assert response.status_code == 200
+    assert 'positions-2025-01-15.parquet' in response.headers['Content-Disposition']
+    
+    rows = pq.read_table(io.BytesIO(response.data)).to_pylist()
+    assert [(row['account_id'], row['ticker'], row['percentage']) for row in rows] == [
+        ('ACC001', 'AAPL', -753.3),
+        ('ACC001', 'MSFT', 853.3),
+        ('ACC002', 'AAPL', 100.0),
+    ]
+
+
+def test_positions_parquet_ticker_filter(client, api_headers, seeded):
+    response = client.get('/api/positions?date=2025-01-15&format=parquet&ticker=MSFT', headers=api_headers)
+    assert response.status_code == 200
+    
+    rows = pq.read_table(io.BytesIO(response.data)).to_pylist()
+    assert [(row['account_id'], row['ticker'], row['percentage']) for row in rows] == [('ACC001', 'MSFT', 853.3)]
+
+
+def test_columnar_formats_without_pyarrow(client, api_headers, monkeypatch):
+    monkeypatch.setattr('app.services.columnar.pa', None)
+    
+    response = client.get('/api/blotter?date=2025-01-15&format=arrow', headers=api_headers)
+    assert response.status_code == 501
+    response = client.get('/api/positions?date=2025-01-15&format=parquet', headers=api_headers)
+    assert response.status_code == 501
+
+
+@pytest.mark.parametrize('output_format', ['arrow', 'parquet'])
+def test_positions_ticker_filter_skips_empty_partitions(app, seeded, output_format):
+    with app.app_context():
+        data = b''.join(stream_positions(date(2025, 1, 15), output_format, batch_size=1, tickers=('MSFT',)))
+    
+    if output_format == 'arrow':
+        table = pa.ipc.open_stream(data).read_all()
+    else:
+        table = pq.read_table(io.BytesIO(data))
+    assert table.column('ticker').to_pylist() == ['MSFT']
@@ -0,0 +1,78 @@
+import json
+from datetime import date
+
+from app.models import db, ComplianceState, PositionSnapshot
+from app.services.compliance import date_alarms, evaluate_accounts, rebuild_compliance
+from app.services.ingestion import ingest_file
+
+
+def _snapshot(account_id, ticker, market_value, trade_date=date(2025, 1, 15)):
+    db.session.add(PositionSnapshot(trade_date=trade_date, account_id=account_id, ticker=ticker,
+                                    market_value=market_value, shares=1))
+
+
+def test_ingest_evaluates_only_touched_accounts(app):
+    with app.app_context():
+        _snapshot('ACC_OTHER', 'AAPL', 100)
+        db.session.commit()
+        
+        ingest_file("20250115|ACC1|AAPL|1|900.00|CUSTODIAN_A\n20250115|ACC1|MSFT|1|100.00|CUSTODIAN_A", 'format2')
+        
+        states = {state.account_id: state for state in ComplianceState.query.all()}
+        assert set(states) == {'ACC1'}
+        assert states['ACC1'].in_violation is True
+        assert [v['ticker'] for v in states['ACC1'].violations] == ['AAPL']
+
+
+def test_evaluate_accounts_reports_transitions_once(app):
+    with app.app_context():
+        _snapshot('ACC1', 'AAPL', 100)
+        _snapshot('ACC2', 'AAPL', 10)
+        for ticker in 'ABCDEF':
+            _snapshot('ACC2', ticker, 10)
+        db.session.flush()
+        
+        keys = {(date(2025, 1, 15), 'ACC1'), (date(2025, 1, 15), 'ACC2')}
+        transitions = evaluate_accounts(keys)
+        assert [(account_id, in_violation) for _, account_id, in_violation, _ in transitions] == [('ACC1', True)]
+        assert evaluate_accounts(keys) == []
+        
+        alarms, violations = date_alarms(date(2025, 1, 15))
+        assert alarms == {'ACC1': True, 'ACC2': False}
+        assert violations == [{'account_id': 'ACC1', 'violations': [
+            {'ticker': 'AAPL', 'percentage': 100.0, 'market_value': 100.0}
+        ]}]
+
+
+def test_rebuild_compliance_drops_accounts_without_snapshots(app):
+    with app.app_context():
+        _snapshot('ACC1', 'AAPL', 100)
+        db.session.add(ComplianceState(trade_date=date(2025, 1, 15), account_id='GONE', in_violation=True,
+                                       violations=[]))
+        db.session.flush()
+        
+        transitions = rebuild_compliance([date(2025, 1, 15)])
+        
+        assert [account_id for _, account_id, _, _ in transitions] == ['ACC1']
+        assert date_alarms(date(2025, 1, 15))[0] == {'ACC1': True}
+
+
+def test_rebuild_compliance_invalidates_cached_alarms(app, client, api_headers, tmp_path):
+    app.config['RESPONSE_CACHE_ENABLED'] = True
+    with app.app_context():
+        ingest_file("20250115|ACC1|AAPL|1|900.00|CUSTODIAN_A\n20250115|ACC1|MSFT|1|100.00|CUSTODIAN_A", 'format2')
+    
+    url = '/api/alarms?date=2025-01-15'
+    before = client.get(url, headers=api_headers)
+    assert before.get_json()['alarms'] == {'ACC1': True}
+    
+    rules = tmp_path / 'rules.json'
+    rules.write_text(json.dumps({'max_position_pct': 95}))
+    app.config['COMPLIANCE_RULES_FILE'] = str(rules)
+    with app.app_context():
+        rebuild_compliance([date(2025, 1, 15)])
+        db.session.commit()
+    
+    after = client.get(url, headers=api_headers)
+    assert after.get_json()['alarms'] == {'ACC1': False}
+    assert client.get(url, headers={**api_headers, 'If-None-Match': before.headers['ETag']}).status_code == 200
@@ -0,0 +1,73 @@
+import gzip
+import json
+
+import pytest
+
+from app import create_app
+from app.models import db
+from app.services.ingestion import ingest_file
+from config import TestingConfig, config
+
+
+ROWS = "\n".join(f"20250115|ACC{i:03d}|T{i % 7}|{i + 1}|{(i + 1) * 10}.00|CUSTODIAN_A" for i in range(200))
+
+
+@pytest.fixture
+def seeded(app):
+    ingest_file(ROWS, 'format2')
+
+
+def test_large_json_is_gzipped(client, api_headers, seeded):
+    plain = client.get('/api/blotter?date=2025-01-15', headers=api_headers)
+    response = client.get('/api/blotter?date=2025-01-15', headers={**api_headers, 'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) < len(plain.data)
+    assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+    assert response.headers['ETag'] == 'W/' + plain.headers['ETag']
+
+
+def test_small_and_refused_responses_are_not_compressed(app, client, api_headers, seeded):
+    small = client.get('/api/blotter?date=2025-01-15&limit=1', headers={**api_headers, 'Accept-Encoding': 'gzip'})
+    refused = client.get('/api/blotter?date=2025-01-15', headers={**api_headers, 'Accept-Encoding': 'gzip;q=0'})
+
+    assert len(small.data) < app.config['COMPRESSION_MIN_SIZE']
+    assert 'Content-Encoding' not in small.headers
+    assert 'Content-Encoding' not in refused.headers
+    assert refused.get_json()['count'] == 200
+
+
+def test_streamed_ndjson_is_gzipped(client, api_headers, seeded):
+    response = client.get('/api/blotter?date=2025-01-15&format=ndjson&limit=5',
+                          headers={**api_headers, 'Accept-Encoding': 'gzip, deflate'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    *lines, last = gzip.decompress(response.data).decode().splitlines()
+    assert [json.loads(line)['account_id'] for line in lines] == ['ACC000', 'ACC001', 'ACC002', 'ACC003', 'ACC004']
+    assert json.loads(last)['next_cursor']
+
+
+def test_zstd_is_preferred_when_available(client, api_headers, seeded):
+    zstandard = pytest.importorskip('zstandard')
+    response = client.get('/api/blotter?date=2025-01-15', headers={**api_headers, 'Accept-Encoding': 'gzip, zstd'})
+
+    assert response.headers['Content-Encoding'] == 'zstd'
+    body = zstandard.ZstdDecompressor().decompressobj().decompress(response.data)
+    assert json.loads(body)['count'] == 200
+
+
+def test_compression_can_be_disabled(api_headers, monkeypatch):
+    class PlainConfig(TestingConfig):
+        COMPRESSION_ENABLED = False
+
+    monkeypatch.setitem(config, 'plain', PlainConfig)
+    plain_app = create_app('plain')
+    with plain_app.app_context():
+        db.create_all()
+        ingest_file(ROWS, 'format2')
+        response = plain_app.test_client().get('/api/blotter?date=2025-01-15',
+                                               headers={**api_headers, 'Accept-Encoding': 'gzip'})
+        db.drop_all()
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,99 @@
+from app import create_app
+from app.models import db, Trade
+from app.services.inbox import archive_file, detect_file_format, ingest_directory
+from config import TestingConfig, config
+from manage import ingest_dir_cli
+
+
+FORMAT1 = """TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate
+2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17
+"""
+
+FORMAT2 = """20250115|ACC001|MSFT|50|21012.50|CUSTODIAN_A
+20250115|ACC002|MSFT|25|10506.25|CUSTODIAN_A
+"""
+
+
+def test_detect_file_format(tmp_path):
+    (tmp_path / 'a.dat').write_text(FORMAT1)
+    (tmp_path / 'b.csv').write_text(FORMAT2)
+    (tmp_path / 'c.txt').write_text('')
+    (tmp_path / 'd.bin').write_text('garbage')
+    
+    assert detect_file_format(tmp_path / 'a.dat') == 'format1'
+    assert detect_file_format(tmp_path / 'b.csv') == 'format2'
+    assert detect_file_format(tmp_path / 'c.txt') == 'format2'
+    assert detect_file_format(tmp_path / 'd.bin') is None
+
+
+def test_archive_file_never_overwrites(tmp_path):
+    archive = tmp_path / 'archive'
+    archive.mkdir()
+    (archive / 'f.txt').write_text('old')
+    (tmp_path / 'f.txt').write_text('new')
+    
+    target = archive_file(tmp_path / 'f.txt', archive)
+    
+    assert target != archive / 'f.txt'
+    assert target.read_text() == 'new'
+    assert (archive / 'f.txt').read_text() == 'old'
+    assert not (tmp_path / 'f.txt').exists()
+
+
+def test_ingest_directory_serial(app, tmp_path):
+    inbox = tmp_path / 'inbox'
+    archive = tmp_path / 'archive'
+    inbox.mkdir()
+    (inbox / 'one.csv').write_text(FORMAT1)
+    (inbox / 'two.txt').write_text(FORMAT2)
+    (inbox / 'unknown.bin').write_text('garbage')
+    
+    with app.app_context():
+        results = ingest_directory(inbox, archive, workers=1)
+        
+        assert Trade.query.count() == 3
+    
+    by_file = {result['file']: result for result in results}
+    assert by_file['one.csv']['status'] == 'archived'
+    assert by_file['two.txt']['success'] == 2
+    assert by_file['unknown.bin']['status'] == 'skipped'
+    assert sorted(path.name for path in archive.iterdir()) == ['one.csv', 'two.txt']
+    assert [path.name for path in inbox.iterdir()] == ['unknown.bin']
+
+
+def test_unparseable_file_is_archived_not_failed(app, tmp_path):
+    inbox = tmp_path / 'inbox'
+    archive = tmp_path / 'archive'
+    inbox.mkdir()
+    (inbox / 'bad.txt').write_text("20250115|ACC001|MSFT|abc|21012.50|CUSTODIAN_A\n")
+    
+    with app.app_context():
+        [result] = ingest_directory(inbox, archive, workers=1)
+    
+    assert (result['status'], result['success'], result['errors']) == ('archived', 0, 1)
+    assert [path.name for path in archive.iterdir()] == ['bad.txt']
+
+
+def test_ingest_dir_cli_single_worker(tmp_path, monkeypatch, capsys):
+    class InboxConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'inbox.db'}"
+    
+    monkeypatch.setitem(config, 'inbox', InboxConfig)
+    monkeypatch.setenv('FLASK_ENV', 'inbox')
+    inbox_app = create_app('inbox')
+    with inbox_app.app_context():
+        db.create_all()
+    
+    inbox = tmp_path / 'inbox'
+    archive = tmp_path / 'archive'
+    inbox.mkdir()
+    (inbox / 'one.csv').write_text(FORMAT1)
+    (inbox / 'two.txt').write_text(FORMAT2)
+    
+    ingest_dir_cli(str(inbox), str(archive), workers=1)
+    
+    assert 'one.csv' in capsys.readouterr().out
+    assert sorted(path.name for path in archive.iterdir()) == ['one.csv', 'two.txt']
+    with inbox_app.app_context():
+        assert Trade.query.count() == 3
+        db.drop_all()
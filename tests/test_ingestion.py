@@ -1,5 +1,12 @@
-from app.services.ingestion import parse_format1_file, parse_format2_file, ingest_file
-from app.models import db, Trade
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from app.services.ingestion import (
+    parse_format1_file, parse_format2_file, ingest_file, ingest_file_from_path, iter_format2_rows,
+    make_date_decoder, parse_decimal,
+)
+from app.models import db, IngestionLedger, IngestionRun, PositionSnapshot, Trade
 
 
 def test_parse_format1():
@@ -106,3 +113,135 @@ invalid|data|here
     assert len(trades) == 2
     assert trades[0].ticker == 'AAPL'
     assert trades[1].ticker == 'MSFT'
+
+
+def test_ingest_orm_and_bulk_methods_match(app):
+    file_content = """20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A
+20250115|ACC002|AAPL|200|37100.00|CUSTODIAN_B"""
+    
+    with app.app_context():
+        assert ingest_file(file_content, 'format2', method='orm') == (2, 0)
+        IngestionLedger.query.delete()
+        db.session.commit()
+        assert ingest_file(file_content, 'format2', method='bulk') == (2, 0)
+        
+        trades = Trade.query.order_by(Trade.id).all()
+        assert len(trades) == 4
+        assert [t.to_dict()['market_value'] for t in trades] == [18550.0, 37100.0, 18550.0, 37100.0]
+        assert all(t.created_at is not None for t in trades)
+
+
+@pytest.mark.parametrize('method', ['orm', 'bulk'])
+def test_ingest_counts_unparseable_lines_as_errors(app, method):
+    file_content = """20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A
+20250115|ACC002|AAPL|abc|37100.00|CUSTODIAN_B
+20250115|ACC003|AAPL|100
+20250115|ACC004|AAPL|100|18550.00|CUSTODIAN_A"""
+    
+    with app.app_context():
+        assert ingest_file(file_content, 'format2', method=method) == (2, 2)
+        assert IngestionRun.query.one().errors == 2
+
+
+def test_ingest_unknown_method(app):
+    with app.app_context():
+        with pytest.raises(ValueError, match='bogus'):
+            ingest_file("20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A", 'format2', method='bogus')
+
+
+def test_iter_rows_from_file_handle(tmp_path):
+    path = tmp_path / 'trades.txt'
+    path.write_text("20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A\r\n\r\n20250115|ACC002|MSFT|50|21012.50|CUSTODIAN_B\r\n")
+    
+    with open(path, newline='') as f:
+        rows = iter_format2_rows(f)
+        assert not isinstance(rows, list)
+        rows = list(rows)
+    
+    assert [row[2] for row in rows] == ['AAPL', 'MSFT']
+    assert rows[1][8] == 'CUSTODIAN_B'
+
+
+def test_ingest_file_from_path_in_small_batches(app, tmp_path):
+    path = tmp_path / 'trades.csv'
+    path.write_text("""TradeDate,AccountID,Ticker,Quantity,Price,TradeType,SettlementDate
+2025-01-15,ACC001,AAPL,100,185.50,BUY,2025-01-17
+2025-01-15,ACC002,GOOGL,75,142.80,BUY,2025-01-17
+2025-01-15,ACC003,MSFT,50,420.25,SELL,2025-01-17""")
+    
+    with app.app_context():
+        assert ingest_file_from_path(str(path), 'format1', batch_size=2) == (3, 0)
+        
+        msft = Trade.query.filter_by(ticker='MSFT').one()
+        assert float(msft.shares) == -50
+
+
+def test_date_decoder_layouts_and_cache():
+    decode_dashed = make_date_decoder(dashed=True)
+    decode_compact = make_date_decoder(dashed=False)
+    
+    assert decode_dashed('2025-01-15') == date(2025, 1, 15)
+    assert decode_dashed('2025-01-15') is decode_dashed('2025-01-15')
+    assert decode_compact('20250115') == date(2025, 1, 15)
+    
+    for bad in ('2025-1-15', '2025/01/15', '2025-02-30', '+025-01-15'):
+        with pytest.raises(ValueError):
+            decode_dashed(bad)
+    for bad in ('2025115', '2025011a', '20251301'):
+        with pytest.raises(ValueError):
+            decode_compact(bad)
+
+
+def test_parsers_return_exact_decimals():
+    trades = parse_format2_file("20250115|ACC001|AAPL|100.1234|18550.07|CUSTODIAN_A")
+    
+    assert trades[0].shares == Decimal('100.1234')
+    assert trades[0].market_value == Decimal('18550.07')
+    
+    with pytest.raises(ValueError):
+        parse_decimal('NaN')
+
+
+def test_reingesting_same_file_is_skipped(app, tmp_path):
+    path = tmp_path / 'trades.txt'
+    path.write_text("20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A\n")
+    
+    with app.app_context():
+        assert ingest_file_from_path(str(path), 'format2') == (1, 0)
+        assert ingest_file_from_path(str(path), 'format2') == (0, 0)
+        assert ingest_file(path.read_text(), 'format2') == (0, 0)
+        
+        assert Trade.query.count() == 1
+        ledger = IngestionLedger.query.one()
+        assert ledger.file_name == 'trades.txt'
+        assert ledger.row_count == 1
+
+
+def test_crlf_file_hashes_the_same_by_path_and_as_text(app, tmp_path):
+    path = tmp_path / 'trades.txt'
+    path.write_bytes(b"20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A\r\n"
+                     b"20250115|ACC002|MSFT|50|21012.50|CUSTODIAN_B\r\n")
+    
+    with app.app_context():
+        assert ingest_file_from_path(str(path), 'format2') == (2, 0)
+        assert ingest_file(path.read_text(), 'format2') == (0, 0)
+        assert ingest_file(path.read_bytes().decode(), 'format2') == (0, 0)
+        assert Trade.query.count() == 2
+
+
+def test_row_dedup_on_partial_redelivery(app):
+    first = """20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A
+20250115|ACC002|MSFT|50|21012.50|CUSTODIAN_B"""
+    redelivery = """20250115|ACC002|MSFT|50.00|21012.5|CUSTODIAN_B
+20250115|ACC003|TSLA|10|2384.50|CUSTODIAN_B
+20250115|ACC003|TSLA|10|2384.50|CUSTODIAN_B"""
+    app.config['INGEST_DEDUP_ROWS'] = True
+    
+    with app.app_context():
+        assert ingest_file(first, 'format2') == (2, 0)
+        assert ingest_file(redelivery, 'format2') == (1, 0)
+        
+        assert sorted(t.ticker for t in Trade.query.all()) == ['AAPL', 'MSFT', 'TSLA']
+        
+        snapshots = {s.ticker: float(s.shares) for s in PositionSnapshot.query.all()}
+        assert snapshots == {'AAPL': 100, 'MSFT': 50, 'TSLA': 10}
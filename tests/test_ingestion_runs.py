@@ -0,0 +1,55 @@
+from app.models import IngestionRun
+from app.services import ingestion
+from app.services.inbox import ingest_directory
+from app.services.ingestion import ingest_file
+from app.services.ingestion_runs import recent_runs, summarize_runs
+
+
+FORMAT2 = """20250115|ACC001|MSFT|50|21012.50|CUSTODIAN_A
+20250115|ACC002|MSFT|25|10506.25|CUSTODIAN_A
+"""
+
+
+def test_ingest_records_a_run_with_stage_timings(app, capsys):
+    assert ingest_file(FORMAT2, 'format2', file_name='f.txt') == (2, 0)
+    assert ingest_file(FORMAT2, 'format2', file_name='f.txt') == (0, 0)
+    
+    first, second = recent_runs()
+    assert (first.file_name, first.status, first.rows, first.errors, first.bytes) == ('f.txt', 'ingested', 2, 0, len(FORMAT2))
+    assert {'read', 'validate', 'parse', 'write', 'snapshots', 'compliance', 'commit'} <= set(first.stages)
+    assert all(seconds >= 0 for seconds in first.stages.values())
+    assert second.status == 'duplicate'
+    assert capsys.readouterr().out.count('[INGEST_RUN] {') == 2
+
+
+def test_failed_loads_are_recorded(app, monkeypatch):
+    def fail(accounts):
+        raise RuntimeError('boom')
+    
+    monkeypatch.setattr(ingestion, 'evaluate_accounts', fail)
+    assert ingest_file(FORMAT2, 'format2') == (0, 2)
+    
+    run = IngestionRun.query.one()
+    assert (run.status, run.rows, run.errors, run.error) == ('failed', 0, 2, 'boom')
+
+
+def test_inbox_runs_include_archive(app, tmp_path):
+    inbox = tmp_path / 'inbox'
+    inbox.mkdir()
+    (inbox / 'a.txt').write_text(FORMAT2)
+    
+    ingest_directory(inbox, tmp_path / 'archive', workers=1)
+    
+    run = IngestionRun.query.one()
+    assert run.status == 'archived'
+    assert 'archive' in run.stages
+
+
+def test_summarize_runs(app):
+    assert summarize_runs([]) == 'No ingestion runs recorded.'
+    
+    ingest_file(FORMAT2, 'format2')
+    lines = summarize_runs(recent_runs()).splitlines()
+    assert 'commit' in lines[0]
+    assert lines[1].split()[1:5] == ['format2', '1', '0', '2']
+    assert lines[-1].startswith('all')
@@ -0,0 +1,82 @@
+from app import create_app
+from app.services.ingestion import ingest_file
+from config import TestingConfig, config
+
+
+SAMPLE = "20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A\n20250115|ACC001|MSFT|50|21000.00|CUSTODIAN_A"
+
+
+def metric_value(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_metrics_record_latency_queries_and_bytes(client, api_headers):
+    ingest_file(SAMPLE, 'format2')
+    response = client.get('/api/blotter?date=2025-01-15', headers=api_headers)
+    assert response.status_code == 200
+    client.get('/api/blotter?date=bad', headers=api_headers)
+    
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    
+    labels = 'route="/api/blotter",method="GET"'
+    assert metric_value(text, f'http_requests_total{{{labels},status="200"}}') == 1
+    assert metric_value(text, f'http_requests_total{{{labels},status="400"}}') == 1
+    assert metric_value(text, f'http_request_duration_seconds_count{{{labels}}}') == 2
+    assert metric_value(text, f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}') == 2
+    assert metric_value(text, f'http_request_db_queries_sum{{{labels}}}') >= 1
+    assert metric_value(text, f'http_request_db_seconds_sum{{{labels}}}') > 0
+    assert metric_value(text, f'http_response_bytes_sum{{{labels}}}') > 0
+    assert '# TYPE http_request_duration_seconds histogram' in text
+
+
+def test_streamed_responses_are_recorded_when_closed(client, api_headers):
+    ingest_file(SAMPLE, 'format2')
+    labels = 'route="/api/blotter",method="GET"'
+    
+    response = client.get('/api/blotter?date=2025-01-15&format=ndjson', headers=api_headers, buffered=False)
+    pending = client.get('/metrics').get_data(as_text=True)
+    assert metric_value(pending, f'http_request_duration_seconds_count{{{labels}}}') is None
+    
+    assert len(response.get_data().splitlines()) == 2
+    response.close()
+    text = client.get('/metrics').get_data(as_text=True)
+    assert metric_value(text, f'http_requests_total{{{labels},status="200"}}') == 1
+    assert metric_value(text, f'http_request_duration_seconds_count{{{labels}}}') == 1
+    assert metric_value(text, f'http_request_db_queries_sum{{{labels}}}') >= 1
+    assert metric_value(text, f'http_response_bytes_count{{{labels}}}') is None
+
+
+def test_slow_requests_are_logged_with_top_queries(monkeypatch, capsys):
+    class SlowConfig(TestingConfig):
+        SLOW_REQUEST_MS = 0.001
+    
+    monkeypatch.setitem(config, 'slow', SlowConfig)
+    app = create_app('slow')
+    # Each create_app re-runs dictConfig, which disables loggers created by earlier apps.
+    monkeypatch.setattr(app.logger, 'disabled', False)
+    with app.app_context():
+        from app.models import db
+        db.create_all()
+        app.test_client().get('/api/positions?date=2025-01-15', headers={'X-API-Key': app.config['API_KEY']})
+        db.drop_all()
+    
+    # create_app's dictConfig logs to stdout.
+    messages = [line for line in capsys.readouterr().out.splitlines() if 'Slow request' in line]
+    assert len(messages) == 1
+    assert '/api/positions' in messages[0]
+    assert 'SELECT' in messages[0]
+
+
+def test_metrics_can_be_disabled(monkeypatch):
+    class NoMetricsConfig(TestingConfig):
+        METRICS_ENABLED = False
+    
+    monkeypatch.setitem(config, 'no_metrics', NoMetricsConfig)
+    app = create_app('no_metrics')
+    assert app.test_client().get('/metrics').status_code == 404
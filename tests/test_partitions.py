@@ -0,0 +1,75 @@
+import os
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from app.models import db, DateVersion
+from app.partitions import (
+    add_months, detach_partitions, ensure_partitions, migrate_to_partitioned, month_range, partition_ddl,
+    partition_month, partition_name,
+)
+from app.services.ingestion import ingest_file
+from config import TestingConfig, config
+
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+def test_month_arithmetic():
+    assert add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+    assert add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+    assert list(month_range(date(2024, 12, 15), date(2025, 2, 1))) == [
+        date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)
+    ]
+
+
+def test_partition_names_round_trip():
+    assert partition_name(date(2025, 1, 1)) == 'trades_p202501'
+    assert partition_month('trades_p202501') == date(2025, 1, 1)
+    assert partition_month('trades_default') is None
+    assert partition_ddl(date(2025, 12, 1)) == (
+        "CREATE TABLE IF NOT EXISTS trades_p202512 PARTITION OF trades "
+        "FOR VALUES FROM ('2025-12-01') TO ('2026-01-01')"
+    )
+
+
+@pytest.mark.parametrize('command', [
+    lambda: ensure_partitions(),
+    lambda: detach_partitions(date(2025, 1, 1)),
+    lambda: migrate_to_partitioned(),
+])
+def test_partition_commands_refuse_sqlite(app, command):
+    with pytest.raises(RuntimeError, match='PostgreSQL'):
+        command()
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason='TEST_POSTGRES_URL is not set')
+def test_detach_partitions_bumps_detached_dates():
+    class PartitionConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = POSTGRES_URL
+    
+    config['partitions'] = PartitionConfig
+    app = create_app('partitions')
+    with app.app_context():
+        try:
+            db.drop_all()
+        except OperationalError as e:
+            pytest.skip(f'Postgres unreachable: {e}')
+        db.create_all()
+        try:
+            ingest_file("20241216|ACC001|AAPL|1|100.00|CUSTODIAN_A\n20250203|ACC001|AAPL|1|100.00|CUSTODIAN_A",
+                        'format2')
+            migrate_to_partitioned(today=date(2025, 2, 1))
+            
+            assert detach_partitions(date(2025, 1, 1)) == ['trades_p202412']
+            versions = {row.trade_date: row.version for row in DateVersion.query.all()}
+            assert versions == {date(2024, 12, 16): 2, date(2025, 2, 3): 1}
+        finally:
+            db.session.remove()
+            with db.engine.begin() as connection:
+                connection.execute(text('DROP TABLE IF EXISTS trades_p202412'))
+            db.drop_all()
+            config.pop('partitions')
@@ -0,0 +1,43 @@
+from datetime import date
+
+from app.models import db
+from app.services.ingestion import ingest_file
+from app.services.queries import (
+    account_positions_query, blotter_select, position_rows_query, range_alarms_query,
+)
+
+
+FORMAT2 = """20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A
+20250115|ACC001|MSFT|50|21012.50|CUSTODIAN_A
+20250115|ACC002|AAPL|10|1855.00|CUSTODIAN_B"""
+
+DAY = date(2025, 1, 15)
+
+
+def test_read_queries_return_tuples_without_loading_instances(app):
+    ingest_file(FORMAT2, 'format2')
+    db.session.expunge_all()
+
+    blotter = db.session.execute(blotter_select(DAY)).all()
+    positions = db.session.execute(account_positions_query(DAY)).all()
+    rows = db.session.execute(position_rows_query(DAY)).all()
+    alarms = db.session.execute(range_alarms_query(DAY, DAY)).all()
+
+    assert len(db.session.identity_map) == 0
+    assert [(row.account_id, row.ticker) for row in blotter] == [
+        ('ACC001', 'AAPL'), ('ACC001', 'MSFT'), ('ACC002', 'AAPL'),
+    ]
+    assert [tuple(row[:2]) for row in positions] == [('ACC001', 'AAPL'), ('ACC001', 'MSFT'), ('ACC002', 'AAPL')]
+    assert len(rows[0]) == 6
+    assert [(row.account_id, row.in_violation) for row in alarms] == [('ACC001', True), ('ACC002', True)]
+
+
+def test_blotter_select_filters_and_pages(app):
+    ingest_file(FORMAT2, 'format2')
+    first_id = db.session.execute(blotter_select(DAY)).first().id
+
+    after = db.session.execute(blotter_select(DAY, after_id=first_id)).all()
+    holdings = db.session.execute(blotter_select(DAY, accounts=('ACC002',), tickers=('AAPL',))).all()
+
+    assert [row.ticker for row in after] == ['MSFT', 'AAPL']
+    assert [(row.account_id, row.market_value) for row in holdings] == [('ACC002', 1855)]
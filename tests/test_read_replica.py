@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+
+from app import create_app
+from app.models import db, READ_ENGINE, Trade
+from app.services.ingestion import ingest_file
+from config import TestingConfig, config, engine_options
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "primary.db"}'
+        DATABASE_READ_URL = f'sqlite:///{tmp_path / "replica.db"}'
+    
+    monkeypatch.setitem(config, 'replica', ReplicaConfig)
+    app = create_app('replica')
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(app.extensions[READ_ENGINE])
+        yield app
+        db.session.remove()
+        app.extensions[READ_ENGINE].dispose()
+
+
+def test_api_reads_go_to_the_replica(replica_app):
+    client = replica_app.test_client()
+    headers = {'X-API-Key': replica_app.config['API_KEY']}
+    
+    success, _ = ingest_file("20250115|ACC001|AAPL|100|18550.00|CUSTODIAN_A", 'format2')
+    assert success == 1
+    assert db.session.query(Trade).count() == 1
+    
+    response = client.get('/api/blotter?date=2025-01-15', headers=headers)
+    assert response.get_json()['count'] == 0
+    
+    with replica_app.extensions[READ_ENGINE].begin() as connection:
+        connection.execute(Trade.__table__.insert(), {
+            'trade_date': date(2025, 1, 15), 'account_id': 'ACC002', 'ticker': 'MSFT', 'shares': 1,
+            'market_value': 1, 'file_format': 'format2',
+        })
+    response = client.get('/api/blotter?date=2025-01-15', headers=headers)
+    assert [item['account_id'] for item in response.get_json()['data']] == ['ACC002']
+    
+    assert db.session.query(Trade.account_id).scalar() == 'ACC001'
+
+
+def test_engine_options_only_apply_to_server_databases(monkeypatch):
+    assert engine_options('sqlite:///:memory:') == {}
+    
+    monkeypatch.setenv('DB_POOL_SIZE', '12')
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT_MS', '5000')
+    options = engine_options('postgresql://db/portfolio')
+    assert options['pool_size'] == 12
+    assert options['pool_pre_ping'] is True
+    # The timeout is per API request (app.models.apply_statement_timeout), not per connection.
+    assert 'connect_args' not in options
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from app.services import rules as rules_module
+from app.services.rules import RuleSet, current_rules, evaluate_rules, load_rules
+
+
+def legacy_alarms(positions):
+    """The per-ticker loop the rule engine replaced."""
+    alarms, violations = {}, []
+    for account_id, (total_value, tickers) in positions.items():
+        account_violations = []
+        if total_value > 0:
+            for ticker, value in tickers.items():
+                percentage = (value / total_value) * 100
+                if percentage > 20.0:
+                    account_violations.append({'ticker': ticker, 'percentage': round(percentage, 2),
+                                               'market_value': round(value, 2)})
+        alarms[account_id] = bool(account_violations)
+        if account_violations:
+            violations.append({'account_id': account_id, 'violations': account_violations})
+    return alarms, violations
+
+
+POSITIONS = {
+    'ACC1': (1927.72, {'AAPL': 742.15, 'NVDA': 185.5, 'TSLA': 1000.07}),
+    'ACC5': (0.0, {'NVDA': 0.0}),
+    'ACC7': (6.0, {ticker: 1.0 for ticker in 'UVWXYZ'}),
+    'ACC9': (1600.09, {'AAPL': 233.31, 'GOOGL': 555.55, 'MSFT': 811.23}),
+    'NEG': (-50.0, {'AAPL': -50.0}),
+}
+
+
+def test_default_rules_match_the_original_concentration_check():
+    assert evaluate_rules(POSITIONS, RuleSet()) == legacy_alarms(POSITIONS)
+
+
+def test_single_position_limit_skips_the_weight_matrix(monkeypatch):
+    def fail(positions):
+        raise AssertionError('weight matrix built for a single position limit')
+
+    monkeypatch.setattr(rules_module, '_weight_matrix', fail)
+    alarms, violations = evaluate_rules(POSITIONS, RuleSet(max_position_pct=50.0))
+
+    assert alarms == {'ACC1': True, 'ACC5': False, 'ACC7': False, 'ACC9': True, 'NEG': False}
+    assert violations == [
+        {'account_id': 'ACC1', 'violations': [{'ticker': 'TSLA', 'percentage': 51.88, 'market_value': 1000.07}]},
+        {'account_id': 'ACC9', 'violations': [{'ticker': 'MSFT', 'percentage': 50.7, 'market_value': 811.23}]},
+    ]
+
+
+def test_ticker_limits_and_account_overrides():
+    rules = RuleSet(ticker_limits={'TSLA': 60.0}, account_overrides={'ACC9': {'max_position_pct': 55.0}})
+    alarms, violations = evaluate_rules(POSITIONS, rules)
+    
+    assert alarms['ACC1'] is True
+    assert alarms['ACC9'] is False
+    assert [v['ticker'] for v in violations[0]['violations']] == ['AAPL']
+
+
+def test_sector_cap_and_min_cash():
+    positions = {
+        'ACC1': (100.0, {'AAPL': 15.0, 'MSFT': 15.0, 'CASH': 2.0, 'XOM': 68.0}),
+        'ACC2': (100.0, {'AAPL': 10.0, 'CASH': 90.0}),
+    }
+    rules = RuleSet(
+        max_position_pct=100.0,
+        sectors={'AAPL': 'TECH', 'MSFT': 'TECH', 'XOM': 'ENERGY'},
+        sector_caps={'TECH': 25.0},
+        min_cash_pct=5.0,
+        cash_tickers=['CASH'],
+    )
+    alarms, violations = evaluate_rules(positions, rules)
+    
+    assert alarms == {'ACC1': True, 'ACC2': False}
+    assert violations == [{'account_id': 'ACC1', 'violations': [
+        {'rule': 'sector_cap', 'sector': 'TECH', 'percentage': 30.0, 'market_value': 30.0, 'limit': 25.0},
+        {'rule': 'min_cash', 'percentage': 2.0, 'market_value': 2.0, 'limit': 5.0},
+    ]}]
+
+
+def test_load_rules_from_file(tmp_path, app):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'max_position_pct': 50, 'account_overrides': {'ACC1': {'min_cash_pct': 1}}}))
+    
+    rules = load_rules(path)
+    assert rules.max_position_pct == 50.0
+    assert rules.account_overrides == {'ACC1': {'min_cash_pct': 1}}
+    
+    with app.app_context():
+        app.config['COMPLIANCE_RULES_FILE'] = str(path)
+        assert current_rules().max_position_pct == 50.0
+    
+    path.write_text(json.dumps({'max_position': 50}))
+    with pytest.raises(ValueError):
+        load_rules(path)
+    
+    path.write_text(json.dumps({'account_overrides': {'ACC1': {'max_positon_pct': 50}}}))
+    with pytest.raises(ValueError, match='ACC1: max_positon_pct'):
+        load_rules(path)
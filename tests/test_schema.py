@@ -0,0 +1,27 @@
+from sqlalchemy import inspect, text
+
+from app.models import db
+from app.schema import upgrade_schema
+
+
+def test_upgrade_schema_adds_missing_columns(app):
+    with app.app_context():
+        db.drop_all()
+        db.session.execute(text(
+            "CREATE TABLE trades (id INTEGER PRIMARY KEY, trade_date DATE NOT NULL, "
+            "account_id VARCHAR(50) NOT NULL, ticker VARCHAR(20) NOT NULL, shares NUMERIC(15, 4) NOT NULL, "
+            "price NUMERIC(15, 4), trade_type VARCHAR(10), settlement_date DATE, market_value NUMERIC(15, 2), "
+            "source_system VARCHAR(50), file_format VARCHAR(20) NOT NULL, created_at DATETIME)"
+        ))
+        db.session.execute(text("CREATE INDEX idx_trade_date_account ON trades (trade_date, account_id)"))
+        db.session.commit()
+        
+        upgrade_schema()
+        upgrade_schema()
+        
+        inspector = inspect(db.engine)
+        assert 'natural_key' in {column['name'] for column in inspector.get_columns('trades')}
+        indexes = {index['name'] for index in inspector.get_indexes('trades')}
+        assert {'uq_trade_natural_key', 'idx_trade_blotter', 'idx_trade_date_account_cover'} <= indexes
+        assert 'idx_trade_date_account' not in indexes
+        assert 'ingestion_ledger' in inspector.get_table_names()
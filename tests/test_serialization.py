@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+from app.routes.api import blotter_row_serializer
+from app.utils import serialization
+from app.utils.serialization import FastJSONProvider, make_iso_formatter
+
+
+PAYLOAD = {
+    'b': [1, 2.5, None, True, 'café'],
+    'a': {'when': date(2025, 1, 15), 'at': datetime(2025, 1, 15, 9, 30), 'amount': Decimal('12.50')},
+    'big': 2 ** 70,
+}
+
+
+def test_provider_matches_the_default_provider(app):
+    fast = FastJSONProvider(app)
+    default = DefaultJSONProvider(app)
+
+    assert fast.loads(fast.dumps(PAYLOAD)) == default.loads(default.dumps(PAYLOAD))
+    assert fast.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+    assert fast.loads('{"x": [1, 2]}') == {'x': [1, 2]}
+    with pytest.raises(TypeError):
+        fast.dumps({'x': object()})
+
+
+def test_provider_without_orjson_uses_the_default_encoder(app, monkeypatch):
+    monkeypatch.setattr(serialization, 'orjson', None)
+    fast = FastJSONProvider(app)
+
+    assert fast.dumps(PAYLOAD) == DefaultJSONProvider(app).dumps(PAYLOAD)
+    assert fast.response({'a': 1}).get_json() == {'a': 1}
+
+
+def test_app_responses_use_the_provider(app, client):
+    assert isinstance(app.json, FastJSONProvider)
+    response = client.get('/api/blotter?date=2025-01-15', headers={'X-API-Key': app.config['API_KEY']})
+    assert response.get_json() == {'date': '2025-01-15', 'count': 0, 'data': []}
+
+
+def test_iso_formatter_memoizes_dates():
+    iso = make_iso_formatter()
+    first = iso(date(2025, 1, 15))
+
+    assert first == '2025-01-15'
+    assert iso(date(2025, 1, 15)) is first
+    assert iso(None) is None
+
+
+def test_blotter_row_serializer():
+    serialize = blotter_row_serializer()
+    format1 = (1, date(2025, 1, 15), 'ACC001', 'AAPL', Decimal('-100'), Decimal('185.5'), 'SELL',
+               date(2025, 1, 17), None, None, 'format1')
+    format2 = (2, date(2025, 1, 15), 'ACC002', 'MSFT', Decimal('50'), None, None, None,
+               Decimal('21012.5'), 'CUSTODIAN_A', 'format2')
+
+    assert serialize(format1) == {
+        'date': '2025-01-15', 'account_id': 'ACC001', 'ticker': 'AAPL', 'shares': -100.0,
+        'price': 185.5, 'trade_type': 'SELL', 'settlement_date': '2025-01-17',
+    }
+    assert serialize(format2) == {
+        'date': '2025-01-15', 'account_id': 'ACC002', 'ticker': 'MSFT', 'shares': 50.0,
+        'market_value': 21012.5, 'source_system': 'CUSTODIAN_A',
+    }